@@ -1,4 +1,5 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, has_request_context, jsonify, make_response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_jwt_extended import (
     JWTManager,
     jwt_required,
@@ -9,14 +10,45 @@ from flask_jwt_extended import (
 )
 from flask_cors import CORS
 
+import atexit
+import base64
+import bisect
+import csv
+import glob
+import gzip
+import hashlib
 import json
+import math
+import mmap
+import os
+import queue
+import random
 import re
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from array import array
+from collections import OrderedDict, deque
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locks, the dev server is a single process anyway
+    fcntl = None
+import click
 import datetime
 import jwt
+from contextlib import contextmanager
 from functools import wraps
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from sqlalchemy.engine import make_url
 from flask_marshmallow import Marshmallow
-from flasgger import Swagger
 from datetime import datetime  
 from werkzeug.security import generate_password_hash, check_password_hash  
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity, verify_jwt_in_request
@@ -39,11 +71,12 @@ app.config['SWAGGER'] = {
     'uiversion': 3              # Use Swagger UI v3
 }
 
-# Attach Swagger to this Flask app so /apidocs (or configured route) will show docs
-swagger = Swagger(app)
+# Swagger is attached by create_app(): importing flasgger (and jsonschema) is the
+# slowest part of startup, so workers that do not serve /apidocs can skip it
+app.config['SWAGGER_ENABLED'] = os.getenv('SWAGGER_ENABLED', '1') not in ('0', 'false', 'False')
+swagger = None
 
 from datetime import datetime, timedelta  # <-- you already import datetime, just add timedelta
-import os
 
 # ========================================
 # DJANGO INTEGRATION: JWT Configuration
@@ -62,6 +95,561 @@ app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(seconds=30)   # or 60 seconds
 app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=7)      # refresh valid for a week
 
 
+# ========================================
+# DECODED TOKEN CACHE
+# ========================================
+# Integration clients send the same Django token thousands of times a minute.
+# After a token has been fully validated once (signature, claims, expiry), its
+# claims are kept in a bounded LRU keyed by the token's SHA-256 digest, so
+# later requests with that token skip jwt.decode. Entries expire at the
+# token's exp (or after DJANGO_TOKEN_CACHE_TTL seconds for tokens without one).
+
+app.config['DJANGO_TOKEN_CACHE_SIZE'] = int(os.getenv('DJANGO_TOKEN_CACHE_SIZE', '10000'))  # 0 disables the cache
+app.config['DJANGO_TOKEN_CACHE_TTL'] = int(os.getenv('DJANGO_TOKEN_CACHE_TTL', '300'))
+
+
+class DecodedTokenCache:
+    """Thread-safe LRU of validated token claims with hit/miss counters."""
+
+    def __init__(self):
+        self.entries = OrderedDict()   # token digest -> (claims, expires_at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        # Claims for a previously validated token, or None
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if time.time() < entry[1]:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        maxsize = app.config['DJANGO_TOKEN_CACHE_SIZE']
+        if maxsize <= 0:
+            return
+        key = self.key(token)
+        expires_at = claims.get('exp') or time.time() + app.config['DJANGO_TOKEN_CACHE_TTL']
+        with self.lock:
+            self.entries[key] = (claims, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': app.config['DJANGO_TOKEN_CACHE_SIZE'],
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+decoded_token_cache = DecodedTokenCache()
+
+
+# ========================================
+# REVOCATION SNAPSHOT (written by Django)
+# ========================================
+# A valid signature does not mean the token is still allowed: Django can revoke
+# a token or pause/cancel its subscription at any time. Django writes revoked
+# jtis and inactive subscription ids to an NDJSON snapshot (see
+# frontend/core/revocations.py); Flask keeps both as in-memory sets and tails
+# the file in a background thread, so each request pays two set lookups and
+# no database or network round trip. The snapshot also carries the
+# api_calls_made Django has recorded per subscription, which the quota check
+# below uses as a floor.
+
+app.config['REVOCATION_SNAPSHOT_PATH'] = os.getenv(
+    'REVOCATION_SNAPSHOT_PATH',
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'revocations.ndjson'))
+)
+app.config['REVOCATION_REFRESH_SECONDS'] = float(os.getenv('REVOCATION_REFRESH_SECONDS', '2'))
+
+
+class RevocationSet:
+    """Revoked jtis and subscription ids, kept in sync with the Django snapshot."""
+
+    def __init__(self):
+        self.jtis = set()
+        self.subscription_ids = set()
+        self.calls_made = {}     # subscription id -> api_calls_made recorded by Django
+        self.file_id = None      # (st_dev, st_ino) of the file loaded last
+        self.offset = 0          # bytes of that file already applied
+        self.snapshot = None     # timestamp from the snapshot header line
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.thread = None
+
+    def apply(self, line, jtis, subscription_ids, calls_made):
+        """Apply one snapshot line; raises ValueError, TypeError or KeyError on a malformed line"""
+        entry = json.loads(line)
+        if not isinstance(entry, dict):
+            raise ValueError(f"expected a JSON object, got {type(entry).__name__}")
+        if 'snapshot' in entry:
+            self.snapshot = entry['snapshot']
+            return
+        if 'api_calls_made' in entry:
+            calls_made[entry['subscription_id']] = int(entry['api_calls_made'])
+            return
+        if 'jti' in entry:
+            target, value = jtis, str(entry['jti'])
+        elif 'subscription_id' in entry:
+            target, value = subscription_ids, entry['subscription_id']
+        else:
+            return
+        if entry.get('revoked', True):
+            target.add(value)
+        else:
+            target.discard(value)
+
+    def refresh(self):
+        """
+        Apply whatever Django has written since the last call. A replaced or
+        truncated file is reloaded from scratch; otherwise only the appended
+        complete lines are read.
+        """
+        path = app.config['REVOCATION_SNAPSHOT_PATH']
+        with self.lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return
+            file_id = (st.st_dev, st.st_ino)
+            reload = file_id != self.file_id or st.st_size < self.offset
+            if not reload and st.st_size == self.offset:
+                self.refreshed_at = time.time()
+                return
+
+            with open(path, 'rb') as f:
+                offset = 0 if reload else self.offset
+                f.seek(offset)
+                data = f.read()
+
+            # Apply to copies so lookups never see a half-loaded file
+            if reload:
+                jtis, subscription_ids, calls_made = set(), set(), {}
+            else:
+                jtis, subscription_ids, calls_made = set(self.jtis), set(self.subscription_ids), dict(self.calls_made)
+            end = data.rfind(b'\n') + 1   # a trailing partial line is read next time
+            for line in data[:end].splitlines():
+                if not line.strip():
+                    continue
+                # A bad line is skipped on its own (and never re-read), so it
+                # cannot hold back the revocations written after it
+                try:
+                    self.apply(line, jtis, subscription_ids, calls_made)
+                except (ValueError, TypeError, KeyError) as e:
+                    app.logger.warning('Skipping malformed revocation snapshot line in %s: %s (%r)',
+                                       path, e, line[:200])
+            self.jtis, self.subscription_ids, self.calls_made = jtis, subscription_ids, calls_made
+            self.file_id = file_id
+            self.offset = offset + end
+            self.refreshed_at = time.time()
+
+    def watch(self):
+        while True:
+            time.sleep(app.config['REVOCATION_REFRESH_SECONDS'])
+            try:
+                self.refresh()
+            except Exception:
+                # Keep watching; the last good sets stay in use until a refresh succeeds
+                app.logger.exception('Revocation snapshot refresh failed')
+
+    def start(self):
+        # First caller loads the snapshot synchronously and starts the watcher.
+        # self.thread is only set once that load succeeded, so after a failure
+        # the next request tries again instead of checking against empty sets.
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            self.refresh()
+            thread = threading.Thread(target=self.watch, name='revocation-watcher', daemon=True)
+            thread.start()
+            self.thread = thread
+
+    def is_revoked(self, claims):
+        if self.thread is None:
+            self.start()
+        return (
+            str(claims.get('jti')) in self.jtis
+            or claims.get('subscription_id') in self.subscription_ids
+        )
+
+    def stats(self):
+        return {
+            'path': app.config['REVOCATION_SNAPSHOT_PATH'],
+            'snapshot': self.snapshot,
+            'revoked_jtis': len(self.jtis),
+            'revoked_subscriptions': len(self.subscription_ids),
+            'usage_entries': len(self.calls_made),
+            'refreshed_at': (
+                datetime.utcfromtimestamp(self.refreshed_at).isoformat() + 'Z'
+                if self.refreshed_at else None
+            ),
+        }
+
+
+revocations = RevocationSet()
+
+
+# ========================================
+# RATE LIMITING AND QUOTAS (shared across workers)
+# ========================================
+# Django tokens carry a `tier` and an `api_calls_limit`. Each token (jti) gets a
+# token bucket refilled at its tier's rate, and each subscription gets a quota
+# bucket holding api_calls_limit calls that never refills. Bucket state lives in
+# memory-mapped files under RATE_LIMIT_DIR, so every gunicorn worker on the host
+# sees the same buckets. The table is split into groups of
+# RATE_LIMIT_GROUP_SLOTS slots, each locked (thread lock + fcntl byte-range
+# lock) for the few microseconds a check takes. A rate bucket only lives in
+# its own group, and a full group evicts its least recently used bucket (an
+# idle bucket is full anyway). Quota buckets are never evicted: a full group
+# hands the key on to the next one. A quota bucket is also capped at
+# api_calls_limit minus the api_calls_made Django last published (see the
+# revocation snapshot), so calls counted by other hosts, or before the quota
+# file was replaced, still count.
+
+app.config.setdefault('RATE_LIMIT_ENABLED', os.getenv('RATE_LIMIT_ENABLED', '1') not in ('0', 'false', 'False'))
+app.config.setdefault('RATE_LIMIT_DIR', os.getenv('RATE_LIMIT_DIR', os.path.join(app.instance_path, 'ratelimit')))
+app.config.setdefault('RATE_LIMIT_SLOTS', int(os.getenv('RATE_LIMIT_SLOTS', '65536')))
+# Requests per second and burst size per token, by the token's `tier` claim
+# (the lower-cased product name, e.g. "professional plan" uses "professional")
+app.config.setdefault('RATE_LIMIT_TIERS', json.loads(os.getenv('RATE_LIMIT_TIERS', '{}')) or {
+    'starter': {'rate': 5, 'burst': 20},
+    'basic': {'rate': 5, 'burst': 20},
+    'professional': {'rate': 20, 'burst': 100},
+    'premium': {'rate': 20, 'burst': 100},
+    'enterprise': {'rate': 50, 'burst': 250},
+    'default': {'rate': 10, 'burst': 50},
+})
+
+RATE_LIMIT_SLOT = struct.Struct('<Qdd')   # key hash, tokens left, last update (unix time)
+RATE_LIMIT_GROUP_SLOTS = 8
+
+
+class SharedTokenBuckets:
+    """Token buckets in a memory-mapped file shared by all worker processes."""
+
+    def __init__(self, name, evict=True):
+        self.name = name
+        self.evict = evict       # False: a full group passes new keys on to the next group
+        self.map = None
+        self.fd = None
+        self.groups = 0
+        self.group_bytes = RATE_LIMIT_GROUP_SLOTS * RATE_LIMIT_SLOT.size
+        self.locks = [threading.Lock() for _ in range(64)]
+        self.open_lock = threading.Lock()
+
+    def open(self):
+        with self.open_lock:
+            if self.map is not None:
+                return
+            directory = app.config['RATE_LIMIT_DIR']
+            os.makedirs(directory, exist_ok=True)
+            fd = os.open(os.path.join(directory, f'{self.name}.bin'), os.O_RDWR | os.O_CREAT, 0o600)
+            wanted = max(1, app.config['RATE_LIMIT_SLOTS'] // RATE_LIMIT_GROUP_SLOTS) * self.group_bytes
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                # Only ever grow the file: zero-filled slots are empty buckets
+                size = os.fstat(fd).st_size
+                if size < wanted:
+                    os.ftruncate(fd, wanted)
+                    size = wanted
+            finally:
+                if fcntl:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+            self.groups = size // self.group_bytes
+            self.fd = fd
+            self.map = mmap.mmap(fd, self.groups * self.group_bytes)
+
+    def take(self, key, rate, burst, cost=1):
+        """
+        Take `cost` tokens from the bucket for `key` (created full, with `burst`
+        tokens, refilled at `rate` tokens per second and never above `burst`).
+        Returns (allowed, retry_after): retry_after is the number of seconds
+        until the request would be allowed, or None if the bucket never refills.
+        Raises RuntimeError when a non-evicting table has no free slot left.
+        """
+        if self.map is None:
+            self.open()
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        now = time.time()
+        # Slots are never freed in a non-evicting table, so a key lives in the
+        # first group along this sequence that had room when it was added
+        for probe in range(1 if self.evict else self.groups):
+            result = self.take_in_group((h + probe) % self.groups, h, rate, burst, cost, now)
+            if result is not None:
+                return result
+        raise RuntimeError(f"The {self.name} table is full; raise RATE_LIMIT_SLOTS")
+
+    def take_in_group(self, group, h, rate, burst, cost, now):
+        # None: the key is not in this full group of a non-evicting table
+        base = group * self.group_bytes
+        with self.locks[group % len(self.locks)]:
+            if fcntl:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX, self.group_bytes, base)
+            try:
+                victim, victim_stamp = None, math.inf
+                for offset in range(base, base + self.group_bytes, RATE_LIMIT_SLOT.size):
+                    slot_key, tokens, stamp = RATE_LIMIT_SLOT.unpack_from(self.map, offset)
+                    if slot_key == h:
+                        tokens = min(burst, tokens + max(0.0, now - stamp) * rate)
+                        break
+                    if slot_key == 0 and victim_stamp > 0:
+                        victim, victim_stamp = offset, 0    # first empty slot
+                    elif self.evict and stamp < victim_stamp:
+                        victim, victim_stamp = offset, stamp
+                else:
+                    if victim is None:
+                        return None
+                    offset, tokens = victim, burst
+
+                if tokens >= cost:
+                    RATE_LIMIT_SLOT.pack_into(self.map, offset, h, tokens - cost, now)
+                    return True, 0
+                RATE_LIMIT_SLOT.pack_into(self.map, offset, h, tokens, now)
+                return False, ((cost - tokens) / rate if rate else None)
+            finally:
+                if fcntl:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, self.group_bytes, base)
+
+
+rate_buckets = SharedTokenBuckets('tokens')
+quota_buckets = SharedTokenBuckets('quotas', evict=False)
+
+
+def validate_rate_limit_tiers(tiers):
+    """Raise ValueError unless every tier has a positive rate and a burst of at least 1, and 'default' exists."""
+    if not isinstance(tiers, dict) or 'default' not in tiers:
+        raise ValueError("RATE_LIMIT_TIERS must be an object with a 'default' tier")
+    for name, tier in tiers.items():
+        try:
+            rate, burst = float(tier['rate']), float(tier['burst'])
+        except (TypeError, KeyError, ValueError):
+            raise ValueError(f"RATE_LIMIT_TIERS['{name}'] needs numeric 'rate' and 'burst'")
+        if not (math.isfinite(rate) and rate > 0 and math.isfinite(burst) and burst >= 1):
+            raise ValueError(f"RATE_LIMIT_TIERS['{name}'] needs rate > 0 and burst >= 1")
+
+
+def rate_limit_tier(claim):
+    """The RATE_LIMIT_TIERS entry for a `tier` claim: exact name, then any word of it, then 'default'."""
+    tiers = app.config['RATE_LIMIT_TIERS']
+    name = str(claim or '').lower()
+    if name in tiers:
+        return tiers[name]
+    for word in re.findall(r'[a-z0-9]+', name):
+        if word in tiers:
+            return tiers[word]
+    return tiers['default']
+
+
+def enforce_rate_limit(claims):
+    """
+    Charge one request to the token's rate bucket and its subscription's quota.
+    Raises TooManyRequests (handled by too_many_requests) when either is empty.
+    """
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+    from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+    tier = rate_limit_tier(claims.get('tier'))
+    allowed, retry_after = rate_buckets.take(f"jti:{claims['jti']}", tier['rate'], tier['burst'])
+    if not allowed:
+        raise TooManyRequests(
+            f"Rate limit of {tier['rate']} requests per second exceeded for this token",
+            retry_after=max(1, math.ceil(retry_after))
+        )
+
+    limit = claims.get('api_calls_limit')
+    if limit:
+        subscription_id = claims['subscription_id']
+        remaining = limit - revocations.calls_made.get(subscription_id, 0)
+        try:
+            allowed = remaining > 0 and quota_buckets.take(f"subscription:{subscription_id}", 0, remaining)[0]
+        except RuntimeError as e:
+            app.logger.error('%s', e)
+            raise ServiceUnavailable('API call quotas cannot be tracked right now. Please try again later.')
+        if not allowed:
+            raise TooManyRequests(
+                f'API call quota of {limit} calls for this subscription is used up. '
+                'Please upgrade or renew your subscription.'
+            )
+
+
+# ========================================
+# USAGE METERING (consumed by Django)
+# ========================================
+# Every request made with a Django token is recorded for the subscription's
+# usage statistics. The request path only appends a tuple to an in-memory ring
+# buffer; a background thread drains the buffer every USAGE_FLUSH_SECONDS,
+# sums it per subscription and day, and writes the totals as one NDJSON batch
+# file into USAGE_SPOOL_DIR. Django's `manage.py ingest_usage` picks the
+# batches up and adds them to Subscription and SubscriptionUsage.
+
+app.config.setdefault('USAGE_SPOOL_DIR', os.getenv(
+    'USAGE_SPOOL_DIR',
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'usage_spool'))
+))
+app.config.setdefault('USAGE_FLUSH_SECONDS', float(os.getenv('USAGE_FLUSH_SECONDS', '5')))
+app.config.setdefault('USAGE_BUFFER_SIZE', int(os.getenv('USAGE_BUFFER_SIZE', '100000')))
+
+
+class UsageMeter:
+    """Ring buffer of (subscription_id, unix time, status, bytes, latency ms)."""
+
+    def __init__(self):
+        self.buffer = deque(maxlen=app.config['USAGE_BUFFER_SIZE'])
+        self.dropped = 0           # records pushed out of a full buffer
+        self.pending = {}          # totals taken from the buffer but not yet written
+        self.batches_written = 0
+        self.lock = threading.Lock()   # one flush at a time
+        self.thread = None
+
+    def record(self, subscription_id, status, response_bytes, latency_ms):
+        if self.thread is None:
+            self.start()
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append((subscription_id, time.time(), status, response_bytes, latency_ms))
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.watch, name='usage-meter', daemon=True)
+            self.thread.start()
+
+    def watch(self):
+        while True:
+            time.sleep(app.config['USAGE_FLUSH_SECONDS'])
+            try:
+                self.flush()
+            except OSError as e:
+                app.logger.warning('Usage batch could not be written: %s', e)
+
+    def flush(self):
+        """
+        Write everything buffered so far as one batch file. Returns its path (or None).
+        If writing fails the totals are kept and go out with the next batch.
+        """
+        with self.lock:
+            totals = self.pending
+            while True:
+                try:
+                    subscription_id, stamp, status, response_bytes, latency_ms = self.buffer.popleft()
+                except IndexError:
+                    break
+                day = datetime.utcfromtimestamp(stamp).date().isoformat()
+                entry = totals.get((subscription_id, day))
+                if entry is None:
+                    entry = totals[(subscription_id, day)] = {
+                        'subscription_id': subscription_id, 'date': day, 'api_calls': 0,
+                        'requests_successful': 0, 'requests_failed': 0,
+                        'bytes': 0, 'latency_ms_total': 0.0, 'last_seen': stamp,
+                    }
+                entry['api_calls'] += 1
+                entry['requests_successful' if status < 400 else 'requests_failed'] += 1
+                entry['bytes'] += response_bytes
+                entry['latency_ms_total'] += latency_ms
+                entry['last_seen'] = max(entry['last_seen'], stamp)
+            if not totals:
+                return None
+
+            directory = app.config['USAGE_SPOOL_DIR']
+            os.makedirs(directory, exist_ok=True)
+            name = f'usage-{int(time.time() * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:8]}.ndjson'
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.usage-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    for entry in totals.values():
+                        f.write(json.dumps(dict(entry, latency_ms_total=round(entry['latency_ms_total'], 3))) + '\n')
+                # Django only picks up *.ndjson, so it never sees a half-written batch
+                path = os.path.join(directory, name)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self.pending = {}
+            self.batches_written += 1
+            return path
+
+    def stats(self):
+        return {
+            'buffered': len(self.buffer),
+            'pending_entries': len(self.pending),
+            'dropped': self.dropped,
+            'batches_written': self.batches_written,
+            'spool_dir': app.config['USAGE_SPOOL_DIR'],
+        }
+
+
+usage_meter = UsageMeter()
+atexit.register(usage_meter.flush)
+
+
+def counted_stream(chunks, record):
+    # Meter a streamed response once the last chunk has been sent
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        record(sent)
+
+
+@app.after_request
+def record_usage(response):
+    token_data = getattr(request, 'token_data', None)
+    if token_data is None:
+        return response
+    started = request.usage_started
+    subscription_id = token_data['subscription_id']
+    status = response.status_code
+
+    def record(response_bytes):
+        usage_meter.record(subscription_id, status, response_bytes, (time.perf_counter() - started) * 1000)
+
+    if response.is_streamed:
+        response.response = counted_stream(response.response, record)
+    else:
+        record(response.content_length or 0)
+    return response
+
+
 # ========================================
 # DJANGO TOKEN VALIDATION DECORATOR
 # ========================================
@@ -77,10 +665,13 @@ def django_token_required(f):
     - Token expiration
     - Required claims (user_id, subscription_id, product_id)
     
-    If valid, the decoded token data is available in the wrapped function.
+    If valid, the decoded token data is available in the wrapped function
+    (as request.token_data; treat it as read-only, it is shared through
+    decoded_token_cache with later requests using the same token).
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        started = time.perf_counter()
         # Get token from Authorization header
         auth_header = request.headers.get('Authorization', '')
         
@@ -100,53 +691,69 @@ def django_token_required(f):
         
         token = parts[1]
         
-        try:
-            # Decode and validate token using Django's secret key
-            decoded = jwt.decode(
-                token,
-                app.config['DJANGO_JWT_SECRET'],
-                algorithms=[app.config['DJANGO_JWT_ALGORITHM']]
-            )
-            
-            # Verify required claims exist
-            required_claims = ['user_id', 'subscription_id', 'product_id', 'jti']
-            missing_claims = [claim for claim in required_claims if claim not in decoded]
+        # Seen and fully validated before: reuse the claims, skip jwt.decode
+        decoded = decoded_token_cache.get(token)
+        if decoded is None:
+            try:
+                # Decode and validate token using Django's secret key
+                decoded = jwt.decode(
+                    token,
+                    app.config['DJANGO_JWT_SECRET'],
+                    algorithms=[app.config['DJANGO_JWT_ALGORITHM']]
+                )
             
-            if missing_claims:
-                return jsonify({
-                    'error': 'Invalid Token',
-                    'message': f'Token is missing required claims: {missing_claims}'
-                }), 401
+                # Verify required claims exist
+                required_claims = ['user_id', 'subscription_id', 'product_id', 'jti']
+                missing_claims = [claim for claim in required_claims if claim not in decoded]
             
-            # Check if token has expired
-            if 'exp' in decoded:
-                exp_timestamp = decoded['exp']
-                if datetime.utcnow().timestamp() > exp_timestamp:
+                if missing_claims:
                     return jsonify({
-                        'error': 'Token Expired',
-                        'message': 'Your subscription token has expired. Please renew your subscription.'
+                        'error': 'Invalid Token',
+                        'message': f'Token is missing required claims: {missing_claims}'
                     }), 401
             
-            # Token is valid! Attach decoded data to request context
-            request.token_data = decoded
-            
-            return f(*args, **kwargs)
+                # Check if token has expired
+                if 'exp' in decoded:
+                    exp_timestamp = decoded['exp']
+                    if datetime.utcnow().timestamp() > exp_timestamp:
+                        return jsonify({
+                            'error': 'Token Expired',
+                            'message': 'Your subscription token has expired. Please renew your subscription.'
+                        }), 401
             
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'error': 'Token Expired',
-                'message': 'Your subscription token has expired. Please renew your subscription.'
-            }), 401
-        except jwt.InvalidTokenError as e:
-            return jsonify({
-                'error': 'Invalid Token',
-                'message': f'Token validation failed: {str(e)}'
-            }), 401
-        except Exception as e:
+            except jwt.ExpiredSignatureError:
+                return jsonify({
+                    'error': 'Token Expired',
+                    'message': 'Your subscription token has expired. Please renew your subscription.'
+                }), 401
+            except jwt.InvalidTokenError as e:
+                return jsonify({
+                    'error': 'Invalid Token',
+                    'message': f'Token validation failed: {str(e)}'
+                }), 401
+            except Exception as e:
+                return jsonify({
+                    'error': 'Authentication Error',
+                    'message': f'An error occurred while validating your token: {str(e)}'
+                }), 401
+        
+            decoded_token_cache.put(token, decoded)
+        
+        # Checked on every request, cached or not: revocation can happen at any time
+        if revocations.is_revoked(decoded):
             return jsonify({
-                'error': 'Authentication Error',
-                'message': f'An error occurred while validating your token: {str(e)}'
+                'error': 'Token Revoked',
+                'message': 'This token has been revoked or its subscription is no longer active.'
             }), 401
+        
+        enforce_rate_limit(decoded)
+        
+        # Token is valid! Attach decoded data to request context. The view runs
+        # outside the try block so its own errors are not reported as auth failures.
+        request.token_data = decoded
+        request.usage_started = started   # metered by record_usage
+        
+        return f(*args, **kwargs)
     
     return decorated_function
 
@@ -156,17 +763,137 @@ def django_token_required(f):
 # -----------------------------
 # Ensure JSON is returned as UTF-8 (allows non-ASCII characters correctly)
 app.config['JSON_AS_ASCII'] = False
-# Use SQLite database file called terrascope_dev.db in the local folder
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///terrascope_dev.db"
-# Echo all SQL commands in the terminal (useful for debugging ORM behaviour)
-app.config["SQLALCHEMY_ECHO"] = True
+# Use SQLite database file called terrascope_dev.db in the instance folder
+# (DATABASE_URL selects another database, e.g. postgresql+psycopg://...)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv('DATABASE_URL', "sqlite:///terrascope_dev.db")
+# Echo all SQL commands in the terminal (useful for debugging ORM behaviour).
+# Printing is synchronous: set SQLALCHEMY_ECHO=0 in production and use the SQL profiler
+app.config["SQLALCHEMY_ECHO"] = os.getenv('SQLALCHEMY_ECHO', 'true').lower() in ('1', 'true', 'yes')
 # Disable a deprecated SQLAlchemy tracking feature to avoid warnings
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 # General Flask secret key (used e.g. for sessions); here also labelled as JWT secret
 app.config["SECRET_KEY"] = "CHANGE_ME_SECRET_KEY"  # JWT secret
 
+
+# ========================================
+# STORAGE ENGINE
+# ========================================
+# Writers use the default engine. Read-only endpoints (@read_only_db) run their
+# session queries on the separate "read" bind, so a long bulk import never
+# leaves GET requests waiting for a connection.
+#
+# SQLite: every connection is switched to WAL mode, where readers see the last
+# committed snapshot while a write is in progress instead of blocking on it.
+# SQLite still allows one writer at a time; busy_timeout makes concurrent
+# writers queue on the lock instead of failing with "database is locked".
+# The read bind opens the same file with mode=ro.
+#
+# PostgreSQL: set DATABASE_URL (and DATABASE_READ_URL for a read replica;
+# without one, reads share the writer's database through their own pool).
+
+app.config.setdefault('DB_READ_POOL', os.getenv('DB_READ_POOL', 'true').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('DB_POOL_SIZE', int(os.getenv('DB_POOL_SIZE', '5')))
+app.config.setdefault('DB_READ_POOL_SIZE', int(os.getenv('DB_READ_POOL_SIZE', '8')))
+app.config.setdefault('DB_MAX_OVERFLOW', int(os.getenv('DB_MAX_OVERFLOW', '10')))
+app.config.setdefault('DB_POOL_TIMEOUT', int(os.getenv('DB_POOL_TIMEOUT', '30')))
+app.config.setdefault('DB_POOL_RECYCLE', int(os.getenv('DB_POOL_RECYCLE', '1800')))
+app.config.setdefault('SQLITE_JOURNAL_MODE', os.getenv('SQLITE_JOURNAL_MODE', 'WAL'))
+app.config.setdefault('SQLITE_SYNCHRONOUS', os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'))
+app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')))
+app.config.setdefault('SQLITE_MMAP_SIZE', int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))))
+
+
+def is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def sqlite_read_only_url(url):
+    """sqlite:///path.db -> sqlite:///file:path.db?mode=ro&uri=true"""
+    if url.database.startswith('file:'):
+        return url.update_query_dict({'mode': 'ro', 'uri': 'true'})
+    return url.set(database='file:' + url.database).update_query_dict({'mode': 'ro', 'uri': 'true'})
+
+
+def pool_options(url, pool_size):
+    """Engine options for a pooled engine (in-memory SQLite keeps its single static connection)"""
+    if is_memory_sqlite(url):
+        return {}
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Server connections can be dropped by the server or a proxy while idle
+        options.update(pool_recycle=app.config['DB_POOL_RECYCLE'], pool_pre_ping=True)
+    return options
+
+
+def configure_storage():
+    """Set the engine options and the "read" bind from the DB_* settings"""
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', pool_options(url, app.config['DB_POOL_SIZE']))
+    if not app.config['DB_READ_POOL'] or 'read' in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    read_url = os.getenv('DATABASE_READ_URL')
+    read_url = make_url(read_url) if read_url else url
+    if is_memory_sqlite(read_url):
+        return  # each in-memory connection is a different database
+    if read_url is url and url.get_backend_name() == 'sqlite':
+        read_url = sqlite_read_only_url(url)
+    app.config.setdefault('SQLALCHEMY_BINDS', {})['read'] = {
+        'url': read_url.render_as_string(hide_password=False),
+        **pool_options(read_url, app.config['DB_READ_POOL_SIZE']),
+    }
+
+
+class RoutingSession(FlaskSQLAlchemySession):
+    """
+    Session that sends the queries of @read_only_db views to the "read" bind.
+    Flushes always go to the writer, so a read-only view that does write
+    something still works.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_request_context()
+                and g.get('db_read_only') and 'read' in self._db.engines):
+            return self._db.engines['read']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+configure_storage()
+
 # Create SQLAlchemy instance bound to the app (for defining models and queries)
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+
+@db.event.listens_for(db.Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """Apply the SQLITE_* pragmas to every new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        try:
+            # Stored in the database file, so it only has to succeed once
+            cursor.execute(f"PRAGMA journal_mode = {app.config['SQLITE_JOURNAL_MODE']}")
+        except sqlite3.OperationalError:
+            pass  # read-only connection opened before the writer switched the file
+        cursor.execute(f"PRAGMA synchronous = {app.config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA mmap_size = {int(app.config['SQLITE_MMAP_SIZE'])}")
+    finally:
+        cursor.close()
+
+
+def read_only_db(f):
+    """Run the view's database reads on the read-only pool (when one is configured)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_read_only = True
+        return f(*args, **kwargs)
+    return decorated
+
 # Create Marshmallow instance bound to the app (for schemas)
 ma = Marshmallow(app)
 
@@ -201,10 +928,137 @@ dataset_schema = DatasetSchema()
 datasets_schema = DatasetSchema(many=True)
 
 
+# -----------------------------
+# SPATIAL HELPERS
+# Numeric lat/long + fixed-grid cell index used for location queries
+# -----------------------------
+
+# The globe is split into square cells of GRID_CELL_DEGREES. Each observation
+# stores the number of the cell it falls in, so a bounding box turns into a few
+# contiguous cell ranges (one per grid row) that SQLite answers with index range scans.
+GRID_CELL_DEGREES = 0.1
+GRID_ROWS = int(round(180 / GRID_CELL_DEGREES))
+GRID_COLUMNS = int(round(360 / GRID_CELL_DEGREES))
+# Above this many grid rows the OR of cell ranges costs more than it saves,
+# so tall boxes fall back to the latitude index on its own
+GRID_MAX_ROW_RANGES = 64
+# Approximate length of one degree of latitude (and of longitude at the equator)
+KM_PER_DEGREE = 111.32
+
+# Matches the legacy coordinates format, e.g. "lat=40.7,long=-74.0" (also accepts lon/lng)
+COORDINATES_PATTERN = re.compile(
+    r'lat\s*=\s*(-?\d+(?:\.\d+)?)\s*,\s*(?:long|lon|lng)\s*=\s*(-?\d+(?:\.\d+)?)',
+    re.IGNORECASE
+)
+
+
+def parse_coordinates(value):
+    """
+    Parse a coordinates string such as "lat=40.7,long=-74.0".
+    Returns a (latitude, longitude) tuple of floats, or (None, None) if the
+    string is empty, malformed or out of range.
+    """
+    if not value or not isinstance(value, str):
+        return None, None
+
+    match = COORDINATES_PATTERN.search(value)
+    if not match:
+        return None, None
+
+    lat = float(match.group(1))
+    lon = float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+
+def grid_row(lat):
+    # Row number of the grid band containing this latitude (0 = south pole)
+    return min(max(int((lat + 90) // GRID_CELL_DEGREES), 0), GRID_ROWS - 1)
+
+
+def grid_column(lon):
+    # Column number of the grid band containing this longitude (0 = 180°W)
+    return min(max(int((lon + 180) // GRID_CELL_DEGREES), 0), GRID_COLUMNS - 1)
+
+
+def grid_cell_for(lat, lon):
+    """
+    Return the fixed-grid cell number for a point, or None if either value is missing.
+    Cells are numbered row by row, so cells in the same row are contiguous.
+    """
+    if lat is None or lon is None:
+        return None
+    return grid_row(lat) * GRID_COLUMNS + grid_column(lon)
+
+
+def parse_spectral_indices(value):
+    """
+    Decode a stored spectral_indices JSON string into a {band: float} dict.
+    Band names are lower-cased so "NDVI" and "ndvi" are the same band.
+    Non-numeric and non-finite values are skipped; missing or invalid JSON gives an empty dict.
+    """
+    if not value:
+        return {}
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+    return spectral_band_values(data)
+
+
+def spectral_band_values(data):
+    # Same as parse_spectral_indices, for an already-decoded spectral_indices object
+    # NaN, Infinity and integers beyond the float range are skipped too: they
+    # cannot be stored in observation_bands and would poison the rollup and
+    # density totals
+    if not isinstance(data, dict):
+        return {}
+    values = {}
+    for band, v in data.items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            try:
+                v = float(v)
+            except OverflowError:
+                continue
+            if math.isfinite(v):
+                values[band.lower()] = v
+    return values
+
+
+# Stores each numeric spectral band value of an observation as its own row, so
+# band filters (e.g. ndvi_min/ndvi_max) and aggregates run inside the database
+# instead of parsing every spectral_indices JSON string in Python
+class ObservationBand(db.Model):
+    __tablename__ = "observation_bands"
+    __table_args__ = (
+        db.Index('ix_observation_bands_band_value', 'band', 'value'),
+        # Store rows in primary key order (no separate rowid b-tree), which
+        # saves one index update per band value on bulk inserts
+        {'sqlite_with_rowid': False},
+    )
+
+    observation_id = db.Column(db.Integer, db.ForeignKey('observations.id', ondelete='CASCADE'),
+                               primary_key=True)                   # Observation this value belongs to
+    band = db.Column(db.String(50), primary_key=True)              # Band name, lower-case (e.g. "ndvi")
+    value = db.Column(db.Float, nullable=False)                    # Band value
+
+    def __repr__(self):
+        return f"<ObservationBand {self.observation_id} {self.band}={self.value}>"
+
+
 # US-10: Observation Model (for satellite data with filtering support)
 # This model stores details of each satellite observation
 class Observation(db.Model):
     __tablename__ = "observations"  # Table name in SQLite DB
+    __table_args__ = (
+        # SQLite appends the rowid (id) to every index, so this also serves (timestamp, id) keyset pagination
+        db.Index('ix_observations_timestamp', 'timestamp'),
+        # Serves satellite_id filters, alone or with a date range, in (timestamp, id) order
+        db.Index('ix_observations_satellite_timestamp', 'satellite_id', 'timestamp'),
+        db.Index('ix_observations_grid_cell', 'grid_cell'),
+        db.Index('ix_observations_lat_long', 'latitude', 'longitude'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)                   # Unique ID per observation
     timestamp = db.Column(db.DateTime, nullable=False)             # Exact date/time of observation
@@ -213,17 +1067,270 @@ class Observation(db.Model):
     satellite_id = db.Column(db.String(50), nullable=True)         # Which satellite captured this
     spectral_indices = db.Column(db.Text, nullable=True)           # JSON string of spectral data
     notes = db.Column(db.Text, nullable=True)                      # Free-form notes/comments
+    latitude = db.Column(db.Float, nullable=True)                  # Parsed from coordinates
+    longitude = db.Column(db.Float, nullable=True)                 # Parsed from coordinates
+    grid_cell = db.Column(db.Integer, nullable=True)               # Fixed-grid cell (see grid_cell_for)
+
+    # Normalised copy of spectral_indices, one row per band (see ObservationBand)
+    bands = db.relationship('ObservationBand', cascade='all, delete-orphan', lazy='select')
+
+    @db.validates('coordinates')
+    def sync_location(self, key, value):
+        # Keep the numeric location columns in step with the coordinates string
+        self.latitude, self.longitude = parse_coordinates(value)
+        self.grid_cell = grid_cell_for(self.latitude, self.longitude)
+        return value
+
+    @db.validates('spectral_indices')
+    def sync_bands(self, key, value):
+        # Keep the observation_bands rows in step with the spectral_indices JSON.
+        # Existing rows are updated in place rather than replaced, so a band that
+        # keeps its name never hits the (observation_id, band) primary key twice.
+        values = parse_spectral_indices(value)
+        existing = {row.band: row for row in self.bands}
+        for band, row in existing.items():
+            if band not in values:
+                self.bands.remove(row)
+        for band, band_value in values.items():
+            if band in existing:
+                existing[band].value = band_value
+            else:
+                self.bands.append(ObservationBand(band=band, value=band_value))
+        return value
 
     def __repr__(self):
         # Helpful representation for debugging / logs
         return f"<Observation {self.id} - {self.timestamp}>"
 
 
+def bounding_box_conditions(min_lat, max_lat, min_lon, max_lon):
+    """
+    Build SQLAlchemy filter conditions for observations inside a bounding box.
+    The grid cell ranges let SQLite use ix_observations_grid_cell; the exact
+    latitude/longitude comparisons then trim the edges of the outer cells.
+    """
+    conditions = [
+        Observation.latitude.between(min_lat, max_lat),
+        Observation.longitude.between(min_lon, max_lon),
+    ]
+
+    first_row, last_row = grid_row(min_lat), grid_row(max_lat)
+    if last_row - first_row < GRID_MAX_ROW_RANGES:
+        first_col, last_col = grid_column(min_lon), grid_column(max_lon)
+        conditions.append(db.or_(*[
+            Observation.grid_cell.between(row * GRID_COLUMNS + first_col, row * GRID_COLUMNS + last_col)
+            for row in range(first_row, last_row + 1)
+        ]))
+    return conditions
+
+
+def radius_search_area(lat, lon, radius_km):
+    """
+    The bounding boxes of the circle of radius_km around (lat, lon), as
+    (lat_delta, lon_scale, boxes). Each box is (min_lat, max_lat, min_lon,
+    max_lon, shift): shift is added to a point's longitude before measuring
+    its distance. A circle that crosses the +/-180 meridian gets a second box
+    on the other side, shifted by 360 degrees.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_scale = math.cos(math.radians(lat))
+    lon_delta = 180 if lon_scale < 1e-6 else min(radius_km / (KM_PER_DEGREE * lon_scale), 180)
+    min_lat, max_lat = max(lat - lat_delta, -90), min(lat + lat_delta, 90)
+
+    boxes = [(min_lat, max_lat, max(lon - lon_delta, -180), min(lon + lon_delta, 180), 0)]
+    if lon - lon_delta < -180:
+        boxes.append((min_lat, max_lat, lon - lon_delta + 360, 180, -360))
+    if lon + lon_delta > 180:
+        boxes.append((min_lat, max_lat, -180, lon + lon_delta - 360, 360))
+    return lat_delta, lon_scale, boxes
+
+
+def radius_conditions(lat, lon, radius_km):
+    """
+    Build filter conditions for observations within radius_km of (lat, lon).
+    The bounding box narrows the scan through the indexes, then an
+    equirectangular distance check (plain arithmetic, so SQLite can run it)
+    keeps only the points inside the circle.
+    """
+    lat_delta, lon_scale, boxes = radius_search_area(lat, lon, radius_km)
+    parts = []
+    for min_lat, max_lat, min_lon, max_lon, shift in boxes:
+        longitude = Observation.longitude + shift if shift else Observation.longitude
+        conditions = bounding_box_conditions(min_lat, max_lat, min_lon, max_lon)
+        conditions.append(
+            (Observation.latitude - lat) * (Observation.latitude - lat)
+            + (longitude - lon) * lon_scale * (longitude - lon) * lon_scale
+            <= lat_delta * lat_delta
+        )
+        parts.append(conditions)
+    if len(parts) == 1:
+        return parts[0]
+    return [db.or_(*[db.and_(*conditions) for conditions in parts])]
+
+
+def check_coordinates(lat_values, lon_values):
+    """Raise ValueError unless every latitude is within [-90, 90] and every longitude within [-180, 180]"""
+    if not all(math.isfinite(v) and -90 <= v <= 90 for v in lat_values):
+        raise ValueError("Latitude must be a finite number between -90 and 90")
+    if not all(math.isfinite(v) and -180 <= v <= 180 for v in lon_values):
+        raise ValueError("Longitude must be a finite number between -180 and 180")
+
+
+def apply_location_filters(query, args):
+    """
+    Apply the location query parameters shared by the observation list endpoints:
+    - lat + long: exact point match
+    - lat + long + radius_km: points within radius_km of (lat, long)
+    - min_lat, max_lat, min_long, max_long: bounding box (all four required)
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    lat_str = args.get('lat')
+    long_str = args.get('long')
+    radius_str = args.get('radius_km')
+    box_values = [args.get(name) for name in ('min_lat', 'max_lat', 'min_long', 'max_long')]
+
+    if lat_str or long_str:
+        if not (lat_str and long_str):
+            raise ValueError("Both 'lat' and 'long' parameters are required for location filtering")
+        try:
+            lat = float(lat_str)
+            lon = float(long_str)
+        except ValueError:
+            raise ValueError("Invalid lat/long format. Use decimal degrees (e.g., lat=40.7&long=-74.0)")
+        check_coordinates([lat], [lon])
+
+        if radius_str:
+            try:
+                radius_km = float(radius_str)
+            except ValueError:
+                raise ValueError("Invalid radius_km format. Use a number of kilometres")
+            if not math.isfinite(radius_km) or radius_km <= 0:
+                raise ValueError("radius_km must be a finite number greater than 0")
+            query = query.filter(*radius_conditions(lat, lon, radius_km))
+        else:
+            query = query.filter(Observation.latitude == lat, Observation.longitude == lon)
+    elif radius_str:
+        raise ValueError("'radius_km' requires both 'lat' and 'long' parameters")
+
+    if any(box_values):
+        if not all(box_values):
+            raise ValueError("Bounding box filtering requires min_lat, max_lat, min_long and max_long")
+        try:
+            min_lat, max_lat, min_lon, max_lon = (float(v) for v in box_values)
+        except ValueError:
+            raise ValueError("Invalid bounding box format. Use decimal degrees")
+        check_coordinates([min_lat, max_lat], [min_lon, max_lon])
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("Bounding box minimums must not be greater than maximums")
+        query = query.filter(*bounding_box_conditions(min_lat, max_lat, min_lon, max_lon))
+
+    return query
+
+
+def apply_date_filters(query, args):
+    """
+    Apply the start_date / end_date query parameters (ISO 8601, inclusive).
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    for name in ('start_date', 'end_date'):
+        value = args.get(name)
+        if not value:
+            continue
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid {name} format. Use ISO 8601 (e.g., 2025-11-01T00:00:00)")
+        if name == 'start_date':
+            query = query.filter(Observation.timestamp >= parsed)
+        else:
+            query = query.filter(Observation.timestamp <= parsed)
+    return query
+
+
+def apply_satellite_filter(query, args):
+    """
+    Apply the satellite_id query parameter: one id, or a comma-separated list.
+    Answered from ix_observations_satellite_timestamp.
+    """
+    value = args.get('satellite_id')
+    if not value:
+        return query
+    satellite_ids = [part.strip() for part in value.split(',') if part.strip()]
+    if len(satellite_ids) == 1:
+        return query.filter(Observation.satellite_id == satellite_ids[0])
+    return query.filter(Observation.satellite_id.in_(satellite_ids))
+
+
+# Comma-separated band names that band filters may use; empty accepts any band
+app.config.setdefault('KNOWN_BANDS', {
+    band.strip().lower() for band in os.getenv('KNOWN_BANDS', '').split(',') if band.strip()
+})
+
+
+def parse_band_ranges(args):
+    """
+    Collect the <band>_min / <band>_max query parameters into
+    {band: {'min': value, 'max': value}} (band names lower-cased).
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    ranges = {}
+    for name, value in args.items():
+        if not (name.endswith('_min') or name.endswith('_max')) or len(name) <= 4:
+            continue
+        band, bound = name[:-4].lower(), name[-3:]
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid {name} value. Use a number")
+        if not math.isfinite(number):
+            raise ValueError(f"Invalid {name} value. Use a finite number")
+        ranges.setdefault(band, {})[bound] = number
+    return ranges
+
+
+def check_known_bands(bands):
+    """
+    With KNOWN_BANDS set, raise ValueError for the first band not in it, so a
+    typo such as ndiv_min=0.2 is reported instead of returning an empty result.
+    Without it any band name is accepted.
+    """
+    known = app.config['KNOWN_BANDS']
+    if not known:
+        return
+    for band in sorted(bands):
+        if band not in known:
+            raise ValueError(f"Unknown band '{band}' in {band}_min/{band}_max. Known bands: {', '.join(sorted(known))}")
+
+
+def apply_band_filters(query, args):
+    """
+    Apply spectral band range filters such as ndvi_min=0.4&ndvi_max=0.8.
+    Any <band>_min / <band>_max parameter is accepted (band names are
+    case-insensitive; limited to KNOWN_BANDS when that is set). A band no
+    observation has matches nothing. Each band becomes an IN (...) subquery that SQLite answers from ix_observation_bands_band_value.
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    ranges = parse_band_ranges(args)
+    check_known_bands(ranges)
+
+    for band, bounds in ranges.items():
+        conditions = [ObservationBand.band == band]
+        if 'min' in bounds:
+            conditions.append(ObservationBand.value >= bounds['min'])
+        if 'max' in bounds:
+            conditions.append(ObservationBand.value <= bounds['max'])
+        query = query.filter(Observation.id.in_(
+            db.select(ObservationBand.observation_id).where(*conditions)
+        ))
+    return query
+
+
 # Schema for Observation model
 class ObservationSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Observation      # Link to Observation model
         load_instance = True     # Load back as Observation objects
+        exclude = ('grid_cell',)  # Internal index column, not part of the API
 
 
 # Single observation schema
@@ -232,6 +1339,57 @@ observation_schema = ObservationSchema()
 observations_schema = ObservationSchema(many=True)
 
 
+# ============================================
+# FAST OBSERVATION SERIALIZATION
+# ============================================
+# The list endpoints select plain Core rows (OBSERVATION_COLUMNS) instead of
+# ORM objects and hand them to jsonify wrapped in ObservationRows.
+# ObservationJSONProvider turns each row into the same dict
+# observations_schema.dump would produce, with one zip and one isoformat call,
+# and the C JSON encoder writes the rest. Marshmallow's per-field dispatch and
+# the ORM identity map are skipped entirely.
+
+# The fields ObservationSchema dumps, so both paths always agree
+OBSERVATION_FIELDS = tuple(observations_schema.fields)
+OBSERVATION_COLUMNS = tuple(Observation.__table__.c[name] for name in OBSERVATION_FIELDS)
+
+
+def observation_record(row):
+    """
+    Convert a row selected with OBSERVATION_COLUMNS into the dict
+    ObservationSchema dumps for the same observation.
+    """
+    record = dict(zip(OBSERVATION_FIELDS, row))
+    timestamp = record['timestamp']
+    if timestamp is not None:
+        record['timestamp'] = timestamp.isoformat()
+    return record
+
+
+class ObservationRows:
+    """Rows selected with OBSERVATION_COLUMNS, serialized as a JSON array of observations."""
+    __slots__ = ('rows',)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+
+class ObservationJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, plus ObservationRows: the whole list is converted
+    in one call rather than one callback per row or field.
+    """
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObservationRows):
+            return list(map(observation_record, o.rows))
+        return DefaultJSONProvider.default(o)
+
+
+app.json_provider_class = ObservationJSONProvider
+app.json = ObservationJSONProvider(app)
+
+
 # US-13: User Model (for authentication; stores hashed passwords)
 # This model represents a user who can log into the API and get a JWT token
 class User(db.Model):
@@ -254,70 +1412,2766 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
 
-# US-13: Marshmallow schema for User (for potential serialization)
-class UserSchema(ma.SQLAlchemyAutoSchema):
-    class Meta:
-        model = User
-        load_instance = True
-        exclude = ('password_hash',)  # Make sure password hash is never sent in API responses
+# US-13: Marshmallow schema for User (for potential serialization)
+class UserSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = User
+        load_instance = True
+        exclude = ('password_hash',)  # Make sure password hash is never sent in API responses
+
+
+# Single-user schema
+user_schema = UserSchema()
+# Multi-user schema
+users_schema = UserSchema(many=True)
+
+
+def upgrade_observation_schema():
+    """
+    Bring existing observations and import_jobs tables up to date with their models.
+    db.create_all() only creates missing tables, so columns and indexes added
+    to the model later are applied here. Rows saved before the numeric location
+    columns existed are then backfilled from their coordinates strings.
+    """
+    for table in (Observation.__table__, ImportJob.__table__):
+        existing_columns = {column['name'] for column in db.inspect(db.engine).get_columns(table.name)}
+
+        with db.engine.begin() as conn:
+            # Add any model columns the table is missing (all new columns are nullable)
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            # Create any model indexes that do not exist yet
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    if backfill_observation_locations():
+        # latitude/longitude are part of the API output, so cached ETags are stale
+        with db.engine.begin() as conn:
+            bump_data_version(conn)
+    backfill_observation_bands()
+
+    # Seed the rollups once for databases that already had observations
+    if db.session.query(BandRollup.granularity).first() is None \
+            and db.session.query(ObservationBand.observation_id).first() is not None:
+        rebuild_band_rollups()
+
+    # Queue every observation for the density pyramid once, for databases that pre-date it
+    if db.session.query(DensityCell.zoom).first() is None \
+            and db.session.query(DensityPending.observation_id).first() is None \
+            and db.session.query(Observation.id).first() is not None:
+        with db.engine.begin() as conn:
+            conn.execute(DensityPending.__table__.insert().from_select(
+                ['observation_id'], db.select(Observation.__table__.c.id)
+            ))
+
+
+def backfill_observation_locations(batch_size=5000):
+    """
+    Fill latitude/longitude/grid_cell for rows that only have a coordinates string.
+    Works in id-ordered batches so a large table is never loaded into memory at once.
+    Rows whose coordinates cannot be parsed are left with NULL location columns.
+    Returns the number of rows updated.
+    """
+    table = Observation.__table__
+    updated = 0
+    last_id = 0
+
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                db.select(table.c.id, table.c.coordinates)
+                .where(table.c.id > last_id)
+                .where(table.c.latitude.is_(None))
+                .where(table.c.coordinates.is_not(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return updated
+
+            params = []
+            for row in rows:
+                lat, lon = parse_coordinates(row.coordinates)
+                if lat is not None:
+                    params.append({'row_id': row.id, 'lat': lat, 'lon': lon, 'cell': grid_cell_for(lat, lon)})
+
+            if params:
+                conn.execute(
+                    table.update()
+                    .where(table.c.id == db.bindparam('row_id'))
+                    .values(latitude=db.bindparam('lat'), longitude=db.bindparam('lon'),
+                            grid_cell=db.bindparam('cell')),
+                    params
+                )
+            updated += len(params)
+            last_id = rows[-1].id
+
+
+def backfill_observation_bands(batch_size=5000):
+    """
+    Create observation_bands rows for observations saved before the side table
+    existed (any observation with spectral_indices but no band rows yet).
+    Returns the number of band rows inserted.
+    """
+    table = Observation.__table__
+    bands_table = ObservationBand.__table__
+    inserted = 0
+    last_id = 0
+
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                db.select(table.c.id, table.c.spectral_indices)
+                .where(table.c.id > last_id)
+                .where(table.c.spectral_indices.is_not(None))
+                .where(~db.exists().where(bands_table.c.observation_id == table.c.id))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return inserted
+
+            params = [
+                {'observation_id': row.id, 'band': band, 'value': value}
+                for row in rows
+                for band, value in parse_spectral_indices(row.spectral_indices).items()
+            ]
+            if params:
+                conn.execute(bands_table.insert(), params)
+            inserted += len(params)
+            last_id = rows[-1].id
+
+
+# -----------------------------
+# SPECTRAL ROLLUPS
+# Per hour/day/month, per satellite, per band: count, sum, min and max.
+# -----------------------------
+# Rollups are maintained incrementally from an after_flush hook, so they are
+# written in the same transaction as the observation change that caused them
+# (POST, bulk, PUT and PATCH all flush through the ORM session).
+
+ROLLUP_GRANULARITIES = ('hour', 'day', 'month')
+
+
+class BandRollup(db.Model):
+    __tablename__ = "band_rollups"
+
+    granularity = db.Column(db.String(5), primary_key=True)        # 'hour', 'day' or 'month'
+    bucket_start = db.Column(db.DateTime, primary_key=True)        # Start of the time bucket
+    satellite_id = db.Column(db.String(50), primary_key=True)      # '' when the observation has none
+    band = db.Column(db.String(50), primary_key=True)              # Lower-case band name
+    count = db.Column(db.Integer, nullable=False)                  # Number of values in the bucket
+    total = db.Column(db.Float, nullable=False)                    # Sum of values (mean = total / count)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<BandRollup {self.granularity} {self.bucket_start} {self.satellite_id} {self.band}>"
+
+
+def bucket_start(timestamp, granularity):
+    # Truncate a timestamp to the start of its hour, day or month
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_end(start, granularity):
+    # First instant after the bucket that starts at `start`
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def rollup_deltas(contributions):
+    """
+    Group (timestamp, satellite_id, {band: value}) tuples into per-bucket
+    [count, total, min, max] entries keyed by (granularity, bucket_start, satellite_id, band).
+    """
+    # Aggregate per hour first, then fold the (far fewer) hourly entries into
+    # every granularity, so each value is only visited once
+    hourly = {}
+    for timestamp, satellite_id, values in contributions:
+        start = timestamp.replace(minute=0, second=0, microsecond=0)
+        for band, value in values.items():
+            key = (start, satellite_id or '', band)
+            entry = hourly.get(key)
+            if entry is None:
+                hourly[key] = [1, value, value, value]
+            else:
+                entry[0] += 1
+                entry[1] += value
+                if value < entry[2]:
+                    entry[2] = value
+                if value > entry[3]:
+                    entry[3] = value
+
+    deltas = {}
+    for (start, satellite_id, band), (count, total, low, high) in hourly.items():
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (granularity, bucket_start(start, granularity), satellite_id, band)
+            entry = deltas.get(key)
+            if entry is None:
+                deltas[key] = [count, total, low, high]
+            else:
+                entry[0] += count
+                entry[1] += total
+                entry[2] = min(entry[2], low)
+                entry[3] = max(entry[3], high)
+    return deltas
+
+
+def dialect_insert(conn, table):
+    # INSERT construct that supports on_conflict_do_update on SQLite and PostgreSQL
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def add_to_rollups(conn, contributions):
+    """
+    Add observation values to the rollups with one upsert per bucket/band.
+    contributions: iterable of (timestamp, satellite_id, {band: value}).
+    """
+    deltas = rollup_deltas(contributions)
+    if not deltas:
+        return
+
+    table = BandRollup.__table__
+    stmt = dialect_insert(conn, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.granularity, table.c.bucket_start, table.c.satellite_id, table.c.band],
+        set_={
+            'count': table.c.count + stmt.excluded.count,
+            'total': table.c.total + stmt.excluded.total,
+            'min_value': db.case((stmt.excluded.min_value < table.c.min_value, stmt.excluded.min_value),
+                                 else_=table.c.min_value),
+            'max_value': db.case((stmt.excluded.max_value > table.c.max_value, stmt.excluded.max_value),
+                                 else_=table.c.max_value),
+        }
+    )
+    conn.execute(stmt, [
+        {'granularity': g, 'bucket_start': start, 'satellite_id': sat, 'band': band,
+         'count': count, 'total': total, 'min_value': low, 'max_value': high}
+        for (g, start, sat, band), (count, total, low, high) in deltas.items()
+    ])
+
+
+def remove_from_rollups(conn, contributions):
+    """
+    Take observation values back out of the rollups (used when an observation
+    is updated or deleted). Counts and totals are decremented directly; min/max
+    cannot be, so they are recomputed for the affected buckets from the base
+    tables, which already hold the new values at this point in the flush.
+    """
+    deltas = rollup_deltas(contributions)
+    table = BandRollup.__table__
+    bands = ObservationBand.__table__
+    observations = Observation.__table__
+
+    for (granularity, start, satellite_id, band), (count, total, _, _) in deltas.items():
+        key = db.and_(
+            table.c.granularity == granularity, table.c.bucket_start == start,
+            table.c.satellite_id == satellite_id, table.c.band == band,
+        )
+        conn.execute(table.update().where(key).values(count=table.c.count - count, total=table.c.total - total))
+        conn.execute(table.delete().where(key).where(table.c.count <= 0))
+
+        low, high = conn.execute(
+            db.select(db.func.min(bands.c.value), db.func.max(bands.c.value))
+            .select_from(bands.join(observations, observations.c.id == bands.c.observation_id))
+            .where(bands.c.band == band)
+            .where(observations.c.timestamp >= start)
+            .where(observations.c.timestamp < bucket_end(start, granularity))
+            .where(db.func.coalesce(observations.c.satellite_id, '') == satellite_id)
+        ).one()
+        if low is not None:
+            conn.execute(table.update().where(key).values(min_value=low, max_value=high))
+
+
+def observation_contribution(obs, previous=False):
+    """
+    Return (timestamp, satellite_id, {band: value}) for an observation.
+    With previous=True, the values as they were before the pending changes
+    (taken from the ORM attribute history).
+    """
+    if not previous:
+        return obs.timestamp, obs.satellite_id, parse_spectral_indices(obs.spectral_indices)
+
+    state = db.inspect(obs)
+    values = []
+    for name in ('timestamp', 'satellite_id', 'spectral_indices'):
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(obs, name))
+    return values[0], values[1], parse_spectral_indices(values[2])
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def maintain_band_rollups(session, flush_context):
+    # Update the rollups for every observation inserted, changed or deleted in this flush
+    added = []
+    removed = []
+    for obs in session.new:
+        if isinstance(obs, Observation):
+            added.append(observation_contribution(obs))
+    for obs in session.dirty:
+        if isinstance(obs, Observation) and session.is_modified(obs, include_collections=False):
+            state = db.inspect(obs)
+            if any(state.attrs[name].history.has_changes() for name in ('timestamp', 'satellite_id', 'spectral_indices')):
+                removed.append(observation_contribution(obs, previous=True))
+                added.append(observation_contribution(obs))
+    for obs in session.deleted:
+        if isinstance(obs, Observation):
+            removed.append(observation_contribution(obs, previous=True))
+
+    if added or removed:
+        conn = session.connection()
+        add_to_rollups(conn, added)
+        if removed:
+            remove_from_rollups(conn, removed)
+
+
+def rebuild_band_rollups(batch_size=5000):
+    """
+    Recompute every rollup from the observations table.
+    Used to seed the rollups for databases that pre-date them.
+    Returns the number of rollup rows written.
+    """
+    table = Observation.__table__
+    with db.engine.begin() as conn:
+        conn.execute(BandRollup.__table__.delete())
+        rows = conn.execute(
+            db.select(table.c.timestamp, table.c.satellite_id, table.c.spectral_indices)
+            .where(table.c.spectral_indices.is_not(None))
+            .execution_options(yield_per=batch_size)
+        )
+        deltas = rollup_deltas(
+            (row.timestamp, row.satellite_id, parse_spectral_indices(row.spectral_indices)) for row in rows
+        )
+        if deltas:
+            conn.execute(BandRollup.__table__.insert(), [
+                {'granularity': g, 'bucket_start': start, 'satellite_id': sat, 'band': band,
+                 'count': count, 'total': total, 'min_value': low, 'max_value': high}
+                for (g, start, sat, band), (count, total, low, high) in deltas.items()
+            ])
+    return len(deltas)
+
+
+# ============================================
+# OBSERVATION DENSITY TILES
+# ============================================
+# GET /observations/tiles/{z}/{x}/{y} serves Web Mercator (slippy map) tiles,
+# each split into DENSITY_TILE_CELLS x DENSITY_TILE_CELLS cells with the
+# observation count and mean band values per cell. Zoom levels 0 to
+# DENSITY_MAX_ZOOM come from density_cells, a pyramid of per-cell counts and
+# band totals; deeper tiles cover a small area and are counted from the
+# observations table through the latitude/longitude index.
+#
+# Inserts only record the new ids in density_pending (one small row each), so
+# bulk ingest does not pay for the pyramid. A background refresher claims
+# pending ids in batches and adds them with one upsert per cell and band.
+# Updates and deletes of observations that are already in the pyramid adjust
+# it in the same transaction. Every change bumps the "density_cells" data
+# version, which keys the tile ETags and the encoded tile cache.
+
+DENSITY_TILE_CELLS = 16
+DENSITY_MAX_ZOOM = 8           # 4096 cells around the equator, about 10 km each
+# Only even levels are stored, halving the upserts per observation; an odd
+# level is summed from the 2 x 2 tiles below it
+DENSITY_ZOOMS = range(0, DENSITY_MAX_ZOOM + 1, 2)
+DENSITY_VERSION = 'density_cells'
+TILE_MAX_ZOOM = 22
+MERCATOR_MAX_LATITUDE = 85.0511287798
+
+app.config.setdefault('DENSITY_REFRESH_SECONDS', float(os.getenv('DENSITY_REFRESH_SECONDS', '2')))
+app.config.setdefault('TILE_CACHE_BYTES', int(os.getenv('TILE_CACHE_BYTES', str(16 * 1024 * 1024))))
+
+
+class DensityCell(db.Model):
+    __tablename__ = "density_cells"
+
+    zoom = db.Column(db.Integer, primary_key=True)                 # One of DENSITY_ZOOMS
+    tile_x = db.Column(db.Integer, primary_key=True)
+    tile_y = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.Integer, primary_key=True)                 # row * DENSITY_TILE_CELLS + column in the tile
+    band = db.Column(db.String(50), primary_key=True)              # Lower-case band name; '' counts observations
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)                    # Sum of band values (mean = total / count)
+
+    def __repr__(self):
+        return f"<DensityCell {self.zoom}/{self.tile_x}/{self.tile_y} #{self.cell} {self.band!r}>"
+
+
+class DensityPending(db.Model):
+    __tablename__ = "density_pending"
+
+    observation_id = db.Column(db.Integer, primary_key=True)       # Inserted, not yet in density_cells
+
+
+def mercator_cell(lat, lon, zoom):
+    """Global (column, row) of the density cell containing a point at this zoom level"""
+    cells = (1 << zoom) * DENSITY_TILE_CELLS
+    lat = math.radians(min(max(lat, -MERCATOR_MAX_LATITUDE), MERCATOR_MAX_LATITUDE))
+    x = (lon + 180) / 360
+    y = (1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2
+    return min(max(int(x * cells), 0), cells - 1), min(max(int(y * cells), 0), cells - 1)
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of a tile in degrees"""
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / (1 << z)))))
+    return latitude(y + 1), x / (1 << z) * 360 - 180, latitude(y), (x + 1) / (1 << z) * 360 - 180
+
+
+def density_deltas(contributions, zooms=DENSITY_ZOOMS):
+    """
+    Group (latitude, longitude, {band: value}) tuples into [count, total]
+    entries keyed by (zoom, tile_x, tile_y, cell, band). Points without a
+    location are skipped.
+    """
+    # Aggregate per cell of the deepest zoom first; each shallower level is a shift
+    deepest = max(zooms)
+    per_cell = {}
+    for lat, lon, values in contributions:
+        if lat is None or lon is None:
+            continue
+        bands = per_cell.setdefault(mercator_cell(lat, lon, deepest), {})
+        entry = bands.setdefault('', [0, 0.0])
+        entry[0] += 1
+        for band, value in values.items():
+            entry = bands.setdefault(band, [0, 0.0])
+            entry[0] += 1
+            entry[1] += value
+
+    deltas = {}
+    for (column, row), bands in per_cell.items():
+        for zoom in zooms:
+            shift = deepest - zoom
+            cx, cy = column >> shift, row >> shift
+            position = (zoom, cx // DENSITY_TILE_CELLS, cy // DENSITY_TILE_CELLS,
+                        (cy % DENSITY_TILE_CELLS) * DENSITY_TILE_CELLS + cx % DENSITY_TILE_CELLS)
+            for band, (count, total) in bands.items():
+                entry = deltas.get(position + (band,))
+                if entry is None:
+                    deltas[position + (band,)] = [count, total]
+                else:
+                    entry[0] += count
+                    entry[1] += total
+    return deltas
+
+
+def add_to_density(conn, contributions, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) observations in the density pyramid with
+    one upsert per cell and band. contributions: iterable of (latitude, longitude, {band: value}).
+    """
+    deltas = density_deltas(contributions)
+    if not deltas:
+        return
+    table = DensityCell.__table__
+    stmt = dialect_insert(conn, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.zoom, table.c.tile_x, table.c.tile_y, table.c.cell, table.c.band],
+        set_={'count': table.c.count + stmt.excluded.count, 'total': table.c.total + stmt.excluded.total},
+    )
+    conn.execute(stmt, [
+        {'zoom': z, 'tile_x': x, 'tile_y': y, 'cell': cell, 'band': band, 'count': sign * count, 'total': sign * total}
+        for (z, x, y, cell, band), (count, total) in deltas.items()
+    ])
+    if sign < 0:
+        conn.execute(table.delete().where(table.c.count <= 0))
+    bump_data_version(conn, DENSITY_VERSION)
+
+
+def queue_density_update(conn, ids):
+    # New observations: picked up by the density refresher
+    if ids:
+        conn.execute(DensityPending.__table__.insert(), [{'observation_id': obs_id} for obs_id in ids])
+
+
+def density_contribution(obs, previous=False):
+    """(latitude, longitude, {band: value}) for an observation, optionally as it was before the pending changes"""
+    if not previous:
+        return obs.latitude, obs.longitude, parse_spectral_indices(obs.spectral_indices)
+    state = db.inspect(obs)
+    values = []
+    for name in ('latitude', 'longitude', 'spectral_indices'):
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(obs, name))
+    return values[0], values[1], parse_spectral_indices(values[2])
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def maintain_density_cells(session, flush_context):
+    # Queue new observations; adjust the pyramid for moved, re-measured or
+    # deleted observations that it already contains
+    new = [obs.id for obs in session.new if isinstance(obs, Observation)]
+    changed = [
+        obs for obs in session.dirty
+        if isinstance(obs, Observation) and session.is_modified(obs, include_collections=False)
+        and any(db.inspect(obs).attrs[name].history.has_changes() for name in ('latitude', 'longitude', 'spectral_indices'))
+    ]
+    deleted = [obs for obs in session.deleted if isinstance(obs, Observation)]
+    if not (new or changed or deleted):
+        return
+
+    conn = session.connection()
+    queue_density_update(conn, new)
+    if not (changed or deleted):
+        return
+    pending = DensityPending.__table__
+    # FOR UPDATE waits for a refresher that has claimed these ids, so either
+    # it sees the new values or we see that it has added the old ones
+    still_pending = set(conn.execute(
+        db.select(pending.c.observation_id)
+        .where(pending.c.observation_id.in_([obs.id for obs in changed + deleted]))
+        .with_for_update()
+    ).scalars())
+    removed = [density_contribution(obs, previous=True) for obs in changed + deleted if obs.id not in still_pending]
+    added = [density_contribution(obs) for obs in changed if obs.id not in still_pending]
+    if removed:
+        add_to_density(conn, removed, sign=-1)
+    if added:
+        add_to_density(conn, added)
+    gone = [obs.id for obs in deleted if obs.id in still_pending]
+    if gone:
+        conn.execute(pending.delete().where(pending.c.observation_id.in_(gone)))
+    # Tiles deeper than DENSITY_MAX_ZOOM are counted from the observations
+    # table but cached under the density version, so every update or delete
+    # bumps it, including ones that never reached the pyramid
+    bump_data_version(conn, DENSITY_VERSION)
+
+
+class DensityRefresher:
+    """Background thread adding density_pending observations to the pyramid."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.added = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.watch, name='density-refresher', daemon=True)
+            self.thread.start()
+
+    def forget_thread(self):
+        # Threads do not survive fork; a forked worker starts its own refresher
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def watch(self):
+        while True:
+            try:
+                with app.app_context():
+                    self.refresh()
+            except Exception as e:
+                app.logger.warning('Density tiles could not be refreshed: %s', e)
+            time.sleep(app.config['DENSITY_REFRESH_SECONDS'])
+
+    def refresh(self, batch_size=1000, engine=None):
+        """Add every pending observation to the pyramid. Returns how many were added."""
+        pending = DensityPending.__table__
+        observations = Observation.__table__
+        added = 0
+        while True:
+            with (engine or db.engine).connect() as conn:
+                # Claim a batch: concurrent refreshers (other workers) never get the same ids
+                ids = conn.execute(
+                    pending.delete()
+                    .where(pending.c.observation_id.in_(
+                        db.select(pending.c.observation_id).order_by(pending.c.observation_id).limit(batch_size)
+                    ))
+                    .returning(pending.c.observation_id)
+                ).scalars().all()
+                if not ids:
+                    return added
+                rows = conn.execute(
+                    db.select(observations.c.latitude, observations.c.longitude, observations.c.spectral_indices)
+                    .where(observations.c.id.in_(ids))
+                )
+                add_to_density(conn, (
+                    (row.latitude, row.longitude, parse_spectral_indices(row.spectral_indices)) for row in rows
+                ))
+                conn.commit()
+            added += len(ids)
+            self.added += len(ids)
+
+    def stats(self):
+        return {'added': self.added, 'running': self.thread is not None}
+
+
+density_refresher = DensityRefresher()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=density_refresher.forget_thread)
+
+
+def rebuild_density_cells(batch_size=5000):
+    """
+    Recompute the density pyramid from the observations table (and empty the
+    pending queue). Returns the number of density_cells rows written.
+    """
+    table = Observation.__table__
+    with db.engine.begin() as conn:
+        conn.execute(DensityCell.__table__.delete())
+        conn.execute(DensityPending.__table__.delete())
+        rows = conn.execute(
+            db.select(table.c.latitude, table.c.longitude, table.c.spectral_indices)
+            .where(table.c.latitude.is_not(None))
+            .execution_options(yield_per=batch_size)
+        )
+        deltas = density_deltas(
+            (row.latitude, row.longitude, parse_spectral_indices(row.spectral_indices)) for row in rows
+        )
+        if deltas:
+            conn.execute(DensityCell.__table__.insert(), [
+                {'zoom': z, 'tile_x': x, 'tile_y': y, 'cell': cell, 'band': band, 'count': count, 'total': total}
+                for (z, x, y, cell, band), (count, total) in deltas.items()
+            ])
+        bump_data_version(conn, DENSITY_VERSION)
+    return len(deltas)
+
+
+def density_tile(z, x, y):
+    """
+    Cells of one tile: {cell: {band: [count, total]}}, from the pyramid up to
+    DENSITY_MAX_ZOOM and from the observations below that.
+    """
+    cells = {}
+    if z <= DENSITY_MAX_ZOOM:
+        shift = 0 if z in DENSITY_ZOOMS else 1
+        table = DensityCell.__table__
+        rows = db.session.execute(
+            db.select(table.c.tile_x, table.c.tile_y, table.c.cell, table.c.band, table.c.count, table.c.total)
+            .where(table.c.zoom == z + shift,
+                   table.c.tile_x.between(x << shift, (x << shift) + shift),
+                   table.c.tile_y.between(y << shift, (y << shift) + shift))
+        )
+        for tile_x, tile_y, cell, band, count, total in rows:
+            if shift:
+                # Global cell position one level down, halved, relative to this tile
+                column = ((tile_x * DENSITY_TILE_CELLS + cell % DENSITY_TILE_CELLS) >> 1) - x * DENSITY_TILE_CELLS
+                row = ((tile_y * DENSITY_TILE_CELLS + cell // DENSITY_TILE_CELLS) >> 1) - y * DENSITY_TILE_CELLS
+                cell = row * DENSITY_TILE_CELLS + column
+            entry = cells.setdefault(cell, {}).get(band)
+            if entry is None:
+                cells[cell][band] = [count, total]
+            else:
+                entry[0] += count
+                entry[1] += total
+        return cells
+
+    south, west, north, east = tile_bounds(z, x, y)
+    observations = Observation.__table__
+    bands = ObservationBand.__table__
+    rows = db.session.execute(
+        db.select(observations.c.id, observations.c.latitude, observations.c.longitude, bands.c.band, bands.c.value)
+        .select_from(observations.outerjoin(bands, bands.c.observation_id == observations.c.id))
+        .where(observations.c.latitude.between(south, north), observations.c.longitude.between(west, east))
+    )
+    points = {}
+    for obs_id, lat, lon, band, value in rows:
+        values = points.setdefault(obs_id, (lat, lon, {}))[2]
+        if band is not None:
+            values[band] = value
+    deltas = density_deltas(points.values(), zooms=(z,))
+    for (_, tile_x, tile_y, cell, band), entry in deltas.items():
+        # Points exactly on the tile's edge belong to the neighbouring tile
+        if (tile_x, tile_y) == (x, y):
+            cells.setdefault(cell, {})[band] = entry
+    return cells
+
+
+def encode_density_tile(z, x, y, cells):
+    body = {
+        'z': z, 'x': x, 'y': y,
+        'cells_per_side': DENSITY_TILE_CELLS,
+        'cells': [
+            {
+                'column': cell % DENSITY_TILE_CELLS,
+                'row': cell // DENSITY_TILE_CELLS,
+                'count': bands.get('', [0])[0],
+                'mean': {band: round(total / count, 6) for band, (count, total) in sorted(bands.items())
+                         if band and count},
+            }
+            for cell, bands in sorted(cells.items())
+        ],
+    }
+    return json.dumps(body, separators=(',', ':')).encode()
+
+
+# ============================================
+# TIME-SERIES DOWNSAMPLING (LTTB)
+# ============================================
+# GET /api/observations/series returns one band's values over time for a
+# location, reduced to a chartable number of points with Largest-Triangle-
+# Three-Buckets: the first and last points are kept and every bucket in between
+# contributes the point that spans the largest triangle with the point kept
+# before it and the average of the next bucket, which preserves peaks and dips
+# that plain averaging would flatten. The matching rows are loaded into NumPy
+# arrays (timestamps are parsed by NumPy, not one datetime at a time) and the
+# bucket averages and triangle areas are computed on whole arrays; only the
+# walk from bucket to bucket is a Python loop, one step per returned point.
+
+app.config.setdefault('SERIES_DEFAULT_POINTS', int(os.getenv('SERIES_DEFAULT_POINTS', '500')))
+app.config.setdefault('SERIES_MAX_POINTS', int(os.getenv('SERIES_MAX_POINTS', '5000')))
+
+SERIES_LOCATION_PARAMETERS = ('grid_cell', 'lat', 'long', 'min_lat', 'max_lat', 'min_long', 'max_long')
+
+
+def parse_series_points(value):
+    """Target point count for a series (SERIES_DEFAULT_POINTS when missing). Raises ValueError."""
+    if value is None or value == '':
+        return app.config['SERIES_DEFAULT_POINTS']
+    try:
+        points = int(value)
+    except ValueError:
+        raise ValueError("Invalid points value. Use a whole number")
+    if not 3 <= points <= app.config['SERIES_MAX_POINTS']:
+        raise ValueError(f"points must be between 3 and {app.config['SERIES_MAX_POINTS']}")
+    return points
+
+
+def load_band_series(np, query):
+    """
+    Run a select of (timestamp, value) rows and return them as NumPy arrays:
+    timestamps as datetime64[us] and values as float64. Rows without a value are left out.
+    """
+    rows = db.session.execute(query).all()
+    # Selected as text, SQLite timestamps are parsed by NumPy in one call
+    # (about 20x faster than building datetimes); other databases return datetimes
+    timestamps = np.array([row[0] for row in rows], dtype='datetime64[us]')
+    values = np.array([row[1] for row in rows], dtype=np.float64)   # None becomes NaN
+    present = ~np.isnan(values)
+    return timestamps[present], values[present]
+
+
+def lttb_indices(np, x, y, threshold):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps when reducing
+    (x, y), sorted by x, to threshold points. Series that already have no more
+    than threshold points are returned whole.
+    """
+    n = len(x)
+    if n <= threshold or threshold < 3:
+        return np.arange(n)
+
+    # Points 1 .. n-2 are split into threshold - 2 buckets; every bucket has at
+    # least one point because there are more points than buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    counts = np.diff(edges)
+    # Every bucket average in one pass; the last bucket is followed by the last point
+    average_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    average_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+
+    kept = np.empty(threshold, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = average_x[bucket + 1], average_y[bucket + 1]
+        # Twice the triangle area; the factor does not change which point wins
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(areas.argmax())
+        kept[bucket + 1] = a
+    return kept
+
+
+def downsample_series(np, timestamps, values, threshold):
+    """LTTB-downsample a series to [{'timestamp', 'value'}, ...] (at most threshold points)"""
+    # Seconds since the epoch keep the triangle areas in a sensible float range
+    x = timestamps.astype(np.int64) / 1e6
+    kept = lttb_indices(np, x, values, threshold)
+    return [
+        {'timestamp': timestamp.isoformat(), 'value': value}
+        for timestamp, value in zip(timestamps[kept].tolist(), values[kept].tolist())
+    ]
+
+
+# ============================================
+# DATA VERSIONS AND CONDITIONAL RESPONSES (ETag / If-None-Match)
+# ============================================
+# Every write to the observations bumps a counter in data_versions inside the
+# same transaction (ORM flushes via after_flush, Core bulk inserts via
+# insert_observation_rows). Read endpoints derive a strong ETag from that
+# counter and the request, so a repeated request whose ETag still matches is
+# answered 304 after a single primary-key lookup, without running the query.
+
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+
+    name = db.Column(db.String(50), primary_key=True)              # e.g. 'observations'
+    version = db.Column(db.Integer, nullable=False, default=0)     # Bumped by every committed write
+
+    def __repr__(self):
+        return f"<DataVersion {self.name}={self.version}>"
+
+
+def bump_data_version(conn, name='observations'):
+    # Upsert so the first write creates the row; rolled back with the write if it fails
+    table = DataVersion.__table__
+    stmt = dialect_insert(conn, table).values(name=name, version=1)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.name], set_={'version': table.c.version + 1}
+    ))
+
+
+def get_data_version(name='observations'):
+    return db.session.execute(
+        db.select(DataVersion.version).where(DataVersion.name == name)
+    ).scalar() or 0
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def bump_observation_version(session, flush_context):
+    # Any observation (or band row) inserted, changed or deleted in this flush
+    changed = (session.new, session.dirty, session.deleted)
+    if any(isinstance(obj, (Observation, ObservationBand)) for objects in changed for obj in objects):
+        bump_data_version(session.connection())
+
+
+# ============================================
+# HISTORICAL RESULT STORE
+# ============================================
+# Observations before get_current_quarter_start() cannot be edited, so a list
+# query whose end_date is before the current quarter rarely changes its
+# answer: its ETag only depends on the query and on the
+# "observations:historical" data version. That version is bumped only by
+# writes to closed quarters (back-dated inserts, deletes), which PUT/PATCH
+# never make. The bodies are also kept as files, so a repeat of the same
+# query by any client is a file read. Those writes do happen, so the
+# responses are not immutable: HISTORICAL_CACHE_CONTROL defaults to no-cache
+# and clients revalidate every time, which costs a 304 or a file read.
+
+HISTORICAL_DATA_VERSION = 'observations:historical'
+DATABASE_GENERATION = 'database:generation'
+
+app.config.setdefault('HISTORICAL_CACHE_CONTROL', os.getenv('HISTORICAL_CACHE_CONTROL', 'private, no-cache'))
+app.config.setdefault('RESULT_STORE_DIR', os.getenv('RESULT_STORE_DIR', os.path.join(app.instance_path, 'results')))
+app.config.setdefault('RESULT_STORE_MAX_FILES', int(os.getenv('RESULT_STORE_MAX_FILES', '2000')))
+app.config.setdefault('RESULT_STORE_MAX_ENTRY_BYTES', int(os.getenv('RESULT_STORE_MAX_ENTRY_BYTES', str(16 * 1024 * 1024))))
+
+
+def is_historical_query(args):
+    """True when end_date is before the current quarter (then every matching row is in a closed quarter)"""
+    value = args.get('end_date')
+    if not value or explain_requested(args):
+        return False
+    try:
+        end_date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    if end_date.tzinfo is not None:
+        end_date = end_date.replace(tzinfo=None) - end_date.utcoffset()
+    return end_date < get_current_quarter_start()
+
+
+class ResultStore:
+    """Response bodies of historical queries as <key>.json files in RESULT_STORE_DIR."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def path(self, key):
+        return os.path.join(app.config['RESULT_STORE_DIR'], f'{key}.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if len(body) > app.config['RESULT_STORE_MAX_ENTRY_BYTES']:
+            return
+        directory = app.config['RESULT_STORE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.result-', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+        # Readers see either no file or the whole body
+        os.replace(tmp_path, self.path(key))
+        self.writes += 1
+        if self.writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        # Keep the RESULT_STORE_MAX_FILES most recently written results
+        paths = glob.glob(os.path.join(app.config['RESULT_STORE_DIR'], '*.json'))
+        excess = len(paths) - app.config['RESULT_STORE_MAX_FILES']
+        if excess > 0:
+            for path in sorted(paths, key=os.path.getmtime)[:excess]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def use_database(self, generation):
+        """
+        Called at startup: empty the store if it was filled from another
+        database (a replaced database restarts its versions, so old keys could
+        match again). `generation` identifies the database, see init_database().
+        """
+        directory = app.config['RESULT_STORE_DIR']
+        marker = os.path.join(directory, 'DATABASE')
+        try:
+            with open(marker) as f:
+                if f.read().strip() == str(generation):
+                    return
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        with open(marker, 'w') as f:
+            f.write(str(generation))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes}
+
+
+result_store = ResultStore()
+
+
+def conditional_on_data_version(name='observations', historical=False):
+    """
+    Decorator for read endpoints: answer 304 Not Modified when If-None-Match
+    has the current ETag, otherwise run the view and attach the ETag to 200 responses.
+    The ETag covers the data version, path, query string, Accept header, the
+    caller's identity (some responses include the user) and the negotiated
+    Content-Encoding, so it changes whenever the response could. Apply it below the auth decorator.
+    historical=True: queries that end before the current quarter use the
+    historical data version, get HISTORICAL_CACHE_CONTROL and are served from
+    the result store.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            token_data = getattr(request, 'token_data', None) or {}
+            stored = historical and is_historical_query(request.args)
+            version_name = HISTORICAL_DATA_VERSION if stored else name
+            key = [
+                version_name, get_data_version(version_name), request.path,
+                sorted(request.args.items(multi=True)), request.headers.get('Accept', ''),
+                token_data.get('user_id'), token_data.get('product_name'),
+            ]
+            result_key = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+            etag = hashlib.sha1(json.dumps(key + [negotiate_encoding()], default=str).encode()).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                body = result_store.get(result_key) if stored else None
+                if body is not None:
+                    response = Response(body, mimetype='application/json')
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if stored and not response.is_streamed and response.mimetype == 'application/json':
+                        result_store.put(result_key, response.get_data())
+            response.set_etag(etag)
+            if stored:
+                response.headers['Cache-Control'] = app.config['HISTORICAL_CACHE_CONTROL']
+            return response
+        return decorated_function
+    return decorator
+
+
+# US-19: Create database tables once (now includes users)
+def init_database():
+    """
+    Make sure the database tables exist and seed a default test user.
+    Called once at startup by create_app(), never on the request path.
+    """
+    # Create all tables for Dataset, Observation, User, etc.
+    db.create_all()
+    # Add new columns/indexes to older databases and backfill lat/long
+    upgrade_observation_schema()
+    # A random number stored once per database file, so caches kept outside
+    # the database (the result store) can tell when it has been replaced
+    with db.engine.begin() as conn:
+        conn.execute(dialect_insert(conn, DataVersion.__table__)
+                     .values(name=DATABASE_GENERATION, version=random.randrange(1, 2 ** 31))
+                     .on_conflict_do_nothing(index_elements=['name']))
+    # If there are no users yet, create a simple test user for JWT login demos
+    if User.query.count() == 0:
+        test_user = User(username='testuser')  # Default username
+        test_user.set_password('testpass')     # Default password (hashed inside)
+        db.session.add(test_user)
+        db.session.commit()
+
+
+# ============================================
+# JWT IMPLEMENTATION (now using flask-jwt-extended)
+# ============================================
+# JWT config and User model are above; login endpoint and protected routes below
+
+
+# US-11: Helper function for quarter boundary checks
+def get_current_quarter_start():
+    """
+    US-11: Calculate the start date of the current quarter
+    Returns datetime object for the first day of current quarter at 00:00:00
+    """
+    now = datetime.now()
+    current_month = now.month
+    
+    # Determine quarter start month (1, 4, 7, or 10)
+    if current_month <= 3:
+        quarter_start_month = 1  # Q1: Jan-Mar
+    elif current_month <= 6:
+        quarter_start_month = 4  # Q2: Apr-Jun
+    elif current_month <= 9:
+        quarter_start_month = 7  # Q3: Jul-Sep
+    else:
+        quarter_start_month = 10  # Q4: Oct-Dec
+    
+    # Return first day of quarter at midnight
+    return datetime(now.year, quarter_start_month, 1, 0, 0, 0)
+
+
+# ============================================
+# KEYSET (CURSOR) PAGINATION
+# ============================================
+# Observation lists are ordered by (timestamp, id). A cursor holds the sort key
+# of the last row on a page, and the next page starts strictly after it. This
+# uses the timestamp index directly, so page 1000 costs the same as page 1
+# (unlike OFFSET, which has to walk past every skipped row).
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(obs):
+    """
+    Build an opaque cursor pointing just after the given observation.
+    Clients should treat it as a token and pass it back unchanged.
+    """
+    payload = json.dumps([obs.timestamp.isoformat(), obs.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor from encode_cursor() back into a (timestamp, id) tuple.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp_str, obs_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp_str), int(obs_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor. Use the next_cursor value from a previous response")
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """
+    Validate the 'limit' query parameter for a paginated list.
+    Returns an int between 1 and MAX_PAGE_SIZE, or raises ValueError.
+    """
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("Invalid limit. Use a whole number")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def page_query(query, cursor, limit):
+    """
+    The query paginate_observations runs: observation rows ordered by
+    (timestamp, id), starting after the cursor, limited to limit + 1 rows.
+    """
+    query = query.with_entities(*OBSERVATION_COLUMNS).order_by(Observation.timestamp, Observation.id)
+    if cursor:
+        after_timestamp, after_id = decode_cursor(cursor)
+        query = query.filter(db.tuple_(Observation.timestamp, Observation.id) > (after_timestamp, after_id))
+    return query.limit(limit + 1)
+
+
+def paginate_observations(query, cursor, limit):
+    """
+    Run an observation query one page at a time, ordered by (timestamp, id).
+    Returns (rows, next_cursor): rows are OBSERVATION_COLUMNS rows (wrap them
+    in ObservationRows to jsonify); next_cursor is None on the last page.
+    """
+    # Fetch one extra row to find out whether another page exists
+    observations = page_query(query, cursor, limit).all()
+    if len(observations) > limit:
+        observations = observations[:limit]
+        return observations, encode_cursor(observations[-1])
+    return observations, None
+
+
+# ============================================
+# QUERY PLAN DEBUGGING
+# ============================================
+# With QUERY_PLAN_DEBUG enabled, the list endpoints accept explain=true and
+# return the database's plan for the query they would run instead of the rows,
+# so each filter combination can be checked against the indexes.
+
+app.config.setdefault('QUERY_PLAN_DEBUG', os.getenv('QUERY_PLAN_DEBUG', 'false').lower() in ('1', 'true', 'yes'))
+INDEX_PATTERN = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+
+
+def explain_requested(args):
+    return app.config['QUERY_PLAN_DEBUG'] and args.get('explain', '').lower() in ('1', 'true', 'yes')
+
+
+def explain_query(query):
+    """
+    Return the SQL of an ORM query and its plan: EXPLAIN QUERY PLAN on SQLite,
+    EXPLAIN on other databases. Bound values are rendered inline so the
+    printed SQL can be pasted into a database shell.
+    """
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as conn:
+        if dialect.name == 'sqlite':
+            plan = [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+        else:
+            plan = [row[0] for row in conn.exec_driver_sql(f'EXPLAIN {sql}')]
+    return {
+        'sql': sql,
+        'plan': plan,
+        'indexes': sorted({name for line in plan for name in INDEX_PATTERN.findall(line)}),
+        # A SQLite "SCAN observations" without an index reads the whole table
+        'full_scan': any(line.startswith('SCAN observations') and 'INDEX' not in line for line in plan),
+    }
+
+
+# ============================================
+# SQL PROFILING (per request)
+# ============================================
+# Engine events time every statement a request runs. With SQL_PROFILE_HEADERS
+# (or in debug mode) the totals go out as X-DB-Query-Count / X-DB-Time-Ms /
+# Server-Timing headers; they are off by default because they tell any caller
+# how the database behaves. Statements slower than SQL_SLOW_QUERY_MS are
+# logged (a SQL_SLOW_QUERY_SAMPLE fraction of them, with their query plan),
+# and a statement repeated SQL_REPEAT_THRESHOLD times in one request is
+# reported as a likely N+1 pattern.
+
+app.config.setdefault('SQL_PROFILE', os.getenv('SQL_PROFILE', 'true').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('SQL_PROFILE_HEADERS', os.getenv('SQL_PROFILE_HEADERS', 'false').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('SQL_SLOW_QUERY_MS', float(os.getenv('SQL_SLOW_QUERY_MS', '100')))
+# Each sampled slow statement costs an extra EXPLAIN on the request's connection
+app.config.setdefault('SQL_SLOW_QUERY_SAMPLE', float(os.getenv('SQL_SLOW_QUERY_SAMPLE', '0.1')))
+app.config.setdefault('SQL_SLOW_QUERY_EXPLAIN', os.getenv('SQL_SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('SQL_REPEAT_THRESHOLD', int(os.getenv('SQL_REPEAT_THRESHOLD', '10')))  # 0 disables
+
+
+def explain_statement(cursor, dialect, statement, parameters):
+    # Plan of a statement that has just run, on the same DBAPI connection
+    prefix = 'EXPLAIN QUERY PLAN' if dialect.name == 'sqlite' else 'EXPLAIN'
+    explain = cursor.connection.cursor()
+    try:
+        explain.execute(f'{prefix} {statement}', parameters)
+        return [row[-1] if dialect.name == 'sqlite' else row[0] for row in explain.fetchall()]
+    finally:
+        explain.close()
+
+
+@db.event.listens_for(db.Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    if app.config['SQL_PROFILE'] and has_request_context():
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+
+@db.event.listens_for(db.Engine, 'after_cursor_execute')
+def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('statement_started')
+    if not started or not has_request_context():
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+
+    profile = g.get('sql_profile')
+    if profile is None:
+        profile = g.sql_profile = {'count': 0, 'time_ms': 0.0, 'statements': {}}
+    profile['count'] += 1
+    profile['time_ms'] += elapsed_ms
+    profile['statements'][statement] = profile['statements'].get(statement, 0) + 1
+
+    if elapsed_ms >= app.config['SQL_SLOW_QUERY_MS'] and random.random() < app.config['SQL_SLOW_QUERY_SAMPLE']:
+        plan = None
+        if app.config['SQL_SLOW_QUERY_EXPLAIN'] and not executemany:
+            try:
+                plan = explain_statement(cursor, conn.dialect, statement, parameters)
+            except Exception as e:   # EXPLAIN is best effort; never fail the request over it
+                plan = [f'EXPLAIN failed: {e}']
+        app.logger.warning('Slow query (%.1f ms) in %s %s: %s | plan: %s',
+                           elapsed_ms, request.method, request.path, ' '.join(statement.split()), plan)
+
+
+@db.event.listens_for(db.Engine, 'handle_error')
+def discard_statement_timer(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('statement_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+@app.after_request
+def add_sql_profile_headers(response):
+    profile = g.get('sql_profile')
+    if profile is None:
+        return response
+    send_headers = app.config['SQL_PROFILE_HEADERS'] or app.debug
+    if send_headers:
+        response.headers['X-DB-Query-Count'] = str(profile['count'])
+        response.headers['X-DB-Time-Ms'] = f"{profile['time_ms']:.2f}"
+        response.headers.add('Server-Timing', f"db;dur={profile['time_ms']:.2f};desc=\"{profile['count']} queries\"")
+
+    threshold = app.config['SQL_REPEAT_THRESHOLD']
+    if threshold:
+        repeated = {sql: n for sql, n in profile['statements'].items() if n >= threshold}
+        if repeated:
+            if send_headers:
+                response.headers['X-DB-Repeated-Statements'] = str(len(repeated))
+            for sql, n in repeated.items():
+                app.logger.warning('Possible N+1: statement ran %d times in %s %s: %s',
+                                   n, request.method, request.path, ' '.join(sql.split()))
+    return response
+
+
+# ============================================
+# METRICS (Prometheus text format at /metrics)
+# ============================================
+# Each process keeps its metric values in its own memory-mapped file under
+# METRICS_DIR (metrics-<pid>.bin), so recording is a dictionary lookup and a
+# float update with no cross-process locking. /metrics reads every process's
+# file and sums them: counters and histograms of exited workers are kept,
+# gauges only count live processes. Files of dead processes are removed by
+# create_app(), i.e. when the server (re)starts.
+
+app.config.setdefault('METRICS_ENABLED', os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('METRICS_DIR', os.getenv('METRICS_DIR', os.path.join(app.instance_path, 'metrics')))
+app.config.setdefault('METRICS_MAX_SERIES', int(os.getenv('METRICS_MAX_SERIES', '4096')))  # per process
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help). Stored keys are "name|labels|part"; part is the bucket
+# upper bound, "sum" or "count" for histograms and empty otherwise.
+METRIC_TYPES = {
+    'terrascope_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status code.'),
+    'terrascope_http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint and method.'),
+    'terrascope_http_requests_in_progress': ('gauge', 'HTTP requests currently being handled.'),
+    'terrascope_observations_ingested_total': ('counter', 'Observations stored, by ingest path.'),
+    'terrascope_observations_rejected_total': ('counter', 'Observations rejected by validation, by ingest path.'),
+    'terrascope_db_pool_connections': ('gauge', 'Open database connections held by connection pools.'),
+    'terrascope_db_pool_checked_out': ('gauge', 'Database connections currently checked out of the pool.'),
+}
+
+METRICS_HEADER = struct.Struct('<Q')            # number of records in use
+METRICS_RECORD = struct.Struct('<184sd')        # key (utf-8, NUL padded), value
+METRICS_VALUE = struct.Struct('<d')
+
+
+def process_alive(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return True   # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """This process's metric values, in a file other workers can read."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # Also called in forked children: they must not write the parent's file
+        self.map = None
+        self.offsets = {}
+        self.used = 0
+        self.dropped_series = 0
+        self.pending = {}   # updates made before the file was opened
+
+    def open(self):
+        directory = app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        capacity = app.config['METRICS_MAX_SERIES']
+        size = METRICS_HEADER.size + capacity * METRICS_RECORD.size
+        fd = os.open(os.path.join(directory, f'metrics-{os.getpid()}.bin'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        # A file left by an earlier process with the same pid: keep its
+        # counters (they only go up), zero its gauges
+        self.used = min(METRICS_HEADER.unpack_from(self.map, 0)[0], capacity)
+        for index in range(self.used):
+            offset = METRICS_HEADER.size + index * METRICS_RECORD.size
+            key = METRICS_RECORD.unpack_from(self.map, offset)[0].rstrip(b'\0').decode()
+            self.offsets[key] = offset + METRICS_RECORD.size - METRICS_VALUE.size
+            if METRIC_TYPES.get(key.split('|', 1)[0], ('',))[0] == 'gauge':
+                METRICS_VALUE.pack_into(self.map, self.offsets[key], 0.0)
+        self.apply(list(self.pending.items()))
+        self.pending.clear()
+
+    def allocate(self, key):
+        if self.used >= app.config['METRICS_MAX_SERIES'] or len(key.encode()) > 184:
+            self.dropped_series += 1
+            return None
+        offset = METRICS_HEADER.size + self.used * METRICS_RECORD.size
+        METRICS_RECORD.pack_into(self.map, offset, key.encode(), 0.0)
+        # Publish the record only after it is written
+        self.used += 1
+        METRICS_HEADER.pack_into(self.map, 0, self.used)
+        self.offsets[key] = offset + METRICS_RECORD.size - METRICS_VALUE.size
+        return self.offsets[key]
+
+    def apply(self, updates):
+        for key, amount in updates:
+            offset = self.offsets.get(key)
+            if offset is None:
+                offset = self.allocate(key)
+                if offset is None:
+                    continue
+            METRICS_VALUE.pack_into(self.map, offset, METRICS_VALUE.unpack_from(self.map, offset)[0] + amount)
+
+    def add_many(self, updates, open_file=True):
+        """
+        Apply [(key, amount), ...] under one lock acquisition. With
+        open_file=False a process that has not served a request yet (e.g. a
+        CLI command) only keeps the updates in memory until it does.
+        """
+        with self.lock:
+            if self.map is None:
+                if not open_file:
+                    for key, amount in updates:
+                        self.pending[key] = self.pending.get(key, 0.0) + amount
+                    return
+                self.open()
+            self.apply(updates)
+
+    def add(self, key, amount=1.0, open_file=True):
+        self.add_many(((key, amount),), open_file)
+
+    def collect(self):
+        """Sum the values of every process's file: {key: value}."""
+        totals = {}
+        for path in glob.glob(os.path.join(app.config['METRICS_DIR'], 'metrics-*.bin')):
+            try:
+                pid = int(os.path.basename(path)[len('metrics-'):-len('.bin')])
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except (ValueError, OSError):
+                continue
+            alive = process_alive(pid)
+            used = METRICS_HEADER.unpack_from(data, 0)[0] if len(data) >= METRICS_HEADER.size else 0
+            used = min(used, (len(data) - METRICS_HEADER.size) // METRICS_RECORD.size)
+            for index in range(used):
+                key, value = METRICS_RECORD.unpack_from(data, METRICS_HEADER.size + index * METRICS_RECORD.size)
+                key = key.rstrip(b'\0').decode()
+                if not alive and METRIC_TYPES.get(key.split('|', 1)[0], ('',))[0] == 'gauge':
+                    continue
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def remove_dead_files(self):
+        for path in glob.glob(os.path.join(app.config['METRICS_DIR'], 'metrics-*.bin')):
+            try:
+                if not process_alive(int(os.path.basename(path)[len('metrics-'):-len('.bin')])):
+                    os.remove(path)
+            except (ValueError, OSError):
+                continue
+
+
+metrics = MetricsRegistry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=metrics.reset)
+
+
+def format_metric_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render_metrics(totals):
+    """Prometheus text exposition (version 0.0.4) of collect() output."""
+    series = {}
+    for key, value in totals.items():
+        name, labels, part = key.split('|', 2)
+        series.setdefault(name, {}).setdefault(labels, {})[part] = value
+
+    lines = []
+    for name, (kind, help_text) in METRIC_TYPES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, parts in sorted(series.get(name, {}).items()):
+            if kind == 'histogram':
+                prefix = f'{labels},' if labels else ''
+                cumulative = 0.0
+                for bound in LATENCY_BUCKETS:
+                    cumulative += parts.get(repr(bound), 0.0)
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound!r}"}} {format_metric_value(cumulative)}')
+                count = parts.get('count', 0.0)
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {format_metric_value(count)}')
+                lines.append(f'{name}_sum{{{labels}}} {format_metric_value(parts.get("sum", 0.0))}')
+                lines.append(f'{name}_count{{{labels}}} {format_metric_value(count)}')
+            else:
+                selector = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}{selector} {format_metric_value(parts.get("", 0.0))}')
+    return '\n'.join(lines) + '\n'
+
+
+def count_ingest(path, stored, rejected=0):
+    # Called once the observations are committed
+    if app.config['METRICS_ENABLED']:
+        metrics.add_many((
+            (f'terrascope_observations_ingested_total|path="{path}"|', stored),
+            (f'terrascope_observations_rejected_total|path="{path}"|', rejected),
+        ))
+
+
+@app.before_request
+def start_request_metrics():
+    if app.config['METRICS_ENABLED']:
+        g.metrics_started = time.perf_counter()
+        metrics.add('terrascope_http_requests_in_progress||', 1)
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    labels = f'endpoint="{request.endpoint or "unmatched"}",method="{request.method}"'
+    index = bisect.bisect_left(LATENCY_BUCKETS, elapsed)
+    name = 'terrascope_http_request_duration_seconds'
+    updates = [
+        (f'terrascope_http_requests_total|{labels},status="{response.status_code}"|', 1),
+        (f'{name}|{labels}|sum', elapsed),
+        (f'{name}|{labels}|count', 1),
+    ]
+    if index < len(LATENCY_BUCKETS):
+        updates.append((f'{name}|{labels}|{LATENCY_BUCKETS[index]!r}', 1))
+    metrics.add_many(updates)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    # Runs even when the response failed, and after a streamed response ends
+    if g.pop('metrics_started', None) is not None:
+        metrics.add('terrascope_http_requests_in_progress||', -1)
+
+
+# Each connection remembers which process counted it, so a pool inherited
+# through fork is not subtracted from the child's gauges
+@db.event.listens_for(db.Pool, 'connect')
+def count_pool_connect(dbapi_connection, connection_record):
+    connection_record.info['metrics_connected'] = os.getpid()
+    metrics.add('terrascope_db_pool_connections||', 1, open_file=False)
+
+
+@db.event.listens_for(db.Pool, 'close')
+def count_pool_close(dbapi_connection, connection_record):
+    if connection_record.info.pop('metrics_connected', None) == os.getpid():
+        metrics.add('terrascope_db_pool_connections||', -1, open_file=False)
+
+
+@db.event.listens_for(db.Pool, 'checkout')
+def count_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['metrics_checked_out'] = os.getpid()
+    metrics.add('terrascope_db_pool_checked_out||', 1, open_file=False)
+
+
+@db.event.listens_for(db.Pool, 'checkin')
+def count_pool_checkin(dbapi_connection, connection_record):
+    if connection_record.info.pop('metrics_checked_out', None) == os.getpid():
+        metrics.add('terrascope_db_pool_checked_out||', -1, open_file=False)
+
+
+# ============================================
+# STREAMING RESPONSES (NDJSON / chunked JSON array)
+# ============================================
+# For large result sets the list endpoints can stream rows instead of building
+# one big list + dict in memory. The query is read in batches with yield_per,
+# each batch is serialised and sent, and the ORM objects are then released, so
+# memory stays flat and the first bytes go out as soon as the first batch is read.
+
+STREAM_BATCH_SIZE = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def requested_stream_format(args, headers):
+    """
+    Work out whether the client asked for a streamed response.
+    Returns 'ndjson' (format=ndjson or Accept: application/x-ndjson),
+    'json-stream' (format=json-stream, a chunked JSON array) or None.
+    """
+    fmt = args.get('format', '').lower()
+    if fmt in ('ndjson', 'json-stream'):
+        return fmt
+    if NDJSON_MIMETYPE in headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+
+def stream_observations(query, fmt):
+    """
+    Build a streaming Response for an observation query, ordered by (timestamp, id).
+    'ndjson' sends one JSON object per line; 'json-stream' sends a single JSON
+    array in chunks. Rows are fetched STREAM_BATCH_SIZE at a time.
+    """
+    query = (
+        query.with_entities(*OBSERVATION_COLUMNS)
+        .order_by(Observation.timestamp, Observation.id)
+        .yield_per(STREAM_BATCH_SIZE)
+    )
+
+    ndjson = fmt == 'ndjson'
+
+    def encode_chunk(rows, first):
+        # NDJSON: one object per line. JSON array: comma-separated, with a
+        # leading comma on every chunk after the first
+        if ndjson:
+            return '\n'.join(rows) + '\n'
+        return ('' if first else ',') + ','.join(rows)
+
+    def generate():
+        if not ndjson:
+            yield '['
+        chunk = []
+        first = True
+        for row in query:
+            chunk.append(json.dumps(observation_record(row), ensure_ascii=False, separators=(',', ':')))
+            if len(chunk) >= STREAM_BATCH_SIZE:
+                yield encode_chunk(chunk, first)
+                first = False
+                chunk = []
+        if chunk:
+            yield encode_chunk(chunk, first)
+        if not ndjson:
+            yield ']'
+
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    # stream_with_context keeps the DB session alive while the generator runs
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+# ============================================
+# COLUMNAR BINARY EXPORT
+# ============================================
+# Bulk downloads can be sent as typed column arrays instead of JSON rows.
+# Layout of an export (all numbers little-endian):
+#   bytes 0-7    magic b"TSCOL1\0\0"
+#   bytes 8-11   uint32 length of the JSON header
+#   bytes 12-    JSON header: row count, data_offset, and for every column its
+#                name, NumPy dtype, offset (from data_offset) and size in bytes
+#   data_offset  column buffers, each starting on a 64-byte boundary
+# Because every column is a plain aligned array, a client can np.memmap the
+# downloaded file and view each column without copying (see read_columnar_export).
+
+COLUMNAR_MAGIC = b'TSCOL1\x00\x00'
+COLUMNAR_ALIGNMENT = 64
+COLUMNAR_MIMETYPE = 'application/vnd.terrascope.columnar'
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def _align(offset):
+    # Round offset up to the next COLUMNAR_ALIGNMENT boundary
+    return -(-offset // COLUMNAR_ALIGNMENT) * COLUMNAR_ALIGNMENT
+
+
+def build_columnar_export(rows, statistics=False):
+    """
+    Encode observation rows into the columnar export format.
+    rows is any iterable of objects with id, timestamp, latitude, longitude,
+    satellite_id and spectral_indices attributes (ORM objects or Core rows).
+
+    Columns: id (int64), timestamp (int64 microseconds since the Unix epoch, UTC),
+    latitude/longitude (float64, NaN if unknown), satellite_id (int32 codes into
+    the header's satellite_id dictionary, -1 if unknown) and one float64
+    "band.<name>" column per spectral band seen (NaN where a row lacks it).
+    statistics=True also records each numeric column's min and max (ignoring
+    NaN) in the header, as sealed segments do for pruning.
+    """
+    nan = float('nan')
+    ids = array('q')
+    timestamps = array('q')
+    latitudes = array('d')
+    longitudes = array('d')
+    satellite_codes = array('i')
+    satellites = {}   # satellite_id -> dictionary code
+    bands = {}        # band name -> array('d')
+    microsecond = timedelta(microseconds=1)
+
+    for count, row in enumerate(rows):
+        ids.append(row.id)
+        timestamps.append((row.timestamp - UNIX_EPOCH) // microsecond)
+        latitudes.append(nan if row.latitude is None else row.latitude)
+        longitudes.append(nan if row.longitude is None else row.longitude)
+        if row.satellite_id is None:
+            satellite_codes.append(-1)
+        else:
+            satellite_codes.append(satellites.setdefault(row.satellite_id, len(satellites)))
+
+        for band, value in parse_spectral_indices(row.spectral_indices).items():
+            column = bands.get(band)
+            if column is None:
+                # First time this band appears: earlier rows did not have it
+                column = bands[band] = array('d', [nan]) * count
+            column.append(value)
+        # Pad bands this row did not include
+        for column in bands.values():
+            if len(column) == count:
+                column.append(nan)
+
+    columns = [
+        ('id', ids, '<i8'),
+        ('timestamp', timestamps, '<i8'),
+        ('latitude', latitudes, '<f8'),
+        ('longitude', longitudes, '<f8'),
+        ('satellite_id', satellite_codes, '<i4'),
+    ] + [(f'band.{band}', values, '<f8') for band, values in sorted(bands.items())]
+
+    if statistics:
+        column_stats = {}
+        for name, values, dtype in columns:
+            if name != 'satellite_id':
+                present = [v for v in values if v == v] if dtype == '<f8' else values
+                if present:
+                    column_stats[name] = (min(present), max(present))
+    for index, (name, values, dtype) in enumerate(columns):
+        if sys.byteorder == 'big':
+            values.byteswap()
+        columns[index] = (name, values.tobytes(), dtype)
+
+    header = encode_columnar_header(len(ids), columns, {'satellite_id': list(satellites)})
+    header['columns'][1]['unit'] = 'us'
+    if statistics:
+        for column in header['columns']:
+            if column['name'] in column_stats:
+                column['min'], column['max'] = column_stats[column['name']]
+    return encode_columnar(header, columns)
+
+
+def encode_columnar_header(row_count, columns, dictionaries):
+    # Lay out (name, data bytes, dtype) columns on 64-byte boundaries
+    column_info = []
+    offset = 0
+    for name, data, dtype in columns:
+        offset = _align(offset)
+        column_info.append({'name': name, 'dtype': dtype, 'offset': offset, 'nbytes': len(data)})
+        offset += len(data)
+    return {
+        'format': 'terrascope-columnar',
+        'version': 1,
+        'rows': row_count,
+        'columns': column_info,
+        'dictionaries': dictionaries,
+    }
+
+
+def encode_columnar(header, columns):
+    """
+    Write the magic, header and column buffers of a columnar file.
+    header comes from encode_columnar_header; columns are the same
+    (name, data bytes, dtype) triples.
+    """
+    # data_offset depends on the header size and is itself part of the header,
+    # so measure the header once and leave 16 spare bytes for the offset's digits
+    header['data_offset'] = 0
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    header['data_offset'] = _align(12 + len(header_bytes) + 16)
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+
+    last = header['columns'][-1]
+    payload = bytearray(header['data_offset'] + last['offset'] + last['nbytes'])
+    payload[0:8] = COLUMNAR_MAGIC
+    payload[8:12] = len(header_bytes).to_bytes(4, 'little')
+    payload[12:12 + len(header_bytes)] = header_bytes
+    for column, (_, data, _) in zip(header['columns'], columns):
+        start = header['data_offset'] + column['offset']
+        payload[start:start + len(data)] = data
+    return bytes(payload)
+
+
+def read_columnar_export(buffer):
+    """
+    Decode a columnar export with NumPy.
+    buffer can be bytes or a np.memmap of a downloaded file; the returned arrays
+    are zero-copy views into it. Returns (header, {column name: ndarray}).
+    """
+    import numpy as np
+
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    if bytes(raw[:8]) != COLUMNAR_MAGIC:
+        raise ValueError("Not a TerraScope columnar export")
+    header_length = int.from_bytes(bytes(raw[8:12]), 'little')
+    header = json.loads(bytes(raw[12:12 + header_length]))
+
+    columns = {}
+    for column in header['columns']:
+        columns[column['name']] = np.frombuffer(
+            raw, dtype=np.dtype(column['dtype']), count=header['rows'],
+            offset=header['data_offset'] + column['offset']
+        )
+    return header, columns
+
+
+# ============================================
+# RESPONSE COMPRESSION
+# ============================================
+# JSON, NDJSON and columnar responses are compressed with the best encoding
+# the client accepts (Accept-Encoding): zstd and br when the zstandard /
+# brotli modules are installed, gzip always. Streamed responses are
+# compressed chunk by chunk and flushed after every chunk, so rows still reach
+# the client as they are produced. Bodies of responses with an ETag (the
+# conditional_on_data_version endpoints, whose ETag covers the encoding) are
+# kept compressed in an LRU, so a hot, unchanged result is not compressed again.
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is offered only when installed
+    zstandard = None
+try:
+    import brotli
+except ImportError:  # optional: br is offered only when installed
+    brotli = None
+
+app.config.setdefault('COMPRESSION_ENABLED', os.getenv('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('COMPRESSION_MIN_BYTES', int(os.getenv('COMPRESSION_MIN_BYTES', '1024')))
+app.config.setdefault('COMPRESSION_LEVELS', json.loads(os.getenv('COMPRESSION_LEVELS', '{"zstd": 3, "br": 5, "gzip": 6}')))
+app.config.setdefault('COMPRESSION_CACHE_BYTES', int(os.getenv('COMPRESSION_CACHE_BYTES', str(32 * 1024 * 1024))))
+
+COMPRESSIBLE_MIMETYPES = {'application/json', NDJSON_MIMETYPE, COLUMNAR_MIMETYPE}
+# In order of preference when the client accepts several equally
+CONTENT_ENCODINGS = [name for name, module in (('zstd', zstandard), ('br', brotli), ('gzip', gzip)) if module]
+
+
+def negotiate_encoding():
+    """The Content-Encoding to use for this request, or None for identity"""
+    if not app.config['COMPRESSION_ENABLED']:
+        return None
+    return request.accept_encodings.best_match(CONTENT_ENCODINGS)
+
+
+def compress_body(body, encoding):
+    level = app.config['COMPRESSION_LEVELS'][encoding]
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental compressor; every compress() call returns independently decodable output."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        level = app.config['COMPRESSION_LEVELS'][encoding]
+        if encoding == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+        else:
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+
+    def compress(self, data):
+        if self.encoding == 'zstd':
+            return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compressed_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class BodyCache:
+    """Thread-safe LRU of encoded response bodies, bounded in bytes by app.config[limit_setting]."""
+
+    def __init__(self, limit_setting):
+        self.limit_setting = limit_setting
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        limit = app.config[self.limit_setting]
+        if len(body) > limit // 8:
+            return  # one large body would flush everything else
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > limit:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+# Compressed bodies keyed by (ETag, encoding)
+compressed_bodies = BodyCache('COMPRESSION_CACHE_BYTES')
+# Encoded density tiles keyed by (density version, z, x, y)
+tile_bodies = BodyCache('TILE_CACHE_BYTES')
+
+
+@app.after_request
+def compress_response(response):
+    # Registered after the usage and metrics hooks, so it runs before them and
+    # they count the bytes actually sent
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code != 200
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compressed_stream(response.response, encoding)
+    else:
+        etag = response.get_etag()[0]
+        body = compressed_bodies.get((etag, encoding)) if etag else None
+        if body is None:
+            body = response.get_data()
+            if len(body) < app.config['COMPRESSION_MIN_BYTES']:
+                return response
+            body = compress_body(body, encoding)
+            if etag:
+                compressed_bodies.put((etag, encoding), body)
+        response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# ============================================
+# SEALED QUARTERLY SEGMENTS
+# ============================================
+# Observations before get_current_quarter_start() cannot be edited (PUT/PATCH
+# return 403), so each closed quarter can be compacted into a read-only
+# columnar segment file (the export format above, with min/max statistics in
+# its header) by `flask compact-segments`. GET /api/observations/export then
+# memory-maps the segments instead of querying those quarters. It skips any
+# segment whose statistics rule out the filters and reads the column arrays
+# in place. Rows stay in the observations table, which remains the source of
+# truth for every other endpoint. Back-dated inserts (bulk or POST) can still
+# add rows to a closed quarter; the write marks that quarter's segment stale,
+# in the same transaction, and stale segments are ignored until the next
+# compaction reseals them.
+
+app.config.setdefault('SEGMENT_DIR', os.getenv('SEGMENT_DIR', os.path.join(app.instance_path, 'segments')))
+
+
+class ObservationSegment(db.Model):
+    __tablename__ = "observation_segments"
+
+    quarter_start = db.Column(db.DateTime, primary_key=True)       # First instant of the quarter
+    quarter_end = db.Column(db.DateTime, nullable=False)           # First instant of the next quarter
+    path = db.Column(db.String(500), nullable=False)               # Segment file
+    row_count = db.Column(db.Integer, nullable=False)
+    min_timestamp = db.Column(db.DateTime, nullable=True)
+    max_timestamp = db.Column(db.DateTime, nullable=True)
+    min_latitude = db.Column(db.Float, nullable=True)
+    max_latitude = db.Column(db.Float, nullable=True)
+    min_longitude = db.Column(db.Float, nullable=True)
+    max_longitude = db.Column(db.Float, nullable=True)
+    stats = db.Column(db.Text, nullable=True)                      # JSON: satellites list, {band: [min, max]}
+    stale = db.Column(db.Boolean, nullable=False, default=False)   # Observations changed since sealing
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ObservationSegment {self.quarter_start.date()} rows={self.row_count}{' stale' if self.stale else ''}>"
+
+
+def quarter_start_for(timestamp):
+    return datetime(timestamp.year, 3 * ((timestamp.month - 1) // 3) + 1, 1)
+
+
+def next_quarter_start(start):
+    return datetime(start.year + (start.month == 10), (start.month + 2) % 12 + 1, 1)
+
+
+def mark_segments_stale(conn, timestamps):
+    # Flag the sealed segments of any closed quarter these observation timestamps
+    # fall in, and invalidate the stored historical query results
+    cutoff = get_current_quarter_start()
+    quarters = {quarter_start_for(ts) for ts in timestamps if ts is not None and ts < cutoff}
+    if quarters:
+        table = ObservationSegment.__table__
+        conn.execute(table.update().where(table.c.quarter_start.in_(quarters)).values(stale=True))
+        bump_data_version(conn, HISTORICAL_DATA_VERSION)
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def invalidate_sealed_segments(session, flush_context):
+    timestamps = []
+    for obs in session.new:
+        if isinstance(obs, Observation):
+            timestamps.append(obs.timestamp)
+    for obs in list(session.dirty) + list(session.deleted):
+        if isinstance(obs, Observation):
+            timestamps.append(obs.timestamp)
+            timestamps.extend(db.inspect(obs).attrs.timestamp.history.deleted)
+    if timestamps:
+        mark_segments_stale(session.connection(), timestamps)
+
+
+def seal_quarter(start, end, segment_dir):
+    """
+    Write one closed quarter to a new segment file and record it, replacing
+    any previous segment for the quarter. Returns the ObservationSegment
+    values, or None if the quarter is empty or gained rows while being written
+    (it is then retried on the next run).
+    """
+    table = Observation.__table__
+    segments = ObservationSegment.__table__
+    in_quarter = db.and_(table.c.timestamp >= start, table.c.timestamp < end)
+
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            db.select(table.c.id, table.c.timestamp, table.c.latitude, table.c.longitude,
+                      table.c.satellite_id, table.c.spectral_indices)
+            .where(in_quarter)
+            .order_by(table.c.timestamp, table.c.id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        body = build_columnar_export(rows, statistics=True)
+
+    header = json.loads(body[12:12 + int.from_bytes(body[8:12], 'little')])
+    if not header['rows']:
+        return None
+    stats = {column['name']: (column['min'], column['max']) for column in header['columns'] if 'min' in column}
+    timestamp_range = [UNIX_EPOCH + timedelta(microseconds=value) for value in stats['timestamp']]
+    latitude_range = stats.get('latitude', (None, None))
+    longitude_range = stats.get('longitude', (None, None))
+
+    # A new file name each time, so readers that still have the old segment mapped are unaffected
+    path = os.path.join(segment_dir, f'observations-{start.year}Q{(start.month + 2) // 3}-{uuid.uuid4().hex[:8]}.tscol')
+    with open(path, 'wb') as f:
+        f.write(body)
+
+    values = {
+        'quarter_start': start, 'quarter_end': end, 'path': path, 'row_count': header['rows'],
+        'min_timestamp': timestamp_range[0], 'max_timestamp': timestamp_range[1],
+        'min_latitude': latitude_range[0], 'max_latitude': latitude_range[1],
+        'min_longitude': longitude_range[0], 'max_longitude': longitude_range[1],
+        'stats': json.dumps({
+            'satellites': header['dictionaries']['satellite_id'],
+            'bands': {name[5:]: value for name, value in stats.items() if name.startswith('band.')},
+        }),
+        'stale': False, 'created_at': datetime.utcnow(),
+    }
+    with db.engine.begin() as conn:
+        # Closed quarters only ever gain rows, so an unchanged count means the file is complete
+        if conn.execute(db.select(db.func.count()).where(in_quarter)).scalar() != header['rows']:
+            os.remove(path)
+            return None
+        previous = conn.execute(db.select(segments.c.path).where(segments.c.quarter_start == start)).scalar()
+        conn.execute(segments.delete().where(segments.c.quarter_start == start))
+        conn.execute(segments.insert().values(**values))
+
+    if previous and previous != path:
+        try:
+            os.remove(previous)
+        except OSError:
+            pass
+    return values
+
+
+def compact_closed_quarters(segment_dir=None):
+    """
+    Seal every closed quarter that has observations but no segment, or only a
+    stale one. Returns the values of the segments written.
+    """
+    segment_dir = segment_dir or app.config['SEGMENT_DIR']
+    os.makedirs(segment_dir, exist_ok=True)
+    first = db.session.execute(db.select(db.func.min(Observation.timestamp))).scalar()
+    if first is None:
+        return []
+
+    sealed = {segment.quarter_start: segment for segment in ObservationSegment.query.all()}
+    cutoff = get_current_quarter_start()
+    written = []
+    start = quarter_start_for(first)
+    while start < cutoff:
+        end = next_quarter_start(start)
+        segment = sealed.get(start)
+        if segment is None or segment.stale or not os.path.exists(segment.path):
+            values = seal_quarter(start, end, segment_dir)
+            if values:
+                written.append(values)
+        start = end
+    return written
+
+
+def parse_segment_filters(args):
+    """
+    The list filters in the form the segment scan needs. Call after the SQL
+    filter functions, which have already rejected invalid values.
+    """
+    filters = {'bands': parse_band_ranges(args)}
+    for name in ('start_date', 'end_date'):
+        if args.get(name):
+            filters[name] = datetime.fromisoformat(args[name].replace('Z', '+00:00')).replace(tzinfo=None)
+    if args.get('satellite_id'):
+        filters['satellites'] = [part.strip() for part in args['satellite_id'].split(',') if part.strip()]
+    if args.get('lat') and args.get('long'):
+        lat, lon = float(args['lat']), float(args['long'])
+        if args.get('radius_km'):
+            # Same bounding boxes and equirectangular check as radius_conditions
+            lat_delta, lon_scale, boxes = radius_search_area(lat, lon, float(args['radius_km']))
+            filters['radius'] = (lat, lon, lon_scale, lat_delta, boxes)
+        else:
+            filters['boxes'] = [(lat, lat, lon, lon)]
+    if args.get('min_lat'):
+        filters.setdefault('boxes', []).append(
+            tuple(float(args[name]) for name in ('min_lat', 'max_lat', 'min_long', 'max_long'))
+        )
+    return filters
+
+
+def segment_may_match(segment, filters):
+    # Prune with the segment statistics: False means no row can match
+    stats = json.loads(segment.stats or '{}')
+    if 'start_date' in filters and segment.max_timestamp < filters['start_date']:
+        return False
+    if 'end_date' in filters and segment.min_timestamp > filters['end_date']:
+        return False
+    if 'satellites' in filters and not set(filters['satellites']) & set(stats.get('satellites', [])):
+        return False
+    for min_lat, max_lat, min_lon, max_lon in filters.get('boxes', []):
+        if segment.min_latitude is None or segment.min_latitude > max_lat or segment.max_latitude < min_lat \
+                or segment.min_longitude > max_lon or segment.max_longitude < min_lon:
+            return False
+    if 'radius' in filters:
+        if segment.min_latitude is None or not any(
+            segment.min_latitude <= max_lat and segment.max_latitude >= min_lat
+            and segment.min_longitude <= max_lon and segment.max_longitude >= min_lon
+            for min_lat, max_lat, min_lon, max_lon, _ in filters['radius'][4]
+        ):
+            return False
+    for band, bounds in filters['bands'].items():
+        low, high = stats.get('bands', {}).get(band, (None, None))
+        if low is None or ('min' in bounds and high < bounds['min']) or ('max' in bounds and low > bounds['max']):
+            return False
+    return True
+
+
+def segment_mask(np, header, columns, filters):
+    """
+    Boolean row mask for the filters over one segment's column arrays, or None
+    when every row matches. Mirrors the SQL filters in apply_*_filters.
+    """
+    mask = np.ones(header['rows'], dtype=bool)
+    microsecond = timedelta(microseconds=1)
+    if 'start_date' in filters:
+        mask &= columns['timestamp'] >= (filters['start_date'] - UNIX_EPOCH) // microsecond
+    if 'end_date' in filters:
+        mask &= columns['timestamp'] <= (filters['end_date'] - UNIX_EPOCH) // microsecond
+    if 'satellites' in filters:
+        dictionary = header['dictionaries']['satellite_id']
+        codes = [dictionary.index(s) for s in filters['satellites'] if s in dictionary]
+        mask &= np.isin(columns['satellite_id'], codes)
+    latitude, longitude = columns['latitude'], columns['longitude']
+    for min_lat, max_lat, min_lon, max_lon in filters.get('boxes', []):
+        mask &= (latitude >= min_lat) & (latitude <= max_lat) & (longitude >= min_lon) & (longitude <= max_lon)
+    if 'radius' in filters:
+        lat, lon, lon_scale, lat_delta, boxes = filters['radius']
+        inside = np.zeros(header['rows'], dtype=bool)
+        for min_lat, max_lat, min_lon, max_lon, shift in boxes:
+            inside |= (latitude >= min_lat) & (latitude <= max_lat) & (longitude >= min_lon) & (longitude <= max_lon) \
+                & ((latitude - lat) ** 2 + ((longitude + shift - lon) * lon_scale) ** 2 <= lat_delta * lat_delta)
+        mask &= inside
+    for band, bounds in filters['bands'].items():
+        values = columns.get(f'band.{band}')
+        if values is None:
+            return np.zeros(header['rows'], dtype=bool)
+        # NaN (band missing on the row) fails every comparison, as in SQL
+        mask &= values >= bounds.get('min', -np.inf)
+        mask &= values <= bounds.get('max', np.inf)
+    return None if mask.all() else mask
+
+
+def read_sealed_segments(args):
+    """
+    Scan the sealed segments for the export filters in args.
+    Returns (parts, sealed_ranges): parts is a list of (header, columns, mask)
+    for the segments with matching rows, columns being zero-copy views of the
+    memory-mapped file; sealed_ranges are the (start, end) timestamp ranges the
+    segments cover, which the caller must exclude from its table query.
+    Needs NumPy; without it ([], []) is returned and the table serves everything.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [], []
+
+    segments = [
+        segment for segment in ObservationSegment.query.filter_by(stale=False).order_by(ObservationSegment.quarter_start)
+        if os.path.exists(segment.path)
+    ]
+    filters = parse_segment_filters(args)
+    parts = []
+    sealed_ranges = []
+    for segment in segments:
+        # Adjacent quarters merge into one range to keep the exclusion short
+        if sealed_ranges and sealed_ranges[-1][1] == segment.quarter_start:
+            sealed_ranges[-1] = (sealed_ranges[-1][0], segment.quarter_end)
+        else:
+            sealed_ranges.append((segment.quarter_start, segment.quarter_end))
+        if not segment_may_match(segment, filters):
+            continue
+        header, columns = read_columnar_export(np.memmap(segment.path, dtype=np.uint8, mode='r'))
+        mask = segment_mask(np, header, columns, filters)
+        if mask is None or mask.any():
+            parts.append((header, columns, mask))
+    return parts, sealed_ranges
+
+
+def merge_columnar_parts(parts):
+    """
+    Combine (header, columns, mask) parts into one columnar export ordered by
+    (timestamp, id): satellite dictionaries are unified and band columns
+    missing from a part are filled with NaN.
+    """
+    import numpy as np
+
+    satellites = {}
+    bands = sorted({name for _, columns, _ in parts for name in columns if name.startswith('band.')})
+    merged = {name: [] for name in ('id', 'timestamp', 'latitude', 'longitude', 'satellite_id', *bands)}
+    for header, columns, mask in parts:
+        select = (lambda values: values) if mask is None else (lambda values: values[mask])
+        count = header['rows'] if mask is None else int(mask.sum())
+        # Map this part's satellite codes into the merged dictionary; index -1 stays -1
+        remap = np.array([satellites.setdefault(s, len(satellites)) for s in header['dictionaries']['satellite_id']]
+                         + [-1], dtype='<i4')
+        merged['satellite_id'].append(remap[select(columns['satellite_id'])])
+        for name in merged:
+            if name == 'satellite_id':
+                continue
+            if name in columns:
+                merged[name].append(select(columns[name]))
+            else:
+                merged[name].append(np.full(count, np.nan))
+
+    arrays = {name: np.concatenate(values) for name, values in merged.items()}
+    order = np.lexsort((arrays['id'], arrays['timestamp']))
+    dtypes = {'id': '<i8', 'timestamp': '<i8', 'satellite_id': '<i4'}
+    columns = [
+        (name, np.ascontiguousarray(values[order], dtype=dtypes.get(name, '<f8')).tobytes(), dtypes.get(name, '<f8'))
+        for name, values in arrays.items()
+    ]
+    header = encode_columnar_header(len(order), columns, {'satellite_id': list(satellites)})
+    header['columns'][1]['unit'] = 'us'
+    return encode_columnar(header, columns)
+
+
+# ============================================
+# BULK INGEST (NDJSON fast path)
+# ============================================
+# Large uploads are read line by line from the request stream and handled in
+# chunks of INGEST_CHUNK_SIZE records: validate, then one executemany INSERT
+# per table. No ORM objects are created and no rows are echoed back, so memory
+# depends on the chunk size rather than the upload size.
+
+INGEST_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+BULK_REQUIRED_FIELDS = ("timestamp", "timezone", "coordinates", "satellite_id")
+
+
+def validate_bulk_record(item):
+    """
+    Apply the /observations/bulk validation rules to one decoded record.
+    Returns (values, None) with keyword arguments for Observation, or
+    (None, error message) if the record is invalid.
+    """
+    if not isinstance(item, dict):
+        return None, "Expected an observation object"
+
+    missing = [f for f in BULK_REQUIRED_FIELDS if f not in item]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+
+    try:
+        timestamp = datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00")).replace(tzinfo=None)
+    except (ValueError, AttributeError):
+        return None, "Invalid timestamp format. Use ISO 8601"
+
+    return {
+        "timestamp": timestamp,
+        "timezone": item.get("timezone"),
+        "coordinates": item.get("coordinates"),
+        "satellite_id": item.get("satellite_id"),
+        "spectral_indices": json.dumps(item.get("spectral_indices")),
+        "notes": item.get("notes"),
+    }, None
+
+
+def validate_observation_data(data):
+    """
+    Apply the POST /observations (US-10) validation rules to one record:
+    all of timestamp, timezone, coordinates, satellite_id and spectral_indices
+    present and non-empty, spectral_indices a JSON object, and timestamp in
+    ISO 8601 format. Returns (values, None) with keyword arguments for
+    Observation, or (None, error message).
+    """
+    if not isinstance(data, dict):
+        return None, 'Expected an observation object'
+
+    required_fields = ['timestamp', 'timezone', 'coordinates', 'satellite_id', 'spectral_indices']
+    missing_fields = []
+    invalid_fields = []
+
+    for field in required_fields:
+        if field not in data:
+            missing_fields.append(field)
+        elif data[field] is None:
+            invalid_fields.append(f"{field} (cannot be null)")
+        elif isinstance(data[field], str) and not data[field].strip():
+            invalid_fields.append(f"{field} (cannot be empty)")
+
+    if missing_fields:
+        return None, (f'Missing required field: {missing_fields[0]}' if len(missing_fields) == 1
+                      else f'Missing required fields: {", ".join(missing_fields)}')
+
+    if invalid_fields:
+        return None, f'Invalid or empty value for required field: {invalid_fields[0]}'
+
+    if not isinstance(data['spectral_indices'], dict):
+        return None, 'spectral_indices must be a JSON object'
+
+    # More flexible ISO 8601 pattern (accepts with/without milliseconds, timezone)
+    timestamp_str = data['timestamp']
+    iso8601_error = 'Invalid timestamp format. Expected ISO 8601 (YYYY-MM-DDTHH:MM:SS)'
+    if not isinstance(timestamp_str, str) or not re.match(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', timestamp_str):
+        return None, iso8601_error
+
+    try:
+        # Replace 'Z' with '+00:00' for proper parsing, then store without timezone info
+        normalized_timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None, iso8601_error
+
+    return {
+        'timestamp': normalized_timestamp,
+        'timezone': data['timezone'],
+        'coordinates': data['coordinates'],
+        'satellite_id': data['satellite_id'],
+        'spectral_indices': json.dumps(data['spectral_indices']),
+        'notes': data.get('notes'),
+    }, None
+
+
+def insert_observation_rows(conn, records, spectral=None):
+    """
+    Insert validated records (dicts from validate_bulk_record) with Core
+    executemany statements. Fills in the derived location columns, the
+    observation_bands rows, the rollups and the density queue, which the
+    ORM would otherwise maintain. spectral can pass each record's
+    {band: value} dict when the caller already has it, to avoid decoding
+    spectral_indices again.
+    Returns the new ids in record order.
+    """
+    observations = Observation.__table__
+    if spectral is None:
+        spectral = [parse_spectral_indices(record['spectral_indices']) for record in records]
+    for record in records:
+        record['latitude'], record['longitude'] = parse_coordinates(record['coordinates'])
+        record['grid_cell'] = grid_cell_for(record['latitude'], record['longitude'])
+
+    # Batched INSERT ... RETURNING id. SQLite hands out ids in ascending order
+    # as the rows of each statement are inserted, so sorting the returned ids
+    # lines them up with the records (asking SQLAlchemy to guarantee the order
+    # instead makes SQLite fall back to one INSERT per row). Other databases
+    # (PostgreSQL) do not promise any RETURNING order, so SQLAlchemy has to
+    # match the ids to the records there.
+    if conn.dialect.name == 'sqlite':
+        ids = sorted(conn.execute(observations.insert().returning(observations.c.id), records).scalars())
+    else:
+        ids = conn.execute(
+            observations.insert().returning(observations.c.id, sort_by_parameter_order=True), records
+        ).scalars().all()
+
+    band_rows = [
+        {'observation_id': obs_id, 'band': band, 'value': value}
+        for obs_id, values in zip(ids, spectral)
+        for band, value in values.items()
+    ]
+    if band_rows:
+        conn.execute(ObservationBand.__table__.insert(), band_rows)
+    add_to_rollups(conn, (
+        (record['timestamp'], record['satellite_id'], values)
+        for record, values in zip(records, spectral)
+    ))
+    queue_density_update(conn, ids)
+    mark_segments_stale(conn, [record['timestamp'] for record in records])
+    bump_data_version(conn)
+    return ids
+
+
+def iter_ndjson_records(stream):
+    """
+    Yield (record, error) pairs from a binary NDJSON stream, one per non-blank
+    line. error is "Invalid JSON" for lines that cannot be decoded.
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError:
+            yield None, "Invalid JSON"
+
+
+def iter_csv_records(text_stream):
+    """
+    Yield (record, error) pairs from a CSV text stream with a header row
+    (timestamp, timezone, coordinates, satellite_id, spectral_indices, notes).
+    The spectral_indices cell holds a JSON object, e.g. {"NDVI": 0.7}.
+    """
+    for row in csv.DictReader(text_stream):
+        record = {key.strip(): value for key, value in row.items() if key}
+        spectral = record.get('spectral_indices')
+        if isinstance(spectral, str) and spectral.strip():
+            try:
+                record['spectral_indices'] = json.loads(spectral)
+            except ValueError:
+                # Leave the raw text so validation reports it as not a JSON object
+                pass
+        if record.get('notes') == '':
+            record['notes'] = None
+        yield record, None
+
+
+def ingest_records(records, validate=validate_bulk_record, atomic=True, chunk_size=INGEST_CHUNK_SIZE,
+                   engine=None, max_errors=MAX_REPORTED_ERRORS, on_progress=None):
+    """
+    Validate and insert (record, error) pairs from iter_ndjson_records/iter_csv_records.
+    atomic=True: a single transaction; any invalid record rolls everything back
+    (validation continues so all errors are reported, up to max_errors).
+    atomic=False: each chunk is committed on its own and invalid records are skipped.
+    on_progress(summary, processed) is called after every chunk.
+    Returns a summary dict: created_count, failed_count, first_id, last_id, errors.
+    """
+    summary = {'created_count': 0, 'failed_count': 0, 'first_id': None, 'last_id': None, 'errors': []}
+    chunk = []
+    chunk_bands = []
+    processed = 0
+
+    def flush(conn):
+        if chunk and not (atomic and summary['failed_count']):
+            ids = insert_observation_rows(conn, chunk, chunk_bands)
+            if ids:
+                summary['first_id'] = summary['first_id'] or ids[0]
+                summary['last_id'] = ids[-1]
+                summary['created_count'] += len(ids)
+            if not atomic:
+                conn.commit()
+        chunk.clear()
+        chunk_bands.clear()
+        if on_progress:
+            on_progress(summary, processed)
+
+    with (engine or db.engine).connect() as conn:
+        for index, (record, error) in enumerate(records):
+            processed = index + 1
+            if not error:
+                values, error = validate(record)
+            if error:
+                summary['failed_count'] += 1
+                if len(summary['errors']) < max_errors:
+                    summary['errors'].append({"record": index, "error": error})
+            else:
+                chunk.append(values)
+                chunk_bands.append(spectral_band_values(record.get("spectral_indices")))
+            if processed % chunk_size == 0:
+                flush(conn)
+        flush(conn)
+
+        if atomic and summary['failed_count']:
+            conn.rollback()
+            summary.update(created_count=0, first_id=None, last_id=None)
+        else:
+            conn.commit()
+    return summary
+
+
+def ingest_ndjson_stream(stream, atomic=True, chunk_size=INGEST_CHUNK_SIZE, engine=None):
+    """
+    Read newline-delimited JSON observations from a binary stream and insert
+    them with the /observations/bulk rules (see ingest_records).
+    """
+    return ingest_records(iter_ndjson_records(stream), atomic=atomic, chunk_size=chunk_size, engine=engine)
+
+
+# ============================================
+# GROUP COMMIT (POST /observations)
+# ============================================
+# With GROUP_COMMIT_ENABLED, POST /observations does not commit on its own.
+# Validated observations go on an in-process queue; one writer thread inserts
+# whatever has queued up (up to GROUP_COMMIT_MAX_ROWS, waiting at most
+# GROUP_COMMIT_MAX_WAIT_MS for more) in one transaction, then resolves each
+# request's future with its id. A request still answers 201 only after its
+# row is committed, but concurrent requests share one commit (and one fsync).
+
+app.config.setdefault('GROUP_COMMIT_ENABLED', os.getenv('GROUP_COMMIT_ENABLED', 'false').lower() in ('1', 'true', 'yes'))
+app.config.setdefault('GROUP_COMMIT_MAX_ROWS', int(os.getenv('GROUP_COMMIT_MAX_ROWS', '500')))
+app.config.setdefault('GROUP_COMMIT_MAX_WAIT_MS', float(os.getenv('GROUP_COMMIT_MAX_WAIT_MS', '5')))
+app.config.setdefault('GROUP_COMMIT_TIMEOUT_SECONDS', float(os.getenv('GROUP_COMMIT_TIMEOUT_SECONDS', '30')))
+
+
+class GroupCommitQueue:
+    """Queue of (values, bands, future) committed in batches by one writer thread."""
+
+    def __init__(self, engine=None):
+        self.engine = engine       # None: the app's default engine
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, values, bands):
+        """Queue validated Observation values; the returned future resolves to the new id"""
+        if self.thread is None:
+            self.start()
+        future = Future()
+        self.queue.put((values, bands, future))
+        return future
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='group-commit', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        if self.engine is None:
+            with app.app_context():
+                self.engine = db.engine
+        while True:
+            batch = [self.queue.get()]
+            max_rows = app.config['GROUP_COMMIT_MAX_ROWS']
+            deadline = time.monotonic() + app.config['GROUP_COMMIT_MAX_WAIT_MS'] / 1000
+            while len(batch) < max_rows:
+                try:
+                    # Take what is already queued, then wait out the rest of the window
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            # Drop items whose request gave up waiting (and cancelled them);
+            # the rest can no longer be cancelled
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self.commit(batch)
+
+    def commit(self, batch):
+        try:
+            with self.engine.connect() as conn:
+                ids = insert_observation_rows(conn, [values for values, _, _ in batch],
+                                              [bands for _, bands, _ in batch])
+                conn.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # Find the failing record: the others are committed on their own
+                for item in batch:
+                    self.commit([item])
+            else:
+                batch[0][2].set_exception(e)
+            return
+        self.batches += 1
+        self.rows += len(ids)
+        count_ingest('single', len(ids))
+        for (_, _, future), obs_id in zip(batch, ids):
+            future.set_result(obs_id)
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'batches': self.batches, 'rows': self.rows}
+
+
+group_commit = GroupCommitQueue()
+
+
+# ============================================
+# ASYNCHRONOUS IMPORT JOBS
+# ============================================
+# POST /observations/import saves the upload to disk, records an ImportJob and
+# returns straight away. A small thread pool then parses the file (CSV or
+# NDJSON), validates each record with the POST /observations rules and inserts
+# valid records chunk by chunk, writing progress back to the job row as it goes.
+#
+# The jobs live in the thread pool of the process that accepted them. That
+# process holds a lock on IMPORT_UPLOAD_DIR/worker-<id>.lock, recorded on each
+# job, and the operating system releases it when the process dies. A queued
+# or running job whose lock is free was orphaned by a restart or a recycled
+# worker: create_app() and the status endpoint mark it failed and delete its
+# upload. Chunks already committed stay (first_id..last_id).
+
+app.config.setdefault('IMPORT_WORKERS', int(os.getenv('IMPORT_WORKERS', '2')))
+app.config.setdefault('IMPORT_UPLOAD_DIR', os.getenv('IMPORT_UPLOAD_DIR', os.path.join(app.instance_path, 'imports')))
+# Per-record errors kept on a job (the counts are always complete)
+IMPORT_MAX_ERRORS = 1000
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class ImportJob(db.Model):
+    __tablename__ = "import_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)                # uuid4 hex
+    status = db.Column(db.String(20), nullable=False)              # queued, running, completed, failed
+    format = db.Column(db.String(10), nullable=False)              # csv or ndjson
+    filename = db.Column(db.String(255), nullable=True)            # Original upload name
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    records_processed = db.Column(db.Integer, nullable=False, default=0)
+    records_created = db.Column(db.Integer, nullable=False, default=0)
+    records_failed = db.Column(db.Integer, nullable=False, default=0)
+    first_id = db.Column(db.Integer, nullable=True)                # Id range of created observations
+    last_id = db.Column(db.Integer, nullable=True)
+    errors = db.Column(db.Text, nullable=True)                     # JSON list of {record, error}
+    message = db.Column(db.Text, nullable=True)                    # Reason when status is failed
+    worker = db.Column(db.String(32), nullable=True)               # import_worker_id of the process running it
+
+    def to_dict(self):
+        # Status payload for GET /observations/import/<job_id>
+        end = self.finished_at or datetime.utcnow()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'format': self.format,
+            'filename': self.filename,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'records_processed': self.records_processed,
+            'records_created': self.records_created,
+            'records_failed': self.records_failed,
+            'first_id': self.first_id,
+            'last_id': self.last_id,
+            'rows_per_second': round(self.records_processed / elapsed, 1) if elapsed > 0 else None,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'message': self.message,
+        }
+
+
+import_executor = None  # Created on first use so importing app.py starts no threads
+import_worker_id = None
+import_worker_lock = None
+import_executor_lock = threading.Lock()
+
+
+def import_worker_lock_path(worker):
+    return os.path.join(app.config['IMPORT_UPLOAD_DIR'], f'worker-{worker}.lock')
+
+
+def get_import_executor():
+    global import_executor, import_worker_id, import_worker_lock
+    with import_executor_lock:
+        if import_executor is None:
+            os.makedirs(app.config['IMPORT_UPLOAD_DIR'], exist_ok=True)
+            worker = uuid.uuid4().hex
+            import_worker_lock = open(import_worker_lock_path(worker), 'w')
+            if fcntl:
+                fcntl.flock(import_worker_lock, fcntl.LOCK_EX)
+            import_worker_id = worker
+            import_executor = ThreadPoolExecutor(
+                max_workers=app.config['IMPORT_WORKERS'], thread_name_prefix='observation-import'
+            )
+    return import_executor
+
+
+def forget_import_executor():
+    # A forked child has none of the parent's pool threads, so its jobs would never run
+    global import_executor, import_worker_id, import_worker_lock
+    import_executor = import_worker_id = import_worker_lock = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=forget_import_executor)
 
 
-# Single-user schema
-user_schema = UserSchema()
-# Multi-user schema
-users_schema = UserSchema(many=True)
+def import_worker_alive(worker):
+    """True while the process that took the job still holds its worker lock"""
+    if worker is not None and worker == import_worker_id:
+        return True
+    if worker is None or not fcntl:
+        # Without flock the owner cannot be checked: assume one process per host
+        return False
+    try:
+        fd = os.open(import_worker_lock_path(worker), os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        os.close(fd)
+    try:
+        os.remove(import_worker_lock_path(worker))
+    except OSError:
+        pass
+    return False
 
 
-# US-19: Create database tables once (now includes users)
-tables_created = False  # Flag so we only create tables once per app lifetime
+def fail_orphaned_import_jobs(job_ids=None):
+    """
+    Mark queued/running jobs whose process is gone as failed and delete their
+    uploads. Returns the ids of the jobs it failed.
+    """
+    table = ImportJob.__table__
+    query = db.select(table.c.id, table.c.format, table.c.worker).where(table.c.status.in_(('queued', 'running')))
+    if job_ids is not None:
+        query = query.where(table.c.id.in_(job_ids))
+    with db.engine.connect() as conn:
+        jobs = conn.execute(query).all()
+
+    failed = []
+    for job_id, fmt, worker in jobs:
+        if import_worker_alive(worker):
+            continue
+        with db.engine.begin() as conn:
+            # Only if still unfinished: the owner may have just completed it
+            updated = conn.execute(table.update().where(
+                table.c.id == job_id, table.c.status.in_(('queued', 'running'))
+            ).values(
+                status='failed', finished_at=datetime.utcnow(),
+                message='Interrupted by a server restart; observations first_id..last_id were saved, resubmit the rest',
+            )).rowcount
+        if updated:
+            failed.append(job_id)
+            try:
+                os.remove(import_upload_path(job_id, fmt))
+            except OSError:
+                pass
+    return failed
 
-@app.before_request
-def create_tables_once():
-    """
-    This function runs before every request.
-    It makes sure the database tables exist and seeds a default test user once.
-    """
-    global tables_created
-    if not tables_created:
-        # Create all tables for Dataset, Observation, User, etc.
-        db.create_all()
-        # If there are no users yet, create a simple test user for JWT login demos
-        if User.query.count() == 0:
-            test_user = User(username='testuser')  # Default username
-            test_user.set_password('testpass')     # Default password (hashed inside)
-            db.session.add(test_user)
-            db.session.commit()
-        # Mark that tables and seed user have been created
-        tables_created = True
 
+def import_upload_path(job_id, fmt):
+    return os.path.join(app.config['IMPORT_UPLOAD_DIR'], f'observation-import-{job_id}.{fmt}')
 
-# ============================================
-# JWT IMPLEMENTATION (now using flask-jwt-extended)
-# ============================================
-# JWT config and User model are above; login endpoint and protected routes below
 
+def update_import_job(job_id, **values):
+    # Write job progress on its own short transaction, separate from the inserts
+    table = ImportJob.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.id == job_id).values(**values))
 
-# US-11: Helper function for quarter boundary checks
-def get_current_quarter_start():
+
+def run_import_job(job_id, path, fmt):
     """
-    US-11: Calculate the start date of the current quarter
-    Returns datetime object for the first day of current quarter at 00:00:00
+    Worker body: parse the uploaded file, validate with validate_observation_data,
+    insert valid records chunk by chunk and keep the job row up to date.
+    Invalid records are skipped and listed on the job; valid ones are kept.
     """
-    now = datetime.now()
-    current_month = now.month
-    
-    # Determine quarter start month (1, 4, 7, or 10)
-    if current_month <= 3:
-        quarter_start_month = 1  # Q1: Jan-Mar
-    elif current_month <= 6:
-        quarter_start_month = 4  # Q2: Apr-Jun
-    elif current_month <= 9:
-        quarter_start_month = 7  # Q3: Jul-Sep
-    else:
-        quarter_start_month = 10  # Q4: Oct-Dec
-    
-    # Return first day of quarter at midnight
-    return datetime(now.year, quarter_start_month, 1, 0, 0, 0)
+    with app.app_context():
+        update_import_job(job_id, status='running', started_at=datetime.utcnow())
+        counted = {'created_count': 0, 'failed_count': 0}
+
+        def on_progress(summary, processed):
+            # Chunks are committed one by one, so count each chunk's rows
+            count_ingest('import', summary['created_count'] - counted['created_count'],
+                         summary['failed_count'] - counted['failed_count'])
+            counted.update(created_count=summary['created_count'], failed_count=summary['failed_count'])
+            update_import_job(
+                job_id,
+                records_processed=processed,
+                records_created=summary['created_count'],
+                records_failed=summary['failed_count'],
+                first_id=summary['first_id'],
+                last_id=summary['last_id'],
+                errors=json.dumps(summary['errors']),
+            )
+
+        try:
+            if fmt == 'csv':
+                with open(path, newline='', encoding='utf-8-sig') as f:
+                    summary = ingest_records(iter_csv_records(f), validate=validate_observation_data, atomic=False,
+                                             max_errors=IMPORT_MAX_ERRORS, on_progress=on_progress)
+            else:
+                with open(path, 'rb') as f:
+                    summary = ingest_records(iter_ndjson_records(f), validate=validate_observation_data, atomic=False,
+                                             max_errors=IMPORT_MAX_ERRORS, on_progress=on_progress)
+            update_import_job(
+                job_id,
+                status='completed',
+                finished_at=datetime.utcnow(),
+                records_created=summary['created_count'],
+                records_failed=summary['failed_count'],
+                first_id=summary['first_id'],
+                last_id=summary['last_id'],
+                errors=json.dumps(summary['errors']),
+            )
+        except Exception as e:
+            update_import_job(job_id, status='failed', finished_at=datetime.utcnow(), message=str(e))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
 
 # ============================================
@@ -364,7 +4218,9 @@ def unprocessable_entity(error):
 @app.errorhandler(429)
 def too_many_requests(error):
     # Handle rate limiting (too many requests in short time)
-    return jsonify({"error": "Too Many Requests", "message": error.description or "Rate limit exceeded", "code": 429}), 429
+    # Keep the Retry-After header set by TooManyRequests(retry_after=...)
+    retry_after = [header for header in error.get_headers() if header[0] == 'Retry-After']
+    return jsonify({"error": "Too Many Requests", "message": error.description or "Rate limit exceeded", "code": 429}), 429, retry_after
 
 
 @app.errorhandler(500)
@@ -424,6 +4280,55 @@ def health():
     return jsonify({"status": "ok"}), 200
 
 
+@app.get("/health/details")
+@jwt_required()  # Internal state (paths, cache sizes, queue depth) is not for anonymous callers
+def health_details():
+    """
+    Internal state of this worker process: caches, background workers and queues.
+    ---
+    tags:
+      - System
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: Per-process cache, revocation, usage and writer statistics
+      401:
+        description: Missing or invalid JWT
+    """
+    return jsonify({
+        "status": "ok",
+        "token_cache": decoded_token_cache.stats(),
+        "revocations": revocations.stats(),
+        "usage_meter": usage_meter.stats(),
+        "compression_cache": dict(compressed_bodies.stats(), encodings=CONTENT_ENCODINGS),
+        "tile_cache": tile_bodies.stats(),
+        "density_refresher": density_refresher.stats(),
+        "result_store": result_store.stats(),
+        "group_commit": group_commit.stats(),
+    }), 200
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint, summed over all worker processes.
+    ---
+    tags:
+      - System
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Metrics in the Prometheus text exposition format
+      404:
+        description: Metrics are disabled (METRICS_ENABLED=false)
+    """
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({"error": "Not Found", "message": "Metrics are disabled", "code": 404}), 404
+    return Response(render_metrics(metrics.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.get("/")
 def root():
     # Root endpoint, returns a basic message confirming the TerraScope API startup
@@ -503,6 +4408,8 @@ def get_user_info():
 
 @app.get("/api/observations")
 @django_token_required
+@read_only_db
+@conditional_on_data_version(historical=True)
 def get_observations_django():
     """
     Get observations using Django-generated subscription token.
@@ -537,11 +4444,66 @@ def get_observations_django():
         type: string
         required: false
         description: Longitude filter
+      - name: radius_km
+        in: query
+        type: number
+        required: false
+        description: With lat and long, return observations within this many kilometres
+      - name: min_lat
+        in: query
+        type: number
+        required: false
+        description: Bounding box south edge (requires min_lat, max_lat, min_long, max_long)
+      - name: max_lat
+        in: query
+        type: number
+        required: false
+        description: Bounding box north edge
+      - name: min_long
+        in: query
+        type: number
+        required: false
+        description: Bounding box west edge
+      - name: max_long
+        in: query
+        type: number
+        required: false
+        description: Bounding box east edge
       - name: limit
         in: query
         type: integer
         required: false
-        description: Maximum number of results (default 100)
+        description: Maximum number of results per page (default 100, max 1000)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor value from the previous page
+      - name: format
+        in: query
+        type: string
+        required: false
+        description: "'ndjson' (one object per line) or 'json-stream' (chunked JSON array) to stream all matches; limit/cursor are ignored"
+      - name: ndvi_min
+        in: query
+        type: number
+        required: false
+        description: Minimum NDVI. Any <band>_min / <band>_max pair works (e.g. evi_max)
+      - name: ndvi_max
+        in: query
+        type: number
+        required: false
+        description: Maximum NDVI
+      - name: satellite_id
+        in: query
+        type: string
+        required: false
+        description: Satellite id, or a comma-separated list of ids
+      - name: explain
+        in: query
+        type: boolean
+        required: false
+        description: "Debug (QUERY_PLAN_DEBUG only): return the SQL and query plan instead of the observations"
     responses:
       200:
         description: List of observations
@@ -559,9 +4521,11 @@ def get_observations_django():
     # Apply filters from query parameters
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
-    lat_str = request.args.get('lat')
-    long_str = request.args.get('long')
-    limit = request.args.get('limit', 100, type=int)
+    cursor = request.args.get('cursor')
+    try:
+        limit = parse_page_size(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     # Filter by date range
     if start_date_str:
@@ -578,20 +4542,41 @@ def get_observations_django():
         except ValueError:
             return jsonify({"error": "Invalid end_date format"}), 400
     
-    # Filter by coordinates
-    if lat_str and long_str:
+    # Filter by location (exact point, radius or bounding box)
+    try:
+        query = apply_location_filters(query, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Filter by spectral band ranges (e.g. ndvi_min=0.4&ndvi_max=0.8)
+    try:
+        query = apply_band_filters(query, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Filter by satellite (one id or a comma-separated list)
+    query = apply_satellite_filter(query, request.args)
+    
+    # Streaming mode: send every matching row without building the full list
+    stream_format = requested_stream_format(request.args, request.headers)
+    
+    # Debug mode: return the query plan instead of the rows
+    if explain_requested(request.args):
         try:
-            lat = float(lat_str)
-            lon = float(long_str)
-            query = query.filter(
-                Observation.latitude == lat,
-                Observation.longitude == lon
-            )
-        except ValueError:
-            return jsonify({"error": "Invalid lat/long format"}), 400
+            planned = (query.with_entities(*OBSERVATION_COLUMNS).order_by(Observation.timestamp, Observation.id)
+                       if stream_format else page_query(query, cursor, limit))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(explain_query(planned)), 200
     
-    # Apply limit
-    observations = query.limit(limit).all()
+    if stream_format:
+        return stream_observations(query, stream_format)
+    
+    # Fetch one page, ordered by (timestamp, id)
+    try:
+        observations, next_cursor = paginate_observations(query, cursor, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     return jsonify({
         'user': {
@@ -600,7 +4585,237 @@ def get_observations_django():
         },
         'count': len(observations),
         'limit': limit,
-        'observations': observations_schema.dump(observations)
+        'next_cursor': next_cursor,
+        'observations': ObservationRows(observations)
+    }), 200
+
+
+@app.get("/api/observations/export")
+@django_token_required
+@read_only_db
+def export_observations_django():
+    """
+    Bulk download of observations as a compact columnar binary file.
+    Accepts the same filters as /api/observations but returns every match as
+    typed column arrays (see build_columnar_export) instead of JSON rows.
+    The body is compressed when the client sends Accept-Encoding (gzip, or zstd/br if available).
+    ---
+    tags:
+      - Django Integration
+      - Observations
+    security:
+      - Bearer: []
+    produces:
+      - application/vnd.terrascope.columnar
+    parameters:
+      - name: start_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601 start of timestamp range
+      - name: end_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601 end of timestamp range
+      - name: lat
+        in: query
+        type: string
+        required: false
+        description: Latitude filter
+      - name: long
+        in: query
+        type: string
+        required: false
+        description: Longitude filter
+      - name: radius_km
+        in: query
+        type: number
+        required: false
+        description: With lat and long, return observations within this many kilometres
+      - name: ndvi_min
+        in: query
+        type: number
+        required: false
+        description: Minimum NDVI. Any <band>_min / <band>_max pair works (e.g. evi_max)
+      - name: ndvi_max
+        in: query
+        type: number
+        required: false
+        description: Maximum NDVI
+      - name: satellite_id
+        in: query
+        type: string
+        required: false
+        description: Satellite id, or a comma-separated list of ids
+    responses:
+      200:
+        description: Columnar export file
+      400:
+        description: Invalid query parameter values
+      401:
+        description: Unauthorized - invalid or missing token
+    """
+    try:
+        query = apply_date_filters(Observation.query, request.args)
+        query = apply_location_filters(query, request.args)
+        query = apply_band_filters(query, request.args)
+        query = apply_satellite_filter(query, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Closed quarters that have been compacted are read from their segment
+    # files; the table query covers everything else
+    parts, sealed_ranges = read_sealed_segments(request.args)
+    for start, end in sealed_ranges:
+        query = query.filter(db.or_(Observation.timestamp < start, Observation.timestamp >= end))
+
+    # Read plain column tuples in batches; no ORM objects are built
+    rows = (
+        query.with_entities(
+            Observation.id, Observation.timestamp, Observation.latitude,
+            Observation.longitude, Observation.satellite_id, Observation.spectral_indices
+        )
+        .order_by(Observation.timestamp, Observation.id)
+        .yield_per(STREAM_BATCH_SIZE)
+    )
+    body = build_columnar_export(rows)
+    if parts:
+        body = merge_columnar_parts([(*read_columnar_export(body), None)] + parts)
+
+    # Compressed by compress_response when the client accepts it
+    response = Response(body, mimetype=COLUMNAR_MIMETYPE)
+    response.headers['Content-Disposition'] = 'attachment; filename=observations.tscol'
+    return response
+
+
+@app.get("/api/observations/series")
+@django_token_required
+@read_only_db
+@conditional_on_data_version(historical=True)
+def get_observation_series_django():
+    """
+    One spectral band over time at a location, downsampled for charting.
+    Every matching observation is read, in timestamp order, and reduced to at
+    most `points` points with Largest-Triangle-Three-Buckets, which keeps the
+    shape of the series (peaks and dips) instead of averaging it away.
+    ---
+    tags:
+      - Django Integration
+      - Observations
+    security:
+      - Bearer: []
+    parameters:
+      - name: band
+        in: query
+        type: string
+        required: true
+        description: Band to plot (e.g. ndvi)
+      - name: points
+        in: query
+        type: integer
+        required: false
+        description: Maximum number of points returned (default 500, at least 3)
+      - name: grid_cell
+        in: query
+        type: integer
+        required: false
+        description: Fixed-grid cell number (0.1 degree cells). A grid cell, lat/long or a bounding box is required
+      - name: lat
+        in: query
+        type: string
+        required: false
+        description: Latitude filter
+      - name: long
+        in: query
+        type: string
+        required: false
+        description: Longitude filter
+      - name: radius_km
+        in: query
+        type: number
+        required: false
+        description: With lat and long, include observations within this many kilometres
+      - name: start_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601 start of timestamp range
+      - name: end_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601 end of timestamp range
+      - name: satellite_id
+        in: query
+        type: string
+        required: false
+        description: Satellite id, or a comma-separated list of ids
+    responses:
+      200:
+        description: Downsampled series of timestamp/value points
+      400:
+        description: Missing band or location, or invalid query parameter values
+      401:
+        description: Unauthorized - invalid or missing token
+      503:
+        description: NumPy is not installed on the server
+    """
+    band = (request.args.get('band') or '').strip().lower()
+    if not band:
+        return jsonify({"error": "The 'band' parameter is required (e.g., band=ndvi)", "code": 400}), 400
+    if not any(request.args.get(name) for name in SERIES_LOCATION_PARAMETERS):
+        return jsonify({
+            "error": "A location is required: grid_cell, lat and long (optionally radius_km), "
+                     "or min_lat, max_lat, min_long and max_long",
+            "code": 400
+        }), 400
+
+    # The band value is looked up per observation by primary key, so SQLite
+    # walks the location's rows (grid cell or lat/long index) rather than every
+    # value of the band; observations without the band give NULL and are dropped
+    band_value = (
+        db.select(ObservationBand.value)
+        .where(ObservationBand.observation_id == Observation.id, ObservationBand.band == band)
+        .scalar_subquery()
+    )
+    query = (
+        db.select(db.type_coerce(Observation.timestamp, db.String), band_value)
+        .order_by(Observation.timestamp, Observation.id)
+    )
+    try:
+        points = parse_series_points(request.args.get('points'))
+        grid_cell = request.args.get('grid_cell')
+        if grid_cell:
+            try:
+                grid_cell = int(grid_cell)
+            except ValueError:
+                raise ValueError("Invalid grid_cell value. Use a whole number")
+            if not 0 <= grid_cell < GRID_ROWS * GRID_COLUMNS:
+                raise ValueError(f"grid_cell must be between 0 and {GRID_ROWS * GRID_COLUMNS - 1}")
+            query = query.filter(Observation.grid_cell == grid_cell)
+        query = apply_date_filters(query, request.args)
+        query = apply_location_filters(query, request.args)
+        query = apply_satellite_filter(query, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e), "code": 400}), 400
+
+    try:
+        import numpy as np
+    except ImportError:
+        return jsonify({
+            "error": "Series downsampling needs NumPy, which is not installed on this server",
+            "code": 503
+        }), 503
+
+    timestamps, values = load_band_series(np, query)
+    series = downsample_series(np, timestamps, values, points)
+    return jsonify({
+        "band": band,
+        "points": points,
+        "source_count": len(values),
+        "count": len(series),
+        "series": series
     }), 200
 
 
@@ -1008,6 +5223,8 @@ def update_observation_partial(obs_id):
 # US-09: GET /observations with filtering support
 @app.get("/observations")
 @jwt_required()  # Protected: requires valid JWT in Authorization header
+@read_only_db
+@conditional_on_data_version(historical=True)
 def get_observations():
     """
     Returns observations, optionally filtered by date range and/or location.
@@ -1018,27 +5235,87 @@ def get_observations():
     parameters:
       - name: start_date
         in: query
-        type: string
+        type: string
+        required: false
+        description: ISO 8601 start of timestamp range (e.g., 2025-11-01T00:00:00)
+      - name: end_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601 end of timestamp range (e.g., 2025-11-30T23:59:59)
+      - name: lat
+        in: query
+        type: string
+        required: false
+        description: Latitude used in coordinates filter
+      - name: long
+        in: query
+        type: string
+        required: false
+        description: Longitude used in coordinates filter
+      - name: radius_km
+        in: query
+        type: number
+        required: false
+        description: With lat and long, return observations within this many kilometres
+      - name: min_lat
+        in: query
+        type: number
+        required: false
+        description: Bounding box south edge (requires min_lat, max_lat, min_long, max_long)
+      - name: max_lat
+        in: query
+        type: number
+        required: false
+        description: Bounding box north edge
+      - name: min_long
+        in: query
+        type: number
+        required: false
+        description: Bounding box west edge
+      - name: max_long
+        in: query
+        type: number
+        required: false
+        description: Bounding box east edge
+      - name: limit
+        in: query
+        type: integer
         required: false
-        description: ISO 8601 start of timestamp range (e.g., 2025-11-01T00:00:00)
-      - name: end_date
+        description: Page size (max 1000). Switches the response to a paginated object
+      - name: cursor
         in: query
         type: string
         required: false
-        description: ISO 8601 end of timestamp range (e.g., 2025-11-30T23:59:59)
-      - name: lat
+        description: next_cursor value from the previous page
+      - name: format
         in: query
         type: string
         required: false
-        description: Latitude used in coordinates filter
-      - name: long
+        description: "'ndjson' (one object per line) or 'json-stream' (chunked JSON array) to stream all matches; limit/cursor are ignored"
+      - name: ndvi_min
+        in: query
+        type: number
+        required: false
+        description: Minimum NDVI. Any <band>_min / <band>_max pair works (e.g. evi_max)
+      - name: ndvi_max
+        in: query
+        type: number
+        required: false
+        description: Maximum NDVI
+      - name: satellite_id
         in: query
         type: string
         required: false
-        description: Longitude used in coordinates filter
+        description: Satellite id, or a comma-separated list of ids
+      - name: explain
+        in: query
+        type: boolean
+        required: false
+        description: "Debug (QUERY_PLAN_DEBUG only): return the SQL and query plan instead of the observations"
     responses:
       200:
-        description: List of observations (possibly filtered)
+        description: List of observations (possibly filtered), or a page object with next_cursor when limit/cursor is given
         schema:
           type: array
           items:
@@ -1064,8 +5341,6 @@ def get_observations():
     # Read query parameters for filtering
     start_date_str = request.args.get('start_date')  # e.g., "2025-11-01T00:00:00"
     end_date_str = request.args.get('end_date')      # e.g., "2025-11-30T23:59:59"
-    lat_str = request.args.get('lat')                # e.g., "40.7"
-    long_str = request.args.get('long')              # e.g., "-74.0"
 
     # Filter by start date if provided
     if start_date_str:
@@ -1089,20 +5364,70 @@ def get_observations():
                 "code": 400
             }), 400
 
-    # Filter by exact coordinates if both lat and long are provided
-    if lat_str and long_str:
-        location_filter = f"lat={lat_str},long={long_str}"
-        query = query.filter(Observation.coordinates == location_filter)
-    elif lat_str or long_str:
-        # If only one of lat/long is provided, return an error
+    # Filter by location using the numeric lat/long columns and grid cell index
+    # (exact point, radius around a point, or bounding box)
+    try:
+        query = apply_location_filters(query, request.args)
+    except ValueError as e:
+        return jsonify({
+            "error": str(e),
+            "code": 400
+        }), 400
+
+    # Filter by spectral band ranges (e.g. ndvi_min=0.4&ndvi_max=0.8)
+    try:
+        query = apply_band_filters(query, request.args)
+    except ValueError as e:
         return jsonify({
-            "error": "Both 'lat' and 'long' parameters are required for location filtering",
+            "error": str(e),
             "code": 400
         }), 400
 
-    # Execute the query and serialize results to JSON
-    results = query.all()
-    return jsonify(observations_schema.dump(results)), 200
+    # Filter by satellite (one id or a comma-separated list)
+    query = apply_satellite_filter(query, request.args)
+
+    # Streaming mode: send every matching row without building the full list
+    stream_format = requested_stream_format(request.args, request.headers)
+    # Paginated mode: only when the client asks for it, so existing callers
+    # that expect a plain array keep working
+    paginated = not stream_format and ('limit' in request.args or 'cursor' in request.args)
+
+    # Debug mode: return the query plan instead of the rows
+    if explain_requested(request.args):
+        try:
+            if paginated:
+                planned = page_query(query, request.args.get('cursor'), parse_page_size(request.args.get('limit')))
+            else:
+                planned = query.with_entities(*OBSERVATION_COLUMNS).order_by(Observation.timestamp, Observation.id)
+        except ValueError as e:
+            return jsonify({
+                "error": str(e),
+                "code": 400
+            }), 400
+        return jsonify(explain_query(planned)), 200
+
+    if stream_format:
+        return stream_observations(query, stream_format)
+
+    if paginated:
+        try:
+            limit = parse_page_size(request.args.get('limit'))
+            results, next_cursor = paginate_observations(query, request.args.get('cursor'), limit)
+        except ValueError as e:
+            return jsonify({
+                "error": str(e),
+                "code": 400
+            }), 400
+        return jsonify({
+            "count": len(results),
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "observations": ObservationRows(results)
+        }), 200
+
+    # Execute the query as plain rows; the JSON provider serializes them
+    results = query.with_entities(*OBSERVATION_COLUMNS).order_by(Observation.timestamp, Observation.id).all()
+    return jsonify(ObservationRows(results)), 200
 
 
 # US-12: Bulk create observations
@@ -1111,12 +5436,22 @@ def bulk_create_observations():
     """
     Bulk create observations in one request (US-12).
     If any record is invalid, the whole operation fails and errors are returned.
+
+    Sending Content-Type: application/x-ndjson (one observation per line) uses
+    the streaming ingest path instead: the body is parsed as it arrives,
+    validated and inserted in chunks, and only counts and the id range are returned.
     ---
     tags:
       - Observations
     consumes:
       - application/json
+      - application/x-ndjson
     parameters:
+      - name: atomic
+        in: query
+        type: boolean
+        required: false
+        description: "NDJSON only: true (default) = all-or-nothing; false = commit valid records chunk by chunk and report the invalid ones"
       - name: body
         in: body
         required: true
@@ -1171,6 +5506,17 @@ def bulk_create_observations():
                   error:
                     type: string
     """
+    # Fast path: NDJSON body, parsed and inserted in chunks as it streams in
+    if request.mimetype == NDJSON_MIMETYPE:
+        atomic = request.args.get('atomic', 'true').lower() not in ('false', '0', 'no')
+        result = ingest_ndjson_stream(request.stream, atomic=atomic)
+        if result['failed_count'] and (atomic or not result['created_count']):
+            count_ingest('bulk_ndjson', 0, result['failed_count'])
+            return jsonify({"message": "Bulk insert failed", **result}), 400
+        count_ingest('bulk_ndjson', result['created_count'], result['failed_count'])
+        message = "Bulk insert partially successful" if result['failed_count'] else "Bulk insert successful"
+        return jsonify({"message": message, **result}), 201
+
     # Read JSON body from the request
     data = request.get_json()
 
@@ -1187,38 +5533,14 @@ def bulk_create_observations():
 
     # Loop through each record in the input array
     for index, item in enumerate(data):
-        # Define required fields for each observation
-        required = ["timestamp", "timezone", "coordinates", "satellite_id"]
-        # Check which required fields are missing
-        missing = [f for f in required if f not in item]
-
-        if missing:
-            # Record validation error but do not create this record
-            errors.append({
-                "record": index,
-                "error": f"Missing required fields: {', '.join(missing)}"
-            })
-            continue
-
-        # Try to parse timestamp; if invalid, record an error for this item
-        try:
-            timestamp = datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00"))
-        except ValueError:
-            errors.append({
-                "record": index,
-                "error": "Invalid timestamp format. Use ISO 8601"
-            })
+        # Validate required fields and timestamp; record an error for this item if invalid
+        values, error = validate_bulk_record(item)
+        if error:
+            errors.append({"record": index, "error": error})
             continue
 
         # Build Observation instance from provided data
-        obs = Observation(
-            timestamp=timestamp,
-            timezone=item.get("timezone"),
-            coordinates=item.get("coordinates"),
-            satellite_id=item.get("satellite_id"),
-            spectral_indices=json.dumps(item.get("spectral_indices")),
-            notes=item.get("notes")
-        )
+        obs = Observation(**values)
 
         # Stage object for insertion
         db.session.add(obs)
@@ -1227,6 +5549,7 @@ def bulk_create_observations():
     # If any errors occurred, roll back everything (no records saved)
     if errors:
         db.session.rollback()
+        count_ingest('bulk', 0, len(errors))
         return jsonify({
             "message": "Bulk insert failed",
             "errors": errors
@@ -1234,6 +5557,7 @@ def bulk_create_observations():
 
     # If all records valid, commit everything in one transaction
     db.session.commit()
+    count_ingest('bulk', len(created))
 
     # Return success message and the created records
     return jsonify({
@@ -1301,78 +5625,36 @@ def create_observation():
                 'code': 400
             }), 400
         
-        # Define required fields
-        required_fields = ['timestamp', 'timezone', 'coordinates', 'satellite_id', 'spectral_indices']
-        
-        # Validate required fields
-        missing_fields = []
-        invalid_fields = []
-        
-        for field in required_fields:
-            if field not in data:
-                missing_fields.append(field)
-            elif data[field] is None:
-                invalid_fields.append(f"{field} (cannot be null)")
-            elif isinstance(data[field], str) and not data[field].strip():
-                invalid_fields.append(f"{field} (cannot be empty)")
-        
-        # Return error if validation fails
-        if missing_fields:
-            return jsonify({
-                'error': f'Missing required field: {missing_fields[0]}' if len(missing_fields) == 1 
-                        else f'Missing required fields: {", ".join(missing_fields)}',
-                'code': 400
-            }), 400
-        
-        if invalid_fields:
-            return jsonify({
-                'error': f'Invalid or empty value for required field: {invalid_fields[0]}',
-                'code': 400
-            }), 400
-        
-        # Validate spectral_indices is a dict
-        if not isinstance(data['spectral_indices'], dict):
-            return jsonify({
-                'error': 'spectral_indices must be a JSON object',
-                'code': 400
-            }), 400
-        
-        # Validate and parse ISO 8601 timestamp
-        timestamp_str = data['timestamp']
-        
-        # More flexible ISO 8601 pattern (accepts with/without milliseconds, timezone)
-        iso8601_pattern = r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}'
-        if not re.match(iso8601_pattern, timestamp_str):
-            return jsonify({
-                'error': 'Invalid timestamp format. Expected ISO 8601 (YYYY-MM-DDTHH:MM:SS)',
-                'code': 400
-            }), 400
-        
-        # Parse timestamp - handles Z, +00:00, milliseconds, etc.
-        try:
-            # Replace 'Z' with '+00:00' for proper parsing
-            parsed_timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            # Store without timezone info (normalized)
-            normalized_timestamp = parsed_timestamp.replace(tzinfo=None)
-        except (ValueError, AttributeError) as e:
+        # Validate required fields, spectral_indices and the ISO 8601 timestamp
+        values, error = validate_observation_data(data)
+        if error:
             return jsonify({
-                'error': 'Invalid timestamp format. Expected ISO 8601 (YYYY-MM-DDTHH:MM:SS)',
+                'error': error,
                 'code': 400
             }), 400
         
-        # Create new observation with normalized timestamp
-        new_observation = Observation(
-            timestamp=normalized_timestamp,
-            timezone=data['timezone'],
-            coordinates=data['coordinates'],
-            satellite_id=data['satellite_id'],
-            spectral_indices=json.dumps(data['spectral_indices']),
-            notes=data.get('notes')
-        )
-        
-        # Save to database
-        db.session.add(new_observation)
-        db.session.commit()
+        if app.config['GROUP_COMMIT_ENABLED']:
+            # Committed by the group-commit writer together with concurrent requests
+            future = group_commit.submit(values, spectral_band_values(data['spectral_indices']))
+            try:
+                obs_id = future.result(app.config['GROUP_COMMIT_TIMEOUT_SECONDS'])
+            except FuturesTimeoutError:
+                # A cancelled item is skipped by the writer, so a retry cannot
+                # duplicate it; one already being committed may still land
+                saved = 'was not saved' if future.cancel() else 'may still be saved'
+                return jsonify({
+                    'error': f'Timed out waiting for the write; the observation {saved}',
+                    'code': 503
+                }), 503
+            new_observation = db.session.get(Observation, obs_id)
+        else:
+            # Create new observation with normalized timestamp
+            new_observation = Observation(**values)
+
+            # Save to database
+            db.session.add(new_observation)
+            db.session.commit()
+            count_ingest('single', 1)
         
         # Return success response
         return jsonify({
@@ -1394,9 +5676,297 @@ def create_observation():
         }), 500
 
 
+# POST /observations/import - Queue a CSV/NDJSON file for background import
+@app.post("/observations/import")
+@jwt_required()
+def create_import_job():
+    """
+    Upload a CSV or NDJSON file of observations to be imported in the background.
+    Returns 202 with a job_id straight away; poll GET /observations/import/{job_id}
+    for progress. Each record is validated like POST /observations; invalid
+    records are skipped and reported on the job, valid records are kept.
+    CSV files need a header row (timestamp, timezone, coordinates, satellite_id,
+    spectral_indices, notes) with spectral_indices as a JSON object.
+    ---
+    tags:
+      - Observations
+    consumes:
+      - multipart/form-data
+      - text/csv
+      - application/x-ndjson
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: false
+        description: File to import (or send it as the raw request body)
+      - name: format
+        in: query
+        type: string
+        enum: [csv, ndjson]
+        required: false
+        description: File format; detected from the file extension or Content-Type when omitted
+    responses:
+      202:
+        description: Import job queued
+      400:
+        description: No file or unknown format
+    """
+    upload = request.files.get('file')
+    filename = upload.filename if upload else None
+
+    fmt = (request.args.get('format') or request.form.get('format') or '').lower()
+    if not fmt:
+        extension = os.path.splitext(filename or '')[1].lower()
+        mimetype = upload.mimetype if upload else request.mimetype
+        if extension == '.csv' or mimetype == 'text/csv':
+            fmt = 'csv'
+        elif extension in ('.ndjson', '.jsonl') or mimetype == NDJSON_MIMETYPE:
+            fmt = 'ndjson'
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({
+            'error': 'Unknown import format. Use format=csv or format=ndjson',
+            'code': 400
+        }), 400
+
+    if upload is None and not request.content_length and request.mimetype not in ('text/csv', NDJSON_MIMETYPE):
+        return jsonify({
+            'error': 'No file uploaded. Send a multipart "file" field or the file as the request body',
+            'code': 400
+        }), 400
+
+    # Spool the upload to disk so the worker does not hold it in memory
+    executor = get_import_executor()
+    job_id = uuid.uuid4().hex
+    path = import_upload_path(job_id, fmt)
+    if upload is not None:
+        upload.save(path)
+    else:
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(request.stream, f)
+
+    job = ImportJob(id=job_id, status='queued', format=fmt, filename=filename, created_at=datetime.utcnow(),
+                    worker=import_worker_id)
+    db.session.add(job)
+    db.session.commit()
+
+    executor.submit(run_import_job, job_id, path, fmt)
+
+    return jsonify({
+        'message': 'Import job queued',
+        'job_id': job_id,
+        'status': job.status,
+        'status_url': f'/observations/import/{job_id}'
+    }), 202
+
+
+# GET /observations/import/<job_id> - Poll an import job
+@app.get("/observations/import/<job_id>")
+@jwt_required()
+@read_only_db
+def get_import_job(job_id):
+    """
+    Progress of an import job: status (queued, running, completed, failed),
+    records processed/created/failed, the id range of created observations,
+    throughput and the per-record errors (first 1000).
+    ---
+    tags:
+      - Observations
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Job status
+      404:
+        description: Job not found
+    """
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({
+            'error': 'Import job not found',
+            'code': 404
+        }), 404
+    if job.status in ('queued', 'running') and fail_orphaned_import_jobs([job_id]):
+        db.session.refresh(job)
+    return jsonify(job.to_dict()), 200
+
+
+# GET /observations/aggregate - Spectral band statistics per time bucket
+@app.get("/observations/aggregate")
+@jwt_required()
+@read_only_db
+def aggregate_observations():
+    """
+    Returns count/min/max/mean of each spectral band per time bucket and satellite.
+    Served from the band_rollups table, so the cost depends on the number of
+    buckets returned, not on the number of observations behind them.
+    ---
+    tags:
+      - Observations
+    parameters:
+      - name: granularity
+        in: query
+        type: string
+        enum: [hour, day, month]
+        required: false
+        description: Bucket size (default day)
+      - name: start_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601; buckets starting before the bucket containing this time are excluded
+      - name: end_date
+        in: query
+        type: string
+        required: false
+        description: ISO 8601; buckets starting after this time are excluded
+      - name: satellite_id
+        in: query
+        type: string
+        required: false
+        description: Only include this satellite
+      - name: band
+        in: query
+        type: string
+        required: false
+        description: Comma-separated band names (default all bands)
+      - name: group_by_satellite
+        in: query
+        type: boolean
+        required: false
+        description: Set to false to combine all satellites in each bucket (default true)
+    responses:
+      200:
+        description: List of buckets with per-band statistics
+      400:
+        description: Invalid query parameter values
+    """
+    granularity = request.args.get('granularity', 'day').lower()
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({
+            "error": f"Invalid granularity. Use one of: {', '.join(ROLLUP_GRANULARITIES)}",
+            "code": 400
+        }), 400
+
+    query = BandRollup.query.filter(BandRollup.granularity == granularity)
+
+    for name in ('start_date', 'end_date'):
+        value = request.args.get(name)
+        if not value:
+            continue
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            return jsonify({
+                "error": f"Invalid {name} format. Use ISO 8601 (e.g., 2025-11-01T00:00:00)",
+                "code": 400
+            }), 400
+        if name == 'start_date':
+            query = query.filter(BandRollup.bucket_start >= bucket_start(parsed, granularity))
+        else:
+            query = query.filter(BandRollup.bucket_start <= parsed)
+
+    satellite_id = request.args.get('satellite_id')
+    if satellite_id:
+        query = query.filter(BandRollup.satellite_id == satellite_id)
+
+    band_param = request.args.get('band')
+    if band_param:
+        query = query.filter(BandRollup.band.in_([b.strip().lower() for b in band_param.split(',') if b.strip()]))
+
+    group_by_satellite = request.args.get('group_by_satellite', 'true').lower() not in ('false', '0', 'no')
+
+    # Merge rollup rows into one entry per (bucket, satellite); when not grouping
+    # by satellite, rows for the same bucket and band are combined
+    buckets = {}
+    for row in query.order_by(BandRollup.bucket_start, BandRollup.satellite_id, BandRollup.band):
+        key = (row.bucket_start, row.satellite_id if group_by_satellite else None)
+        stats = buckets.setdefault(key, {}).get(row.band)
+        if stats is None:
+            buckets[key][row.band] = [row.count, row.total, row.min_value, row.max_value]
+        else:
+            stats[0] += row.count
+            stats[1] += row.total
+            stats[2] = min(stats[2], row.min_value)
+            stats[3] = max(stats[3], row.max_value)
+
+    results = []
+    for (start, sat), bands in sorted(buckets.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+        entry = {'bucket_start': start.isoformat()}
+        if group_by_satellite:
+            entry['satellite_id'] = sat or None
+        entry['bands'] = {
+            band: {'count': count, 'min': low, 'max': high, 'mean': total / count}
+            for band, (count, total, low, high) in bands.items()
+        }
+        results.append(entry)
+
+    return jsonify({
+        "granularity": granularity,
+        "count": len(results),
+        "buckets": results
+    }), 200
+
+
+# GET /observations/tiles/<z>/<x>/<y> - Observation density map tile
+@app.get("/observations/tiles/<int:z>/<int:x>/<int:y>")
+@jwt_required()
+@read_only_db
+@conditional_on_data_version(DENSITY_VERSION)
+def get_density_tile(z, x, y):
+    """
+    Observation counts and mean band values for one Web Mercator map tile.
+    The tile is split into a 16 x 16 grid; only cells with observations are listed.
+    ---
+    tags:
+      - Observations
+    parameters:
+      - name: z
+        in: path
+        type: integer
+        required: true
+        description: Zoom level (0 to 22)
+      - name: x
+        in: path
+        type: integer
+        required: true
+        description: Tile column (0 to 2^z - 1, west to east)
+      - name: y
+        in: path
+        type: integer
+        required: true
+        description: Tile row (0 to 2^z - 1, north to south)
+    responses:
+      200:
+        description: Cells with column, row, count and mean band values
+      400:
+        description: Tile outside the map
+    """
+    if z > TILE_MAX_ZOOM or x >= 1 << z or y >= 1 << z:
+        return jsonify({
+            "error": f"No tile {z}/{x}/{y}: zoom must be 0-{TILE_MAX_ZOOM} and x, y below 2^zoom",
+            "code": 400
+        }), 400
+
+    if density_refresher.thread is None:
+        density_refresher.start()   # e.g. a forked worker
+
+    key = (get_data_version(DENSITY_VERSION), z, x, y)
+    body = tile_bodies.get(key)
+    if body is None:
+        body = encode_density_tile(z, x, y, density_tile(z, x, y))
+        tile_bodies.put(key, body)
+    return Response(body, mimetype='application/json')
+
+
 # US-10: GET /observations/<id> - Retrieve a single observation by ID
 @app.get("/observations/<int:obs_id>")
 @jwt_required()  # Protected: requires valid JWT
+@read_only_db
+@conditional_on_data_version()
 def get_observation_by_id(obs_id):
     """
     Returns a single observation by its ID.
@@ -1536,6 +6106,7 @@ def create_demo_dataset():
 
 
 @app.get("/datasets")
+@read_only_db
 def list_datasets():
     """
     Returns all Dataset records stored in the database.
@@ -1551,9 +6122,493 @@ def list_datasets():
     return jsonify(datasets_schema.dump(all_datasets)), 200
 
 
+# ============================================
+# CLI COMMANDS (run with: flask --app app <command>)
+# ============================================
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the band_rollups table from all observations."""
+    db.create_all()
+    click.echo(f"Rebuilt {rebuild_band_rollups()} rollup rows")
+
+
+@app.cli.command("rebuild-density")
+def rebuild_density_command():
+    """Recompute the density_cells tile pyramid from all observations."""
+    db.create_all()
+    click.echo(f"Rebuilt {rebuild_density_cells()} density cells")
+
+
+@app.cli.command("compact-segments")
+def compact_segments_command():
+    """Seal closed quarters into columnar segment files."""
+    db.create_all()
+    written = compact_closed_quarters()
+    for values in written:
+        click.echo(f"{values['quarter_start']:%Y-%m-%d}: {values['row_count']} observations -> {values['path']}")
+    click.echo(f"Sealed {len(written)} quarter(s)")
+
+
+@app.cli.command("bench-export")
+@click.option("--rows", default=100000, show_default=True, help="Number of synthetic observations")
+def bench_export(rows):
+    """
+    Compare the JSON response path with the columnar export for the same rows.
+    Uses in-memory Observation objects, so no database is needed.
+    """
+    sample = [
+        Observation(
+            id=i + 1,
+            timestamp=UNIX_EPOCH + timedelta(days=20000, seconds=i * 60),
+            timezone='UTC',
+            coordinates=f"lat={(i % 1800) / 10 - 90:.1f},long={(i % 3600) / 10 - 180:.1f}",
+            satellite_id=f"SAT-{i % 8:03d}",
+            spectral_indices=json.dumps({'NDVI': (i % 100) / 100, 'EVI': (i % 70) / 100, 'NDWI': (i % 40) / 100}),
+        )
+        for i in range(rows)
+    ]
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, (time.perf_counter() - start) * 1000
+
+    json_body, json_encode_ms = timed(lambda: json.dumps(observations_schema.dump(sample)).encode())
+    _, json_decode_ms = timed(lambda: json.loads(json_body))
+    columnar_body, columnar_encode_ms = timed(lambda: build_columnar_export(sample))
+    try:
+        import numpy  # noqa: F401  (imported up front so its import time is not measured)
+        _, columnar_decode_ms = timed(lambda: read_columnar_export(columnar_body))
+    except ImportError:
+        columnar_decode_ms = None
+
+    click.echo(f"rows: {rows}")
+    click.echo(f"{'format':<10} {'encode ms':>10} {'decode ms':>10} {'bytes':>12} {'gzip bytes':>12}")
+    for name, body, encode_ms, decode_ms in (
+        ('json', json_body, json_encode_ms, json_decode_ms),
+        ('columnar', columnar_body, columnar_encode_ms, columnar_decode_ms),
+    ):
+        decoded = f"{decode_ms:10.1f}" if decode_ms is not None else f"{'n/a':>10}"
+        click.echo(f"{name:<10} {encode_ms:10.1f} {decoded} {len(body):12d} {len(gzip.compress(body, 6)):12d}")
+    if columnar_decode_ms is None:
+        click.echo("(install numpy to time columnar decoding)")
+
+
+@app.cli.command("bench-serialize")
+@click.option("--rows", default=10000, show_default=True, help="Rows per response")
+@click.option("--repeat", default=5, show_default=True, help="Best of this many runs")
+def bench_serialize(rows, repeat):
+    """
+    Compare the list endpoints' old path (ORM objects + observations_schema.dump)
+    with the Core row + ObservationJSONProvider path, from query to JSON text,
+    on a temporary SQLite file.
+    """
+    records = [
+        {
+            'timestamp': UNIX_EPOCH + timedelta(days=20000, seconds=i * 60),
+            'timezone': 'UTC',
+            'coordinates': f"lat={(i % 1800) / 10 - 90:.1f},long={(i % 3600) / 10 - 180:.1f}",
+            'satellite_id': f"SAT-{i % 8:03d}",
+            'spectral_indices': json.dumps({'NDVI': (i % 100) / 100, 'EVI': (i % 70) / 100}),
+            'notes': None,
+        }
+        for i in range(rows)
+    ]
+    statement = db.select(Observation).order_by(Observation.timestamp, Observation.id)
+    row_statement = db.select(*OBSERVATION_COLUMNS).order_by(Observation.timestamp, Observation.id)
+
+    def best(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = fn()
+            timings.append(time.perf_counter() - start)
+        return body, min(timings)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = db.create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            insert_observation_rows(conn, records)
+
+        def schema_path():
+            with db.Session(engine) as session:
+                return app.json.dumps(observations_schema.dump(session.scalars(statement).all()))
+
+        def row_path():
+            with engine.connect() as conn:
+                return app.json.dumps(ObservationRows(conn.execute(row_statement).all()))
+
+        schema_body, schema_seconds = best(schema_path)
+        row_body, row_seconds = best(row_path)
+        engine.dispose()
+
+    if json.loads(schema_body) != json.loads(row_body):
+        raise click.ClickException("Serializers disagree")
+    click.echo(f"rows per response: {rows} (best of {repeat})")
+    for name, seconds in (('observations_schema.dump', schema_seconds), ('core rows + provider', row_seconds)):
+        click.echo(f"{name:<26} {seconds * 1000:8.1f} ms {rows / seconds:12,.0f} rows/s")
+    click.echo(f"speed-up: {schema_seconds / row_seconds:.1f}x")
+
+
+def synthetic_ndjson(rows, first=0):
+    """NDJSON stream of `rows` synthetic observations for the benchmarks"""
+    import io
+
+    lines = [
+        json.dumps({
+            "timestamp": (UNIX_EPOCH + timedelta(days=20000, seconds=i * 60)).isoformat(),
+            "timezone": "UTC",
+            "coordinates": f"lat={(i % 1800) / 10 - 90:.1f},long={(i % 3600) / 10 - 180:.1f}",
+            "satellite_id": f"SAT-{i % 8:03d}",
+            "spectral_indices": {"NDVI": (i % 100) / 100, "EVI": (i % 70) / 100},
+        }).encode() + b"\n"
+        for i in range(first, first + rows)
+    ]
+    return io.BytesIO(b"".join(lines))
+
+
+@app.cli.command("bench-ingest")
+@click.option("--rows", default=200000, show_default=True, help="Number of synthetic observations")
+@click.option("--chunk-size", default=INGEST_CHUNK_SIZE, show_default=True)
+def bench_ingest(rows, chunk_size):
+    """
+    Measure NDJSON bulk ingest throughput (rows/s) into a temporary SQLite file.
+    """
+    import tempfile
+
+    stream = synthetic_ndjson(rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = db.create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        db.metadata.create_all(engine)
+        start = time.perf_counter()
+        result = ingest_ndjson_stream(stream, chunk_size=chunk_size, engine=engine)
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    click.echo(f"ingested {result['created_count']} rows in {elapsed:.2f}s "
+               f"({result['created_count'] / elapsed:,.0f} rows/s, chunk size {chunk_size})")
+
+
+def bench_reader(url, readers, go, stop, results):
+    """bench-concurrency reader process: GET /observations-style queries until stopped"""
+    url = make_url(url)
+    engine = db.create_engine(url, **pool_options(url, readers))
+    table = Observation.__table__
+    query = (db.select(table).where(table.c.satellite_id == f"SAT-{os.getpid() % 8:03d}")
+             .order_by(table.c.timestamp.desc()).limit(100))
+    latencies, failed = [], 0
+    go.wait()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).fetchall()
+        except db.exc.OperationalError:
+            failed += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    engine.dispose()
+    results.put(('read', latencies, failed))
+
+
+def bench_writer(url, first, batch, go, stop, results):
+    """bench-concurrency writer process: bulk-insert batches until stopped"""
+    url = make_url(url)
+    engine = db.create_engine(url, **pool_options(url, app.config['DB_POOL_SIZE']))
+    written, failed = 0, 0
+    go.wait()
+    while not stop.is_set():
+        try:
+            written += ingest_ndjson_stream(synthetic_ndjson(batch, first + written), engine=engine)['created_count']
+        except db.exc.OperationalError:
+            failed += 1
+    engine.dispose()
+    results.put(('write', written, failed))
+
+
+@app.cli.command("bench-concurrency")
+@click.option("--readers", default=4, show_default=True, help="Reader processes")
+@click.option("--seconds", default=5.0, show_default=True, help="Duration per configuration")
+@click.option("--rows", default=50000, show_default=True, help="Rows loaded before the run")
+@click.option("--batch", default=2000, show_default=True, help="Rows per write transaction")
+def bench_concurrency(readers, seconds, rows, batch):
+    """
+    Measure GET-style reads while a writer keeps bulk-inserting into a
+    temporary SQLite file, with the rollback journal (readers share the
+    writer's database URL) and with WAL (readers use the read-only URL).
+    Readers and the writer are separate processes, like gunicorn workers.
+    """
+    import multiprocessing
+    import statistics
+    import tempfile
+
+    context = multiprocessing.get_context()
+    journal_mode = app.config['SQLITE_JOURNAL_MODE']
+    try:
+        for mode in ('delete', 'wal'):
+            app.config['SQLITE_JOURNAL_MODE'] = mode
+            with tempfile.TemporaryDirectory() as tmp:
+                url = make_url(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+                engine = db.create_engine(url)
+                db.metadata.create_all(engine)
+                ingest_ndjson_stream(synthetic_ndjson(rows), engine=engine)
+                engine.dispose()
+                read_url = sqlite_read_only_url(url) if mode == 'wal' else url
+
+                go, stop, results = context.Event(), context.Event(), context.Queue()
+                workers = [context.Process(target=bench_writer,
+                                           args=(str(url), rows, batch, go, stop, results))]
+                workers += [context.Process(target=bench_reader,
+                                            args=(read_url.render_as_string(), 1, go, stop, results))
+                            for _ in range(readers)]
+                for worker in workers:
+                    worker.start()
+                go.set()
+                time.sleep(seconds)
+                stop.set()
+                reports = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+
+            latencies = sorted(latency for kind, values, _ in reports if kind == 'read' for latency in values)
+            written = sum(values for kind, values, _ in reports if kind == 'write')
+            failed = sum(count for _, _, count in reports)
+            p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+            click.echo(
+                f"{mode:>6}: {len(latencies) / seconds:,.0f} reads/s "
+                f"(p50 {statistics.median(latencies or [0]) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms), "
+                f"{written / seconds:,.0f} rows/s written, {failed} failed"
+            )
+    finally:
+        app.config['SQLITE_JOURNAL_MODE'] = journal_mode
+
+
+@app.cli.command("bench-group-commit")
+@click.option("--clients", default=16, show_default=True, help="Concurrent client threads")
+@click.option("--requests", "per_client", default=200, show_default=True, help="Observations per client")
+@click.option("--synchronous", default=None, help="SQLite synchronous pragma (default: SQLITE_SYNCHRONOUS)")
+def bench_group_commit(clients, per_client, synchronous):
+    """
+    Compare single-observation inserts with one commit per request against
+    the group-commit queue, on a temporary SQLite file.
+    """
+    import tempfile
+
+    def observation(i):
+        values, _ = validate_observation_data({
+            "timestamp": (UNIX_EPOCH + timedelta(days=20000, seconds=i * 60)).isoformat(),
+            "timezone": "UTC",
+            "coordinates": f"lat={(i % 1800) / 10 - 90:.1f},long={(i % 3600) / 10 - 180:.1f}",
+            "satellite_id": f"SAT-{i % 8:03d}",
+            "spectral_indices": {"NDVI": (i % 100) / 100},
+        })
+        return values, {"ndvi": (i % 100) / 100}
+
+    def per_request(engine):
+        def insert(i):
+            values, bands = observation(i)
+            with engine.connect() as conn:
+                insert_observation_rows(conn, [values], [bands])
+                conn.commit()
+        return insert
+
+    def grouped(engine):
+        writer = GroupCommitQueue(engine)
+        return lambda i: writer.submit(*observation(i)).result()
+
+    settings = app.config['SQLITE_SYNCHRONOUS']
+    app.config['SQLITE_SYNCHRONOUS'] = synchronous or settings
+    try:
+        for name, make_insert in (("per-request commit", per_request), ("group commit", grouped)):
+            with tempfile.TemporaryDirectory() as tmp:
+                url = make_url(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+                engine = db.create_engine(url, **pool_options(url, clients))
+                db.metadata.create_all(engine)
+                insert = make_insert(engine)
+
+                def client(first):
+                    for i in range(first, first + per_client):
+                        insert(i)
+
+                threads = [threading.Thread(target=client, args=(n * per_client,)) for n in range(clients)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                with engine.connect() as conn:
+                    stored = conn.execute(db.select(db.func.count()).select_from(Observation.__table__)).scalar()
+                engine.dispose()
+            click.echo(f"{name:>18}: {stored} rows in {elapsed:.2f}s ({stored / elapsed:,.0f} rows/s, "
+                       f"{clients} clients, synchronous={app.config['SQLITE_SYNCHRONOUS']})")
+    finally:
+        app.config['SQLITE_SYNCHRONOUS'] = settings
+
+
+# ============================================
+# APPLICATION FACTORY
+# ============================================
+# Importing this module registers the routes, models and CLI commands and
+# creates the (not yet connected) engines from DATABASE_URL and the DB_*
+# settings; it does no I/O. create_app() finishes startup once per process: it
+# attaches Swagger and creates/upgrades/seeds the database. There is a single
+# module-level `app`, so every call returns it, and database settings passed
+# to create_app() cannot take effect: it rejects them. Run gunicorn as
+#     gunicorn --preload -w 4 "app:create_app()"
+# so this happens once in the master and workers fork ready to serve.
+# Entry points that load the module-level `app` directly (`flask --app app
+# run`, `gunicorn app:app`) are initialised by the WSGI wrapper below before
+# their first request instead.
+
+app_initialised = False
+app_init_lock = threading.Lock()
+
+
+# Decided when the engines are created at import time
+DATABASE_SETTINGS = (
+    'SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_BINDS', 'SQLALCHEMY_ENGINE_OPTIONS', 'DB_READ_POOL',
+    'DB_POOL_SIZE', 'DB_READ_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE',
+)
+
+
+@contextmanager
+def startup_lock():
+    """Serialise create_app() across worker processes started without --preload"""
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, '.startup.lock'), 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def init_swagger():
+    """Attach Swagger UI (/apidocs) unless SWAGGER_ENABLED is off."""
+    global swagger
+    if swagger is not None or not app.config['SWAGGER_ENABLED']:
+        return
+    from flasgger import Swagger
+    # flasgger builds the OpenAPI spec from the route docstrings on the first
+    # /apispec_1.json request and caches it (outside debug mode)
+    swagger = Swagger(app)
+
+
+def create_app(config=None):
+    """
+    Return the configured application with its database ready.
+    `config` overrides app.config values first (e.g. {'SWAGGER_ENABLED': False}).
+    Database settings (DATABASE_SETTINGS) are fixed at import time: set
+    DATABASE_URL and the DB_* environment variables instead; passing a
+    different value here raises ValueError.
+    Safe to call more than once, also from several processes at once.
+    """
+    global app_initialised
+    config = config or {}
+    fixed = [key for key in DATABASE_SETTINGS if key in config and config[key] != app.config.get(key)]
+    if fixed:
+        raise ValueError(f"create_app() cannot change {', '.join(fixed)}: the engines are created when "
+                         f"app.py is imported. Set DATABASE_URL / DB_* in the environment before importing it.")
+    app.config.update(config)
+    validate_rate_limit_tiers(app.config['RATE_LIMIT_TIERS'])
+    init_swagger()
+    metrics.remove_dead_files()
+    with app.app_context(), startup_lock():
+        init_database()
+        result_store.use_database(get_data_version(DATABASE_GENERATION))
+        fail_orphaned_import_jobs()
+        # Close the connections startup opened: with --preload the workers
+        # would otherwise inherit them, and a SQLite connection must not be
+        # shared across fork. Each worker opens its own on first use.
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # Drains the density_pending rows queued by inserts and by the startup
+    # backfill, whether or not anyone requests a tile
+    density_refresher.start()
+    app_initialised = True
+    return app
+
+
+def dispose_engines_after_fork():
+    # Background threads (e.g. the density refresher) keep using the parent's
+    # pools after create_app(); a forked child must not reuse those connections
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+
+def initialise_on_first_request(wsgi_app):
+    """
+    Wrap app.wsgi_app so an app that was not started through create_app()
+    runs it before serving its first request (Swagger can still be attached
+    at that point, unlike in a before_request hook).
+    """
+    @wraps(wsgi_app)
+    def wrapper(environ, start_response):
+        if not app_initialised:
+            with app_init_lock:
+                if not app_initialised:
+                    app.logger.warning('create_app() was not called; initialising on the first request. '
+                                       'Serve "app:create_app()" to do this at startup.')
+                    create_app()
+        return wsgi_app(environ, start_response)
+    return wrapper
+
+
+app.wsgi_app = initialise_on_first_request(app.wsgi_app)
+
+
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as backend
+imported = time.perf_counter()
+backend.create_app({'SWAGGER_ENABLED': %r})
+ready = time.perf_counter()
+json.dump({'import_ms': (imported - started) * 1000, 'create_app_ms': (ready - imported) * 1000}, sys.stdout)
+"""
+
+
+@app.cli.command("bench-startup")
+@click.option("--repeat", default=5, show_default=True, help="Fresh interpreter runs per configuration")
+def bench_startup(repeat):
+    """Measure cold start: module import and create_app() in fresh interpreters."""
+    import statistics
+    import subprocess
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    for swagger_enabled in (True, False):
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-c', STARTUP_PROBE % swagger_enabled],
+                cwd=backend_dir, capture_output=True, text=True, check=True,
+            )
+            total = (time.perf_counter() - started) * 1000
+            # The probe's JSON is the last line; SQLALCHEMY_ECHO may print before it
+            runs.append(dict(json.loads(result.stdout.strip().splitlines()[-1]), total_ms=total))
+        summary = ", ".join(
+            f"{key} {statistics.median(run[key] for run in runs):.0f}"
+            for key in ('import_ms', 'create_app_ms', 'total_ms')
+        )
+        click.echo(f"swagger {'on ' if swagger_enabled else 'off'}: median of {repeat}: {summary}")
+
+
 # -----------------------------
 # RUN SERVER
 # -----------------------------
 if __name__ == "__main__":
     # Start the Flask development server with debug mode on
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,51 @@
+"""
+Tests for the Flask API, run from backend/:
+
+    python -m unittest
+
+app.py creates its database engines when it is imported, so the throw-away
+database and state directories are set in the environment here, before any
+test module imports it.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+STATE_DIR = tempfile.mkdtemp(prefix='terrascope-tests-')
+atexit.register(shutil.rmtree, STATE_DIR, ignore_errors=True)
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(STATE_DIR, 'test.db')}"
+os.environ['SQLALCHEMY_ECHO'] = 'false'
+os.environ['SWAGGER_ENABLED'] = 'false'
+os.environ['REVOCATION_SNAPSHOT_PATH'] = os.path.join(STATE_DIR, 'revocations.ndjson')
+for name in ('RATE_LIMIT_DIR', 'METRICS_DIR', 'RESULT_STORE_DIR', 'IMPORT_UPLOAD_DIR', 'SEGMENT_DIR', 'USAGE_SPOOL_DIR'):
+    os.environ[name] = os.path.join(STATE_DIR, name.lower())
+
+from app import create_app  # noqa: E402  (needs the environment above)
+
+
+class ApiTestCase(unittest.TestCase):
+    """Test client logged in as the seeded Flask JWT user, on the shared test database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app({'TESTING': True})
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        response = self.client.post('/auth/login', json={'username': 'testuser', 'password': 'testpass'})
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+        # Tests share one database, so each one works on its own satellite
+        self.satellite_id = f'TEST-{uuid.uuid4().hex[:8]}'
+
+    def observation(self, timestamp, **bands):
+        return {
+            'timestamp': timestamp.isoformat(timespec='seconds'),
+            'timezone': 'UTC',
+            'coordinates': 'lat=45.5,long=-122.6',
+            'satellite_id': self.satellite_id,
+            'spectral_indices': bands or {'ndvi': 0.5},
+        }
@@ -0,0 +1,47 @@
+"""
+Tests for the band_rollups maintained on writes and served by GET /observations/aggregate
+"""
+from datetime import timedelta
+
+from tests import ApiTestCase  # before app: sets up the test database
+from app import get_current_quarter_start
+
+
+class BandRollupTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.timestamp = get_current_quarter_start() + timedelta(days=2, hours=10)
+
+    def ndvi_stats(self):
+        response = self.client.get(
+            f'/observations/aggregate?granularity=day&satellite_id={self.satellite_id}', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        buckets = response.get_json()['buckets']
+        self.assertEqual(len(buckets), 1)
+        return buckets[0]['bands']['ndvi']
+
+    def assertStats(self, stats, count, low, high, mean):
+        self.assertEqual(stats['count'], count)
+        self.assertAlmostEqual(stats['min'], low)
+        self.assertAlmostEqual(stats['max'], high)
+        self.assertAlmostEqual(stats['mean'], mean)
+
+    def test_rollups_follow_post_patch_and_bulk(self):
+        first = self.client.post('/observations', json=self.observation(self.timestamp, ndvi=0.2),
+                                 headers=self.headers)
+        self.client.post('/observations', json=self.observation(self.timestamp, ndvi=0.6), headers=self.headers)
+        self.assertStats(self.ndvi_stats(), 2, 0.2, 0.6, 0.4)
+
+        # Replacing the minimum must drop it from the bucket, not only add the new value
+        obs_id = first.get_json()['observation']['id']
+        response = self.client.patch(f'/observations/{obs_id}', json={'spectral_indices': {'ndvi': 0.8}},
+                                     headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertStats(self.ndvi_stats(), 2, 0.6, 0.8, 0.7)
+
+        response = self.client.post('/observations/bulk', json=[self.observation(self.timestamp, ndvi=0.1)],
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertStats(self.ndvi_stats(), 3, 0.1, 0.8, 0.5)
@@ -0,0 +1,63 @@
+"""
+Tests for POST /observations through the group-commit writer
+"""
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from tests import ApiTestCase  # before app: sets up the test database
+from app import Observation, get_current_quarter_start, group_commit
+
+
+class GroupCommitTimeoutTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        config = patch.dict(self.app.config, {'GROUP_COMMIT_ENABLED': True, 'GROUP_COMMIT_TIMEOUT_SECONDS': 0.3})
+        config.start()
+        self.addCleanup(config.stop)
+        self.timestamp = get_current_quarter_start() + timedelta(days=1)
+
+    def stored_rows(self):
+        with self.app.app_context():
+            return Observation.query.filter_by(satellite_id=self.satellite_id).count()
+
+    def test_commit_without_timeout_returns_201(self):
+        response = self.client.post('/observations', json=self.observation(self.timestamp), headers=self.headers)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stored_rows(), 1)
+
+    def test_timeout_returns_503_and_withdraws_queued_row(self):
+        # Hold the writer inside its first batch so the requests time out
+        release = threading.Event()
+        commit = group_commit.commit
+
+        def held_commit(batch):
+            release.wait(10)
+            commit(batch)
+
+        with patch.object(group_commit, 'commit', held_commit):
+            try:
+                # Taken by the writer before the timeout: it may still land
+                running = self.client.post('/observations', json=self.observation(self.timestamp),
+                                           headers=self.headers)
+                # Still queued behind it: withdrawn
+                queued = self.client.post('/observations', json=self.observation(self.timestamp),
+                                          headers=self.headers)
+            finally:
+                release.set()
+
+            self.assertEqual(running.status_code, 503)
+            self.assertIn('may still be saved', running.get_json()['error'])
+            self.assertEqual(queued.status_code, 503)
+            self.assertIn('was not saved', queued.get_json()['error'])
+
+            deadline = time.monotonic() + 5
+            while self.stored_rows() < 1 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            # Give the writer time to (wrongly) commit the withdrawn row too
+            time.sleep(0.2)
+
+        self.assertEqual(self.stored_rows(), 1)
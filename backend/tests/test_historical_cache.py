@@ -0,0 +1,48 @@
+"""
+Tests for the ETag and Cache-Control of historical (closed quarter) list queries
+"""
+from datetime import timedelta
+
+from tests import ApiTestCase  # before app: sets up the test database
+from app import get_current_quarter_start
+
+
+class HistoricalQueryTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        quarter_start = get_current_quarter_start()
+        self.back_dated = quarter_start - timedelta(days=120)
+        self.url = (f'/observations?satellite_id={self.satellite_id}'
+                    f'&end_date={(quarter_start - timedelta(days=1)).date().isoformat()}')
+
+    def test_etag_changes_after_back_dated_insert(self):
+        self.client.post('/observations', json=self.observation(self.back_dated), headers=self.headers)
+
+        first = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.get_json()), 1)
+        self.assertNotIn('immutable', first.headers['Cache-Control'])
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+
+        revalidated = self.client.get(self.url, headers=dict(self.headers, **{'If-None-Match': first.headers['ETag']}))
+        self.assertEqual(revalidated.status_code, 304)
+
+        response = self.client.post('/observations', json=self.observation(self.back_dated + timedelta(days=1)),
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+        after = self.client.get(self.url, headers=dict(self.headers, **{'If-None-Match': first.headers['ETag']}))
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(len(after.get_json()), 2)
+
+    def test_current_quarter_insert_keeps_historical_etag(self):
+        self.client.post('/observations', json=self.observation(self.back_dated), headers=self.headers)
+        first = self.client.get(self.url, headers=self.headers)
+
+        self.client.post('/observations', json=self.observation(get_current_quarter_start() + timedelta(days=1)),
+                         headers=self.headers)
+
+        after = self.client.get(self.url, headers=dict(self.headers, **{'If-None-Match': first.headers['ETag']}))
+        self.assertEqual(after.status_code, 304)
@@ -0,0 +1,59 @@
+"""
+Tests for the shared token buckets behind the Django token rate limits and quotas
+"""
+import shutil
+import tempfile
+import time
+import uuid
+from unittest.mock import patch
+
+import jwt
+
+from tests import ApiTestCase  # before app: sets up the test database
+from app import SharedTokenBuckets
+
+
+class SharedQuotaTest(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_quota_is_shared_by_bucket_instances_on_one_file(self):
+        # Two instances on the same file stand in for two gunicorn workers
+        with patch.dict(self.app.config, {'RATE_LIMIT_DIR': self.directory}):
+            first = SharedTokenBuckets('quotas', evict=False)
+            second = SharedTokenBuckets('quotas', evict=False)
+
+            taken = [first.take('subscription:1', 0, 3)[0], second.take('subscription:1', 0, 3)[0],
+                     first.take('subscription:1', 0, 3)[0]]
+            self.assertEqual(taken, [True, True, True])
+
+            self.assertFalse(second.take('subscription:1', 0, 3)[0])
+            self.assertFalse(first.take('subscription:1', 0, 3)[0])
+            # Other subscriptions keep their own quota
+            self.assertTrue(second.take('subscription:2', 0, 3)[0])
+
+    def test_full_quota_table_raises_instead_of_evicting(self):
+        with patch.dict(self.app.config, {'RATE_LIMIT_DIR': self.directory, 'RATE_LIMIT_SLOTS': 16}):
+            quotas = SharedTokenBuckets('quotas', evict=False)
+            for n in range(16):
+                self.assertTrue(quotas.take(f'subscription:{n}', 0, 1)[0])
+
+            with self.assertRaises(RuntimeError):
+                quotas.take('subscription:99', 0, 1)
+            # Exhausted subscriptions stay exhausted
+            self.assertFalse(quotas.take('subscription:0', 0, 1)[0])
+
+    def test_used_up_quota_returns_429(self):
+        now = int(time.time())
+        token = jwt.encode({
+            'user_id': 1, 'subscription_id': int(uuid.uuid4().int % 10 ** 9), 'product_id': 1,
+            'jti': uuid.uuid4().hex, 'tier': 'basic', 'api_calls_limit': 3, 'iat': now, 'exp': now + 3600,
+        }, self.app.config['DJANGO_JWT_SECRET'], algorithm='HS256')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        statuses = [self.client.get('/api/me', headers=headers).status_code for _ in range(4)]
+
+        self.assertEqual(statuses, [200, 200, 200, 429])
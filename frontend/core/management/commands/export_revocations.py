@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.revocations import snapshot_path, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the revoked-token / inactive-subscription snapshot read by the Flask API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Rewrite the snapshot every N seconds instead of once'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            count = write_snapshot()
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ Wrote {count} revocation(s) to {snapshot_path()}')
+            )
+            if interval <= 0:
+                break
+            time.sleep(interval)
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.usage import ingest_spool, interrupted_batches, spool_dir
+
+
+class Command(BaseCommand):
+    help = 'Add the usage batches written by the Flask API to subscription usage statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep ingesting every N seconds instead of once'
+        )
+        parser.add_argument(
+            '--max-files',
+            type=int,
+            default=500,
+            help='Maximum number of batch files added in one transaction'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            files, rows = ingest_spool(max_files=options['max_files'])
+            if files or not interval:
+                self.stdout.write(
+                    self.style.SUCCESS(f'✅ Ingested {files} usage batch(es) into {rows} daily usage row(s)')
+                )
+            if interval <= 0:
+                break
+            time.sleep(interval)
+
+        leftover = interrupted_batches()
+        if leftover:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ {len(leftover)} batch(es) in {spool_dir()} were claimed by an interrupted run. '
+                'Check SubscriptionUsage before renaming them back to .ndjson.'
+            ))
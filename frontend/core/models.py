@@ -2,12 +2,15 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 import jwt
 from django.conf import settings
 import uuid
 
+from .revocations import publish_changes
+
 
 class UserProfile(models.Model):
     """Extended user profile with additional information"""
@@ -250,4 +253,54 @@ class UserToken(models.Model):
     def mark_as_used(self):
         """Update last_used timestamp"""
         self.last_used = timezone.now()
-        self.save(update_fields=['last_used'])
\ No newline at end of file
+        self.save(update_fields=['last_used'])
+
+
+# ========================================
+# REVOCATION SNAPSHOT (read by the Flask API)
+# ========================================
+# Revoking a token or pausing/cancelling a subscription is appended to the
+# revocation snapshot once the transaction commits (see core/revocations.py).
+# Bulk .update() calls bypass these signals; the existing ones only touch
+# expired tokens and subscriptions, which Flask already rejects through the
+# token's exp claim. `manage.py export_revocations` rewrites the whole file.
+
+@receiver(pre_save, sender=UserToken)
+def remember_token_state(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored is_active value so post_save can tell whether it changed"""
+    if update_fields is not None and 'is_active' not in update_fields:
+        instance._was_active = instance.is_active  # e.g. mark_as_used(); nothing to publish
+        return
+    instance._was_active = (
+        sender.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+        if instance.pk else True
+    )
+
+
+@receiver(post_save, sender=UserToken)
+def publish_token_revocation(sender, instance, **kwargs):
+    """Publish the token's jti when it is revoked (or un-revoked)"""
+    if getattr(instance, '_was_active', True) != instance.is_active:
+        revoked = not instance.is_active
+        transaction.on_commit(lambda: publish_changes(jtis=[instance.token_id], revoked=revoked))
+
+
+@receiver(pre_save, sender=Subscription)
+def remember_subscription_status(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored status so post_save can tell whether it changed"""
+    if update_fields is not None and 'status' not in update_fields:
+        instance._previous_status = instance.status
+        return
+    instance._previous_status = (
+        sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        if instance.pk else 'active'
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def publish_subscription_status(sender, instance, **kwargs):
+    """Publish the subscription when it stops (or starts again) being active"""
+    was_active = getattr(instance, '_previous_status', 'active') == 'active'
+    if was_active != (instance.status == 'active'):
+        revoked = instance.status != 'active'
+        transaction.on_commit(lambda: publish_changes(subscription_ids=[instance.id], revoked=revoked))
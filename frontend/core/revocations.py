@@ -0,0 +1,127 @@
+"""
+Revocation snapshot shared with the Flask API.
+
+The Flask API validates Django-issued JWTs on its own and cannot query this
+database on every request. Instead, revoked token ids (the `jti` claim) and the
+ids of subscriptions that are no longer active are published to a
+newline-delimited JSON file (settings.REVOCATION_SNAPSHOT_PATH) that Flask
+loads into memory and tails in the background.
+
+File format, one JSON object per line:
+    {"snapshot": "2025-01-15T14:30:00+00:00", "format": 1}   first line
+    {"jti": "<uuid>", "revoked": true}
+    {"subscription_id": 12, "revoked": true}
+    {"subscription_id": 12, "api_calls_made": 480}
+
+The api_calls_made lines carry the usage Django has recorded for active
+subscriptions (see core/usage.py). Flask never lets a subscription's remaining
+quota exceed api_calls_limit minus this value, so its own per-host counters
+cannot hand out calls that were already made.
+
+`write_snapshot()` rewrites the whole file (atomically, via a temporary file).
+Individual changes are appended by `publish_changes()` after the database
+transaction commits; a later line for the same id overrides an earlier one,
+so `"revoked": false` undoes a revocation (e.g. a resumed subscription).
+"""
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.utils import timezone
+
+SNAPSHOT_FORMAT = 1
+
+
+def snapshot_path():
+    return str(settings.REVOCATION_SNAPSHOT_PATH)
+
+
+def revocation_entries():
+    """
+    Yield snapshot lines for every revoked token and inactive subscription
+    that could still be presented: tokens and subscriptions past their expiry
+    are rejected by the token's own `exp` claim and are left out.
+    """
+    from core.models import Subscription, UserToken
+
+    now = timezone.now()
+    revoked_tokens = UserToken.objects.filter(is_active=False, expires_at__gt=now)
+    for token_id in revoked_tokens.values_list('token_id', flat=True).iterator():
+        yield {'jti': str(token_id), 'revoked': True}
+
+    inactive_subscriptions = Subscription.objects.exclude(status='active').filter(expires_at__gt=now)
+    for subscription_id in inactive_subscriptions.values_list('id', flat=True).iterator():
+        yield {'subscription_id': subscription_id, 'revoked': True}
+
+
+def usage_entries(subscription_ids=None):
+    """Yield api_calls_made lines for active, unexpired subscriptions that have made calls"""
+    from core.models import Subscription
+
+    subscriptions = Subscription.objects.filter(
+        status='active', expires_at__gt=timezone.now(), api_calls_made__gt=0
+    )
+    if subscription_ids is not None:
+        subscriptions = subscriptions.filter(pk__in=subscription_ids)
+    for subscription_id, calls in subscriptions.values_list('id', 'api_calls_made').iterator():
+        yield {'subscription_id': subscription_id, 'api_calls_made': calls}
+
+
+def write_snapshot(path=None):
+    """
+    Rewrite the snapshot file from the database.
+    Returns the number of revocation entries written (usage lines are not counted).
+    """
+    path = path or snapshot_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    count = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.revocations-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'snapshot': timezone.now().isoformat(), 'format': SNAPSHOT_FORMAT}) + '\n')
+            for entry in revocation_entries():
+                f.write(json.dumps(entry) + '\n')
+                count += 1
+            for entry in usage_entries():
+                f.write(json.dumps(entry) + '\n')
+        # Readers holding the old file keep reading it; new readers see the new one
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return count
+
+
+def publish_changes(jtis=(), subscription_ids=(), revoked=True):
+    """
+    Append revocation changes to the snapshot file (or create the full
+    snapshot if there is none yet). Each call is a single write, so lines from
+    concurrent processes do not interleave.
+    """
+    path = snapshot_path()
+    if not os.path.exists(path):
+        write_snapshot(path)
+        return
+    lines = [json.dumps({'jti': str(jti), 'revoked': revoked}) for jti in jtis]
+    lines += [json.dumps({'subscription_id': sid, 'revoked': revoked}) for sid in subscription_ids]
+    if lines:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def publish_usage(subscription_ids):
+    """
+    Append the current api_calls_made of the given subscriptions (called after
+    usage batches are ingested), or create the full snapshot if there is none yet.
+    """
+    path = snapshot_path()
+    if not os.path.exists(path):
+        write_snapshot(path)
+        return
+    lines = [json.dumps(entry) for entry in usage_entries(subscription_ids)]
+    if lines:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
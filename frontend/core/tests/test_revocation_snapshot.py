@@ -0,0 +1,145 @@
+"""
+Tests for the revocation snapshot shared with the Flask API
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import User, Product, Subscription, UserToken
+from core.revocations import publish_usage, write_snapshot
+
+
+class RevocationSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'revocations.ndjson')
+        override = override_settings(REVOCATION_SNAPSHOT_PATH=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+        self.user = User.objects.create_user(username='tokenowner', password='testpass123')
+        self.product = Product.objects.create(
+            name='Starter Plan',
+            description='Perfect for individuals getting started',
+            price_10_minutes=Decimal('9.99'),
+            price_2_hours=Decimal('29.99'),
+            price_1_week=Decimal('99.99'),
+            api_calls_limit=500,
+            data_limit_mb=50,
+        )
+        self.subscription = Subscription.objects.create(
+            user=self.user,
+            product=self.product,
+            expires_at=timezone.now() + timedelta(days=7),
+            total_cost=Decimal('99.99'),
+            api_calls_limit=500,
+            data_limit_mb=50,
+        )
+        self.token = UserToken.objects.create(
+            user=self.user,
+            subscription=self.subscription,
+            token='header.payload.signature',
+            expires_at=timezone.now() + timedelta(days=7),
+        )
+
+    def read_lines(self):
+        with open(self.path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_write_snapshot_lists_revoked_tokens_and_inactive_subscriptions(self):
+        UserToken.objects.filter(pk=self.token.pk).update(is_active=False)
+        Subscription.objects.filter(pk=self.subscription.pk).update(status='paused')
+
+        count = write_snapshot()
+
+        lines = self.read_lines()
+        self.assertEqual(count, 2)
+        self.assertEqual(lines[0]['format'], 1)
+        self.assertIn({'jti': str(self.token.token_id), 'revoked': True}, lines[1:])
+        self.assertIn({'subscription_id': self.subscription.id, 'revoked': True}, lines[1:])
+
+    def test_write_snapshot_skips_expired_entries(self):
+        UserToken.objects.filter(pk=self.token.pk).update(
+            is_active=False, expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertEqual(write_snapshot(), 0)
+        self.assertEqual(len(self.read_lines()), 1)
+
+    def test_revoking_token_appends_jti_after_commit(self):
+        write_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.is_active = False
+            self.token.save()
+
+        self.assertEqual(self.read_lines()[-1], {'jti': str(self.token.token_id), 'revoked': True})
+
+    def test_marking_token_used_does_not_publish(self):
+        write_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.token.mark_as_used()
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(self.read_lines()), 1)
+
+    def test_pausing_and_resuming_subscription(self):
+        write_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subscription.status = 'paused'
+            self.subscription.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subscription.status = 'active'
+            self.subscription.save()
+
+        self.assertEqual(self.read_lines()[1:], [
+            {'subscription_id': self.subscription.id, 'revoked': True},
+            {'subscription_id': self.subscription.id, 'revoked': False},
+        ])
+
+    def test_first_change_creates_full_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.is_active = False
+            self.token.save()
+
+        lines = self.read_lines()
+        self.assertIn('snapshot', lines[0])
+        self.assertEqual(lines[1:], [{'jti': str(self.token.token_id), 'revoked': True}])
+
+    def test_write_snapshot_lists_usage_of_active_subscriptions(self):
+        Subscription.objects.filter(pk=self.subscription.pk).update(api_calls_made=120)
+
+        self.assertEqual(write_snapshot(), 0)
+
+        self.assertEqual(self.read_lines()[1:], [
+            {'subscription_id': self.subscription.id, 'api_calls_made': 120},
+        ])
+
+    def test_publish_usage_appends_current_totals(self):
+        write_snapshot()
+        Subscription.objects.filter(pk=self.subscription.pk).update(api_calls_made=7)
+
+        publish_usage([self.subscription.id])
+
+        self.assertEqual(self.read_lines()[-1], {'subscription_id': self.subscription.id, 'api_calls_made': 7})
+
+    def test_export_revocations_command(self):
+        UserToken.objects.filter(pk=self.token.pk).update(is_active=False)
+        out = StringIO()
+
+        call_command('export_revocations', stdout=out)
+
+        self.assertIn('Wrote 1 revocation(s)', out.getvalue())
+        self.assertEqual(len(self.read_lines()), 2)
@@ -0,0 +1,130 @@
+"""
+Tests for ingesting the usage batches written by the Flask API
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import User, Product, Subscription, SubscriptionUsage
+from core.usage import ingest_spool
+
+
+class UsageIngestTest(TestCase):
+
+    def setUp(self):
+        self.spool = tempfile.mkdtemp()
+        override = override_settings(USAGE_SPOOL_DIR=self.spool)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.spool, ignore_errors=True)
+
+        self.user = User.objects.create_user(username='meteredbuyer', password='testpass123')
+        self.product = Product.objects.create(
+            name='Starter Plan',
+            description='Perfect for individuals getting started',
+            price_1_week=Decimal('99.99'),
+            api_calls_limit=500,
+            data_limit_mb=50,
+        )
+        self.subscription = Subscription.objects.create(
+            user=self.user,
+            product=self.product,
+            expires_at=timezone.now() + timedelta(days=7),
+            total_cost=Decimal('99.99'),
+            api_calls_limit=500,
+            data_limit_mb=50,
+        )
+        self.day = date(2025, 1, 15)
+
+    def write_batch(self, name, *entries):
+        with open(os.path.join(self.spool, name), 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+
+    def entry(self, **values):
+        entry = {
+            'subscription_id': self.subscription.id, 'date': self.day.isoformat(),
+            'api_calls': 10, 'requests_successful': 9, 'requests_failed': 1,
+            'bytes': 2 * 1024 * 1024, 'latency_ms_total': 1000.0, 'last_seen': 1736951400.0,
+        }
+        entry.update(values)
+        return entry
+
+    def test_ingest_creates_daily_row_and_updates_subscription(self):
+        self.write_batch('usage-1.ndjson', self.entry())
+
+        self.assertEqual(ingest_spool(), (1, 1))
+
+        usage = SubscriptionUsage.objects.get(subscription=self.subscription, date=self.day)
+        self.assertEqual(usage.api_calls, 10)
+        self.assertEqual(usage.requests_successful, 9)
+        self.assertEqual(usage.requests_failed, 1)
+        self.assertEqual(usage.data_downloaded_mb, Decimal('2.00'))
+        self.assertEqual(usage.avg_response_time_ms, Decimal('100.00'))
+
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.api_calls_made, 10)
+        self.assertEqual(self.subscription.data_downloaded_mb, Decimal('2.00'))
+        self.assertIsNotNone(self.subscription.last_accessed)
+        self.assertEqual(os.listdir(self.spool), [])
+
+    def test_batches_accumulate_into_existing_row(self):
+        self.write_batch('usage-1.ndjson', self.entry())
+        ingest_spool()
+        self.write_batch('usage-2.ndjson', self.entry(api_calls=30, requests_successful=30,
+                                                      requests_failed=0, latency_ms_total=6000.0))
+        self.write_batch('usage-3.ndjson', self.entry(date=(self.day + timedelta(days=1)).isoformat()))
+
+        self.assertEqual(ingest_spool(), (2, 2))
+
+        usage = SubscriptionUsage.objects.get(subscription=self.subscription, date=self.day)
+        self.assertEqual(usage.api_calls, 40)
+        self.assertEqual(usage.requests_successful, 39)
+        self.assertEqual(usage.avg_response_time_ms, Decimal('175.00'))  # (1000 + 6000) / 40
+        self.assertEqual(SubscriptionUsage.objects.filter(subscription=self.subscription).count(), 2)
+
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.api_calls_made, 50)
+
+    def test_ingest_publishes_usage_to_revocation_snapshot(self):
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+        snapshot = os.path.join(snapshot_dir, 'revocations.ndjson')
+        self.write_batch('usage-1.ndjson', self.entry())
+
+        with override_settings(REVOCATION_SNAPSHOT_PATH=snapshot):
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_spool()
+
+        with open(snapshot, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertIn({'subscription_id': self.subscription.id, 'api_calls_made': 10}, lines)
+
+    def test_unknown_subscriptions_are_dropped(self):
+        self.write_batch('usage-1.ndjson', self.entry(subscription_id=self.subscription.id + 100))
+
+        self.assertEqual(ingest_spool(), (1, 0))
+        self.assertFalse(SubscriptionUsage.objects.exists())
+
+    def test_malformed_batch_is_rejected(self):
+        self.write_batch('usage-1.ndjson', {'subscription_id': self.subscription.id})
+        self.write_batch('usage-2.ndjson', self.entry())
+
+        self.assertEqual(ingest_spool(), (1, 1))
+        self.assertEqual(os.listdir(self.spool), ['usage-1.rejected'])
+
+    def test_ingest_usage_command(self):
+        self.write_batch('usage-1.ndjson', self.entry())
+        out = StringIO()
+
+        call_command('ingest_usage', stdout=out)
+
+        self.assertIn('Ingested 1 usage batch(es) into 1 daily usage row(s)', out.getvalue())
@@ -0,0 +1,173 @@
+"""
+Usage batches written by the Flask API.
+
+Flask meters every request made with a Django token and writes per-subscription,
+per-day totals as newline-delimited JSON batch files into
+settings.USAGE_SPOOL_DIR, one object per line:
+
+    {"subscription_id": 12, "date": "2025-01-15", "api_calls": 40,
+     "requests_successful": 38, "requests_failed": 2, "bytes": 912384,
+     "latency_ms_total": 1870.5, "last_seen": 1736951400.12}
+
+`ingest_spool()` claims the pending batches (renaming *.ndjson to
+*.ingesting so concurrent runs never add the same file twice), adds them to
+SubscriptionUsage and the Subscription totals in one transaction, and deletes
+them afterwards. Once the transaction commits, the new api_calls_made totals
+are published to the revocation snapshot, where Flask reads them to keep its
+quota counters in line with Django's.
+"""
+import glob
+import json
+import os
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from core.revocations import publish_usage
+
+BYTES_PER_MB = Decimal(1024 * 1024)
+CENT = Decimal('0.01')
+
+
+def spool_dir():
+    return str(settings.USAGE_SPOOL_DIR)
+
+
+def claim_batches(directory, max_files):
+    """Rename up to max_files pending batches to *.ingesting and return the new paths"""
+    claimed = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.ndjson')))[:max_files]:
+        target = path[:-len('.ndjson')] + '.ingesting'
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            continue  # claimed by another run
+        claimed.append(target)
+    return claimed
+
+
+def read_batch(path):
+    """Parse one batch file into a list of ((subscription_id, date), entry)"""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.append(((int(entry['subscription_id']), date.fromisoformat(entry['date'])), entry))
+    return entries
+
+
+def merge_entries(entries):
+    """Sum batch entries by (subscription_id, date)"""
+    totals = {}
+    for key, entry in entries:
+        total = totals.setdefault(key, {
+            'api_calls': 0, 'requests_successful': 0, 'requests_failed': 0,
+            'bytes': 0, 'latency_ms_total': 0.0, 'last_seen': 0.0,
+        })
+        for field in ('api_calls', 'requests_successful', 'requests_failed', 'bytes', 'latency_ms_total'):
+            total[field] += entry[field]
+        total['last_seen'] = max(total['last_seen'], entry['last_seen'])
+    return totals
+
+
+def apply_usage(totals):
+    """
+    Add merged totals to the daily SubscriptionUsage rows and to the
+    Subscription counters. Counters are incremented with F() expressions, so
+    concurrent writers never lose an update. Returns the number of daily rows
+    updated (entries for deleted subscriptions are dropped).
+    """
+    from core.models import Subscription, SubscriptionUsage
+
+    existing = set(
+        Subscription.objects.filter(pk__in={sid for sid, _ in totals}).values_list('pk', flat=True)
+    )
+    totals = {key: total for key, total in totals.items() if key[0] in existing}
+    if not totals:
+        return 0
+
+    per_subscription = {}
+    with transaction.atomic():
+        # Make sure every daily row exists; the no-op update keeps rows that do
+        SubscriptionUsage.objects.bulk_create(
+            [SubscriptionUsage(subscription_id=sid, date=day) for sid, day in totals],
+            update_conflicts=True,
+            unique_fields=['subscription', 'date'],
+            update_fields=['date'],
+        )
+
+        for (sid, day), total in totals.items():
+            megabytes = (Decimal(total['bytes']) / BYTES_PER_MB).quantize(CENT)
+            calls = total['api_calls']
+            SubscriptionUsage.objects.filter(subscription_id=sid, date=day).update(
+                api_calls=F('api_calls') + calls,
+                requests_successful=F('requests_successful') + total['requests_successful'],
+                requests_failed=F('requests_failed') + total['requests_failed'],
+                data_downloaded_mb=F('data_downloaded_mb') + megabytes,
+                # Weighted by call count; SQL evaluates the right-hand side with the old values
+                avg_response_time_ms=ExpressionWrapper(
+                    (F('avg_response_time_ms') * F('api_calls') + Value(Decimal(str(total['latency_ms_total']))))
+                    / (F('api_calls') + calls),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+            )
+            subscription_total = per_subscription.setdefault(sid, [0, Decimal(0), 0.0])
+            subscription_total[0] += calls
+            subscription_total[1] += megabytes
+            subscription_total[2] = max(subscription_total[2], total['last_seen'])
+
+        for sid, (calls, megabytes, last_seen) in per_subscription.items():
+            last_seen = datetime.fromtimestamp(last_seen, tz=dt_timezone.utc)
+            Subscription.objects.filter(pk=sid).update(
+                api_calls_made=F('api_calls_made') + calls,
+                data_downloaded_mb=F('data_downloaded_mb') + megabytes,
+                last_accessed=Coalesce(Greatest(F('last_accessed'), Value(last_seen)), Value(last_seen)),
+            )
+        subscription_ids = list(per_subscription)
+        transaction.on_commit(lambda: publish_usage(subscription_ids))
+    return len(totals)
+
+
+def ingest_spool(directory=None, max_files=500):
+    """
+    Ingest pending batch files. Returns (files ingested, daily rows updated).
+    Files that cannot be parsed are renamed to *.rejected and left for
+    inspection.
+    """
+    directory = directory or spool_dir()
+    if not os.path.isdir(directory):
+        return 0, 0
+
+    good, entries = [], []
+    for path in claim_batches(directory, max_files):
+        try:
+            batch = read_batch(path)
+            merge_entries(batch)   # rejects entries with missing or non-numeric fields
+        except (ValueError, KeyError, TypeError):
+            os.rename(path, path[:-len('.ingesting')] + '.rejected')
+            continue
+        good.append(path)
+        entries.extend(batch)
+
+    try:
+        rows = apply_usage(merge_entries(entries)) if entries else 0
+    except Exception:
+        # Rolled back: hand the batches back to the next run
+        for path in good:
+            os.rename(path, path[:-len('.ingesting')] + '.ndjson')
+        raise
+    # Deleted only after the transaction committed: a crash in between leaves
+    # *.ingesting files behind instead of counting them twice
+    for path in good:
+        os.remove(path)
+    return len(good), rows
+
+
+def interrupted_batches(directory=None):
+    """Batches claimed by a run that never finished (ingested or not; check before re-queuing)"""
+    return sorted(glob.glob(os.path.join(directory or spool_dir(), '*.ingesting')))
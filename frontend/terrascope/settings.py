@@ -163,3 +163,12 @@ LOGIN_REDIRECT_URL = 'dashboard'
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-super-secret-jwt-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_TOKEN_LIMIT_PER_SUBSCRIPTION = 5
+
+# Revoked token ids and inactive subscriptions, published for the Flask API
+# (see core/revocations.py). Flask must read the same path: set
+# REVOCATION_SNAPSHOT_PATH for both, or keep the default next to both projects.
+REVOCATION_SNAPSHOT_PATH = os.getenv('REVOCATION_SNAPSHOT_PATH', str(BASE_DIR.parent / 'revocations.ndjson'))
+
+# Usage batches written by the Flask API and added to SubscriptionUsage by
+# `manage.py ingest_usage` (see core/usage.py). Must match Flask's USAGE_SPOOL_DIR.
+USAGE_SPOOL_DIR = os.getenv('USAGE_SPOOL_DIR', str(BASE_DIR.parent / 'usage_spool'))